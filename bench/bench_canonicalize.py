@@ -0,0 +1,114 @@
+# bench_canonicalize.py
+#
+# Coût par URL de deku.canonicalize (table de suffixes + motifs d'id) comparé
+# à l'ancienne paire detect_platform (recherche de sous-chaînes) +
+# normalize_url, à froid (cache lru vidé) et à chaud.
+#
+#   python bench/bench_canonicalize.py [-n 20000]
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# DOWNLOAD_DIR est relatif au dossier courant : on isole le benchmark
+os.chdir(tempfile.mkdtemp(prefix="deku-bench-"))
+
+import deku  # noqa: E402
+
+URLS = [
+    "https://youtu.be/dQw4w9WgXcQ?si=Jb2kq7o2lX0",
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ&feature=share&pp=ygU",
+    "https://m.youtube.com/shorts/aqz-KE-bpKQ",
+    "https://www.youtube.com/@LinusTechTips/videos",
+    "https://www.tiktok.com/@scout2015/video/6718335390845095173?is_from_webapp=1&sender_device=pc",
+    "https://vm.tiktok.com/ZMebh4Dp3/",
+    "https://www.instagram.com/reel/C2vQ1mJMq7k/?igsh=MWQ1ZGUxMzBkMA==",
+    "https://www.facebook.com/watch/?v=10153231379946729",
+    "https://fb.watch/nK3pQ8aB1c/",
+    "https://x.com/NASA/status/1712345678901234567?s=20&t=abc",
+    "https://www.pinterest.fr/pin/some-title--585397914973085432/",
+    "https://example.com/media/clip.mp4?utm_source=newsletter&b=2&a=1#t=10",
+]
+
+
+# Implémentation précédente, reproduite pour la comparaison
+def legacy_detect_platform(url: str) -> str:
+    u = url.lower()
+    if "youtube.com" in u or "youtu.be" in u:
+        return "youtube"
+    if "tiktok.com" in u:
+        return "tiktok"
+    if "instagram.com" in u:
+        return "instagram"
+    if "facebook.com" in u or "fb.watch" in u:
+        return "facebook"
+    if "pinterest." in u:
+        return "pinterest"
+    if "twitter.com" in u or "x.com" in u:
+        return "twitter"
+    return "unknown"
+
+
+def legacy_normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def per_url_us(fn, n: int) -> list[float]:
+    """
+    Durée moyenne par URL (µs) sur n passes de la liste.
+    """
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        for url in URLS:
+            fn(url)
+        samples.append((time.perf_counter() - t0) * 1e6 / len(URLS))
+    return samples
+
+
+def report(label: str, samples: list[float]) -> None:
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<44} moy {statistics.mean(samples):7.2f} µs   "
+          f"p50 {statistics.median(samples):7.2f} µs   p95 {p95:7.2f} µs")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Canonicalisation des URL : coût par URL")
+    parser.add_argument("-n", type=int, default=20000, help="passes sur la liste d'URL")
+    args = parser.parse_args()
+
+    for url in URLS:
+        c = deku.canonicalize(url)
+        print(f"{legacy_detect_platform(url):<10} -> {c.platform:<10} {c.key:<40} {url}")
+    print()
+
+    def legacy(url):
+        legacy_detect_platform(url)
+        legacy_normalize_url(url)
+
+    def cold(url):
+        deku.canonicalize.__wrapped__(url)
+
+    report("avant : detect_platform + normalize_url", per_url_us(legacy, args.n))
+    report("canonicalize, à froid (sans lru_cache)", per_url_us(cold, args.n))
+    report("canonicalize, à chaud (lru_cache)", per_url_us(deku.canonicalize, args.n))
+    print(deku.canonicalize.cache_info())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# bench_download_tuning.py
+#
+# Débit de deku.download_media sans puis avec les réglages de téléchargement
+# (fragments en parallèle, taille de tampon, morceaux HTTP), sur le serveur
+# de médias synthétiques avec latence par requête et débit par connexion
+# limités, comme devant un CDN.
+#
+#   python bench/bench_download_tuning.py [--size-mb 8] [--latency-ms 40] [--rate-kbps 2048]
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+# bench/ dans sys.path : yt-dlp charge l'extracteur de substitution
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(ROOT))
+
+# DOWNLOAD_DIR est relatif au dossier courant : on isole le benchmark
+os.chdir(tempfile.mkdtemp(prefix="deku-bench-"))
+
+from media_server import MediaServer  # noqa: E402
+import deku  # noqa: E402
+
+
+def run(media: MediaServer, format_id: str, tuned: bool, n: int) -> list[float]:
+    """
+    Débits (Mo/s) de n téléchargements, chacun d'un id vidéo neuf.
+    """
+    deku.DOWNLOAD_TUNING_ENABLED = tuned
+    samples = []
+    for _ in range(n):
+        out = tempfile.mkdtemp(prefix="deku-dl-")
+        url = media.video_url(f"tune-{uuid.uuid4().hex[:8]}")
+        t0 = time.perf_counter()
+        path, _ = deku.download_media(url, format_id, out)
+        elapsed = time.perf_counter() - t0
+        samples.append(os.path.getsize(path) / elapsed / 1e6)
+        shutil.rmtree(out, ignore_errors=True)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Réglages de téléchargement : débit avant/après")
+    parser.add_argument("--formats", default="progressive,hls,dash-v1", help="format_id du serveur bench")
+    parser.add_argument("-n", type=int, default=3, help="téléchargements par mesure")
+    parser.add_argument("--size-mb", type=float, default=8)
+    parser.add_argument("--segments", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=40, help="latence par requête")
+    parser.add_argument("--rate-kbps", type=float, default=2048, help="débit par connexion (Kio/s)")
+    args = parser.parse_args()
+
+    media = MediaServer(size=int(args.size_mb * 1024 * 1024), segments=args.segments,
+                        latency=args.latency_ms / 1000, rate=int(args.rate_kbps * 1024)).start()
+    try:
+        for format_id in args.formats.split(","):
+            protocol = "https" if format_id == "progressive" else "m3u8_native"
+            settings = deku.download_tuning("unknown", protocol)
+            settings.pop("retry_sleep_functions")
+            print(f"{format_id} ({deku.protocol_family(protocol)}) : {settings}")
+            before = run(media, format_id, False, args.n)
+            after = run(media, format_id, True, args.n)
+            gain = (statistics.median(after) / statistics.median(before) - 1) * 100
+            print(f"  sans réglages  {statistics.median(before):7.2f} Mo/s")
+            print(f"  avec réglages  {statistics.median(after):7.2f} Mo/s   ({gain:+.0f} %)")
+    finally:
+        media.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# bench_ydl_pool.py
+#
+# Coût de construction d'un YoutubeDL par requête comparé à l'emprunt
+# d'une instance du pool (deku.YDL_POOL).
+#
+#   python bench/bench_ydl_pool.py [-n 200]
+
+import argparse
+import functools
+import http.server
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# DOWNLOAD_DIR est relatif au dossier courant : on isole le benchmark
+os.chdir(tempfile.mkdtemp(prefix="deku-bench-"))
+
+import yt_dlp  # noqa: E402
+import deku  # noqa: E402
+
+
+def timed(fn, n: int) -> list[float]:
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+def report(label: str, samples: list[float]) -> None:
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<38} moy {statistics.mean(samples):8.3f} ms   "
+          f"p50 {statistics.median(samples):8.3f} ms   p95 {p95:8.3f} ms")
+
+
+def serve_media(directory: str) -> str:
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Construction YoutubeDL vs pool")
+    parser.add_argument("-n", type=int, default=200, help="itérations par mesure")
+    args = parser.parse_args()
+
+    opts = deku.YDL_PROFILES["analyze"]
+
+    def construct():
+        with yt_dlp.YoutubeDL(dict(opts)):
+            pass
+
+    def checkout():
+        with deku.YDL_POOL.checkout("analyze"):
+            pass
+
+    deku.YDL_POOL.prime("analyze")
+    report("construction YoutubeDL", timed(construct, args.n))
+    report("emprunt au pool", timed(checkout, args.n))
+
+    # Extraction réelle (extracteur générique) d'un fichier servi en local
+    media_dir = tempfile.mkdtemp(prefix="deku-media-")
+    Path(media_dir, "clip.mp4").write_bytes(os.urandom(64 * 1024))
+    url = serve_media(media_dir) + "/clip.mp4"
+
+    def extract_fresh():
+        with yt_dlp.YoutubeDL(dict(opts)) as ydl:
+            ydl.extract_info(url, download=False)
+
+    def extract_pooled():
+        with deku.YDL_POOL.checkout("analyze") as ydl:
+            ydl.extract_info(url, download=False)
+
+    n = max(10, args.n // 4)
+    report("extract_info, instance neuve", timed(extract_fresh, n))
+    report("extract_info, instance du pool", timed(extract_pooled, n))
+    print(deku.YDL_POOL.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+# load.py
+#
+# Générateur de charge hors-ligne pour Deku-Media : lance le serveur de médias
+# synthétiques (media_server.py), démarre l'application sous uvicorn avec
+# l'extracteur de substitution (yt_dlp_plugins/extractor/deku_bench.py), puis
+# mesure /api/analyze et /api/download à plusieurs niveaux de concurrence.
+#
+# Résultats (p50/p95/p99, req/s, octets/s) écrits en JSON pour comparer
+# deux commits :
+#
+#   python bench/load.py --concurrency 1,4,16 --requests 64 -o bench_results.json
+#   python bench/load.py ... --baseline bench_results_old.json
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from media_server import MediaServer  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class AppProcess:
+    """
+    deku:app sous uvicorn dans un sous-processus, avec bench/ dans
+    PYTHONPATH pour que yt-dlp charge l'extracteur de substitution.
+    """
+
+    def __init__(self, workers: int, env: dict):
+        self.port = free_port()
+        self.workdir = tempfile.mkdtemp(prefix="deku-bench-app-")
+        self.env = {**os.environ, **env}
+        self.env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(BENCH_DIR), self.env.get("PYTHONPATH")]))
+        self.workers = workers
+        self.proc: subprocess.Popen | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 60) -> None:
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "deku:app", "--app-dir", str(ROOT),
+             "--port", str(self.port), "--workers", str(self.workers), "--log-level", "warning"],
+            cwd=self.workdir,
+            env=self.env,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError("uvicorn s'est arrêté au démarrage")
+            try:
+                status, _ = request(self.base_url, "GET", "/healthz/ready")
+                if status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise TimeoutError("l'application n'est pas prête")
+
+    def stop(self) -> None:
+        if self.proc is not None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+_local = threading.local()
+
+
+def request(base_url: str, method: str, path: str, body: dict | None = None) -> tuple[int, int]:
+    """
+    Requête HTTP sur une connexion keep-alive par thread.
+    Retourne (statut, octets du corps lus).
+    """
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(base_url)
+    if conn is None:
+        parts = urlsplit(base_url)
+        conn = conns[base_url] = http.client.HTTPConnection(parts.hostname, parts.port, timeout=600)
+
+    payload = json.dumps(body).encode() if body is not None else None
+    headers = {"Content-Type": "application/json"} if payload else {}
+    try:
+        conn.request(method, path, body=payload, headers=headers)
+        response = conn.getresponse()
+        size = 0
+        while True:
+            chunk = response.read(256 * 1024)
+            if not chunk:
+                break
+            size += len(chunk)
+        return response.status, size
+    except (OSError, http.client.HTTPException):
+        conn.close()
+        conns.pop(base_url, None)
+        raise
+
+
+def run_level(base_url: str, make_call, concurrency: int, total: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    transferred = 0
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        nonlocal errors, transferred
+        method, path, body = make_call(i)
+        started = time.perf_counter()
+        try:
+            status, size = request(base_url, method, path, body)
+            ok = status < 400
+        except (OSError, http.client.HTTPException):
+            ok, size = False, 0
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+                transferred += size
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    result = {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "rps": round(len(latencies) / wall, 2) if wall else None,
+        "bytes": transferred,
+        "bytes_per_s": round(transferred / wall) if wall else None,
+    }
+    if latencies:
+        result.update({
+            "mean_ms": round(statistics.mean(latencies), 2),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+        })
+    return result
+
+
+def scenarios(media: MediaServer, args) -> dict:
+    """
+    Fabriques d'appels par scénario : (méthode, chemin, corps) pour la i-ème requête.
+    cold = un id vidéo neuf par appel (aucun cache, même d'un scénario ou
+    d'un niveau de concurrence à l'autre), warm = args.hot_set ids.
+    """
+    run_id = uuid.uuid4().hex[:8]
+
+    def video(i: int, cold: bool) -> str:
+        if cold:
+            return media.video_url(f"{run_id}-c{uuid.uuid4().hex[:12]}")
+        return media.video_url(f"{run_id}-w{i % args.hot_set}")
+
+    def analyze(cold: bool):
+        return lambda i: ("POST", "/api/analyze", {"url": video(i, cold)})
+
+    def download(format_id: str, cold: bool):
+        def call(i):
+            query = urlencode({"url": video(i, cold), "format_id": format_id, **args.download_params})
+            return "GET", f"/api/download?{query}", None
+        return call
+
+    table = {}
+    for cache in args.cache:
+        cold = cache == "cold"
+        table[f"analyze/{cache}"] = analyze(cold)
+        for format_id in args.formats:
+            table[f"download/{format_id}/{cache}"] = download(format_id, cold)
+    return table
+
+
+def compare(results: list[dict], baseline_path: str) -> None:
+    baseline = {(r["scenario"], r["concurrency"]): r for r in json.loads(Path(baseline_path).read_text())["results"]}
+    print(f"\nComparaison avec {baseline_path} :")
+    for r in results:
+        old = baseline.get((r["scenario"], r["concurrency"]))
+        if not old or not old.get("rps") or "p95_ms" not in old or "p95_ms" not in r:
+            continue
+        rps = (r["rps"] / old["rps"] - 1) * 100
+        p95 = (r["p95_ms"] / old["p95_ms"] - 1) * 100
+        print(f"  {r['scenario']:<28} c={r['concurrency']:<4} req/s {rps:+7.1f} %   p95 {p95:+7.1f} %")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark hors-ligne de Deku-Media")
+    parser.add_argument("--concurrency", default="1,4,16", help="niveaux de concurrence (liste)")
+    parser.add_argument("--requests", type=int, default=32, help="requêtes par niveau et scénario")
+    parser.add_argument("--scenarios", default="analyze,download", help="analyze, download")
+    parser.add_argument("--formats", default="progressive,hls", help="format_id téléchargés")
+    parser.add_argument("--cache", default="cold,warm", help="cold (ids uniques), warm (ids réutilisés)")
+    parser.add_argument("--hot-set", type=int, default=4, help="nombre d'ids en mode warm")
+    parser.add_argument("--mode", default="file", help="paramètre mode de /api/download")
+    parser.add_argument("--size-mb", type=float, default=4, help="taille des médias synthétiques")
+    parser.add_argument("--segments", type=int, default=8, help="segments HLS/DASH")
+    parser.add_argument("--latency-ms", type=float, default=5, help="latence par requête du serveur média")
+    parser.add_argument("--rate-kbps", type=float, default=0, help="débit par connexion du serveur média")
+    parser.add_argument("--workers", type=int, default=1, help="workers uvicorn")
+    parser.add_argument("--app-url", help="cible une application déjà lancée (avec bench/ dans PYTHONPATH)")
+    parser.add_argument("--env", action="append", default=[], help="variable DEKU_*=valeur pour l'application")
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="résultats JSON d'un autre commit à comparer")
+    args = parser.parse_args()
+
+    args.formats = [f for f in args.formats.split(",") if f]
+    args.cache = [c for c in args.cache.split(",") if c]
+    args.download_params = {"mode": args.mode}
+    wanted = set(args.scenarios.split(","))
+    levels = [int(c) for c in args.concurrency.split(",")]
+    app_env = dict(item.split("=", 1) for item in args.env)
+
+    media = MediaServer(size=int(args.size_mb * 1024 * 1024), segments=args.segments,
+                        latency=args.latency_ms / 1000, rate=int(args.rate_kbps * 1024)).start()
+    app = None
+    if args.app_url:
+        base_url = args.app_url.rstrip("/")
+    else:
+        app = AppProcess(args.workers, app_env)
+        app.start()
+        base_url = app.base_url
+
+    results = []
+    try:
+        for name, make_call in scenarios(media, args).items():
+            if name.split("/")[0] not in wanted:
+                continue
+            for level in levels:
+                result = {"scenario": name, **run_level(base_url, make_call, level, args.requests)}
+                results.append(result)
+                print(f"{name:<28} c={level:<4} {result.get('p50_ms', '-'):>9} ms p50 "
+                      f"{result.get('p95_ms', '-'):>9} ms p95 {result.get('p99_ms', '-'):>9} ms p99 "
+                      f"{result['rps']:>8} req/s {result['bytes_per_s'] / 1e6:>9.2f} Mo/s "
+                      f"erreurs={result['errors']}")
+    finally:
+        if app is not None:
+            app.stop()
+        media.stop()
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+            "app_env": app_env,
+            "media_requests": media.counters["requests"],
+            "media_bytes": media.counters["bytes"],
+        },
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"\nRésultats écrits dans {args.output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+# media_server.py
+#
+# Serveur HTTP local de médias synthétiques pour les benchmarks :
+#   /v/<id>                 métadonnées JSON (la « page » lue par l'extracteur)
+#   /v/<id>.mp4             fichier progressif (Range supporté)
+#   /v/<id>/hls.m3u8        playlist HLS + /v/<id>/seg/<n>.ts
+#   /v/<id>/dash.mpd        manifeste DASH + /v/<id>/dseg/init.mp4, /v/<id>/dseg/<n>.m4s
+#
+# La latence par requête et le débit par connexion sont réglables, pour
+# reproduire le comportement d'un CDN sans toucher aux vraies plateformes.
+#
+#   python bench/media_server.py --port 8900 --size-mb 8 --latency-ms 20
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PATTERN = bytes(range(256)) * 4096  # 1 Mio, contenu déterministe
+
+
+def synthetic_bytes(offset: int, length: int) -> bytes:
+    """
+    Octets [offset, offset + length) d'un flux synthétique infini.
+    """
+    out = bytearray()
+    while length > 0:
+        start = offset % len(PATTERN)
+        chunk = PATTERN[start:start + length]
+        out += chunk
+        offset += len(chunk)
+        length -= len(chunk)
+    return bytes(out)
+
+
+class MediaConfig:
+    def __init__(self, size: int, segments: int, latency: float, rate: int):
+        self.size = size
+        self.segments = segments
+        self.latency = latency
+        self.rate = rate
+
+    @property
+    def segment_size(self) -> int:
+        return max(1, self.size // self.segments)
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "DekuBench/1.0"
+    config: MediaConfig
+    counters: dict
+    lock: threading.Lock
+
+    ROUTES = [
+        (re.compile(r"^/v/(?P<id>[\w-]+)$"), "meta"),
+        (re.compile(r"^/v/(?P<id>[\w-]+)\.mp4$"), "progressive"),
+        (re.compile(r"^/v/(?P<id>[\w-]+)/hls\.m3u8$"), "hls"),
+        (re.compile(r"^/v/(?P<id>[\w-]+)/seg/(?P<n>\d+)\.ts$"), "segment"),
+        (re.compile(r"^/v/(?P<id>[\w-]+)/dash\.mpd$"), "dash"),
+        (re.compile(r"^/v/(?P<id>[\w-]+)/dseg/(?P<n>init|\d+)\.(?:mp4|m4s)$"), "segment"),
+    ]
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.handle_request(head=True)
+
+    def do_GET(self):
+        self.handle_request(head=False)
+
+    def handle_request(self, head: bool) -> None:
+        path = self.path.split("?", 1)[0]
+        with self.lock:
+            self.counters["requests"] += 1
+        if self.config.latency:
+            time.sleep(self.config.latency)
+        for pattern, name in self.ROUTES:
+            match = pattern.match(path)
+            if match:
+                getattr(self, f"serve_{name}")(match, head)
+                return
+        self.send_body(b"not found", "text/plain", head, status=404)
+
+    def serve_meta(self, match, head):
+        video_id = match["id"]
+        body = json.dumps({
+            "id": video_id,
+            "title": f"Bench {video_id}",
+            "duration": self.config.segments * 2,
+            "size": self.config.size,
+        }).encode()
+        self.send_body(body, "application/json", head)
+
+    def serve_progressive(self, match, head):
+        size = self.config.size
+        start, end = 0, size - 1
+        status = 200
+        range_header = self.headers.get("Range")
+        if range_header:
+            m = re.match(r"bytes=(\d*)-(\d*)$", range_header.strip())
+            if m and (m[1] or m[2]):
+                if m[1]:
+                    start = int(m[1])
+                    end = min(int(m[2]), size - 1) if m[2] else size - 1
+                else:
+                    start = max(0, size - int(m[2]))
+                if start >= size:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                status = 206
+        self.send_response(status)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if not head:
+            self.stream(start, end - start + 1)
+
+    def serve_hls(self, match, head):
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:2", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for n in range(self.config.segments):
+            lines += ["#EXTINF:2.0,", f"seg/{n}.ts"]
+        lines.append("#EXT-X-ENDLIST")
+        self.send_body(("\n".join(lines) + "\n").encode(), "application/vnd.apple.mpegurl", head)
+
+    def serve_dash(self, match, head):
+        duration = self.config.segments * 2
+        segments = "".join(f'<SegmentURL media="dseg/{n}.m4s"/>' for n in range(self.config.segments))
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" '
+            f'mediaPresentationDuration="PT{duration}S" minBufferTime="PT2S" '
+            'profiles="urn:mpeg:dash:profile:isoff-main:2011"><Period>'
+            '<AdaptationSet mimeType="video/mp4" contentType="video">'
+            '<Representation id="v1" bandwidth="2000000" codecs="avc1.4d401f" width="1280" height="720">'
+            f'<SegmentList duration="2" timescale="1"><Initialization sourceURL="dseg/init.mp4"/>{segments}'
+            '</SegmentList></Representation></AdaptationSet></Period></MPD>'
+        )
+        self.send_body(body.encode(), "application/dash+xml", head)
+
+    def serve_segment(self, match, head):
+        size = self.config.segment_size
+        n = 0 if match["n"] == "init" else int(match["n"]) + 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        if not head:
+            self.stream(n * size, size)
+
+    def send_body(self, body: bytes, content_type: str, head: bool, status: int = 200) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def stream(self, offset: int, length: int) -> None:
+        """
+        Envoie les octets par blocs de 64 Kio, limités à config.rate octets/s
+        par connexion (0 = sans limite).
+        """
+        block = 64 * 1024
+        started = time.monotonic()
+        sent = 0
+        try:
+            while sent < length:
+                chunk = synthetic_bytes(offset + sent, min(block, length - sent))
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                if self.config.rate:
+                    ahead = sent / self.config.rate - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        finally:
+            with self.lock:
+                self.counters["bytes"] += sent
+
+
+class MediaServer:
+    """
+    Serveur de médias synthétiques dans un thread de fond.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, size: int = 8 * 1024 * 1024,
+                 segments: int = 16, latency: float = 0.0, rate: int = 0):
+        self.config = MediaConfig(size, segments, latency, rate)
+        self.counters = {"requests": 0, "bytes": 0}
+        handler = type("Handler", (MediaHandler,), {
+            "config": self.config,
+            "counters": self.counters,
+            "lock": threading.Lock(),
+        })
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def video_url(self, video_id: str) -> str:
+        return f"{self.base_url}/v/{video_id}"
+
+    def start(self) -> "MediaServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="bench-media", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serveur local de médias synthétiques")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--size-mb", type=float, default=8)
+    parser.add_argument("--segments", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--rate-kbps", type=float, default=0, help="débit par connexion (Kio/s, 0 = illimité)")
+    args = parser.parse_args()
+
+    server = MediaServer(args.host, args.port, int(args.size_mb * 1024 * 1024), args.segments,
+                         args.latency_ms / 1000, int(args.rate_kbps * 1024))
+    print(f"Médias synthétiques sur {server.base_url}/v/<id>")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
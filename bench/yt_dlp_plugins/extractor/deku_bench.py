@@ -0,0 +1,38 @@
+# Extracteur yt-dlp de substitution pour bench/media_server.py.
+#
+# Chargé comme plugin yt-dlp dès que le dossier bench/ est dans sys.path
+# (PYTHONPATH) : il remplace les plateformes réelles pour les URLs
+# http://127.0.0.1:<port>/v/<id>.
+
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class DekuBenchIE(InfoExtractor):
+    IE_NAME = "dekubench"
+    _VALID_URL = r"https?://(?:127\.0\.0\.1|localhost):\d+/v/(?P<id>[\w-]+)$"
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        meta = self._download_json(url, video_id, note="Métadonnées bench")
+
+        formats = [{
+            "format_id": "progressive",
+            "url": f"{url}.mp4",
+            "ext": "mp4",
+            "vcodec": "avc1.4d401f",
+            "acodec": "mp4a.40.2",
+            "width": 1280,
+            "height": 720,
+            "filesize": meta["size"],
+        }]
+        formats += self._extract_m3u8_formats(
+            f"{url}/hls.m3u8", video_id, "mp4", m3u8_id="hls", fatal=False)
+        formats += self._extract_mpd_formats(
+            f"{url}/dash.mpd", video_id, mpd_id="dash", fatal=False)
+
+        return {
+            "id": video_id,
+            "title": meta["title"],
+            "duration": meta["duration"],
+            "formats": formats,
+        }
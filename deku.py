@@ -1,18 +1,90 @@
 # deku_media_single_file.py
 
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, HttpUrl
+from starlette.background import BackgroundTask
+from starlette.routing import Match
+from pydantic import BaseModel, Field, HttpUrl, TypeAdapter, ValidationError
 from pathlib import Path
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from functools import lru_cache
+from typing import NamedTuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, quote
+import asyncio
+import base64
+import contextvars
+import cProfile
+import gc
+import gzip
+import hashlib
+import hmac
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import pstats
+import queue
+import random
+import re
+import shutil
+import socket
+import signal
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
 import uuid
-import yt_dlp
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optionnel : sans brotli, le frontend est servi en gzip
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:  # hors POSIX : pas de coordination des téléchargements entre workers
+    fcntl = None
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess as prometheus_multiprocess
+except ImportError:  # optionnel : sans prometheus_client, /metrics répond 501
+    prometheus_client = None
+
+# yt_dlp n'est pas importé ici (voir load_yt_dlp) : il charge des centaines de
+# modules et ralentirait le démarrage des pods.
+MODULE_IMPORT_STARTED = time.perf_counter()
 
 # ==========================
 # Config et initialisation
 # ==========================
 
-app = FastAPI(title="Deku-Media 2.0 - Single File")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if METADATA_STORE is not None:
+        METADATA_STORE.start()
+    JANITOR.start()
+    JOBS.start()
+    start_warm_up()
+    try:
+        yield
+    finally:
+        EXTRACTOR.shutdown()
+        JOBS.stop()
+        JANITOR.stop()
+        if METADATA_STORE is not None:
+            METADATA_STORE.stop()
+        METRICS.process_exit()
+
+
+app = FastAPI(title="Deku-Media 2.0 - Single File", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,49 +94,2542 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Processus d'extraction (DEKU_EXTRACT_BACKEND=process) : deku y est
+# réimporté pour _extract_video_info seulement. Ni dossiers, ni index du
+# cache disque, ni store SQLite n'y sont créés (voir ExtractionBackend).
+EXTRACTION_WORKER_ENV = "DEKU_EXTRACTION_WORKER"
+EXTRACTION_WORKER = os.environ.get(EXTRACTION_WORKER_ENV) == "1"
+
 DOWNLOAD_DIR = Path("downloads")
-DOWNLOAD_DIR.mkdir(exist_ok=True)
+if not EXTRACTION_WORKER:
+    DOWNLOAD_DIR.mkdir(exist_ok=True)
+
+# Cache mémoire des analyses (les URLs CDN signées expirent : TTL court)
+METADATA_CACHE_TTL = float(os.environ.get("DEKU_METADATA_CACHE_TTL", "300"))
+METADATA_CACHE_MAX_ENTRIES = int(os.environ.get("DEKU_METADATA_CACHE_MAX_ENTRIES", "2048"))
+METADATA_CACHE_MAX_BYTES = int(os.environ.get("DEKU_METADATA_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Stockage persistant des analyses (SQLite WAL, partagé entre workers et
+# redémarrages) sous le cache mémoire ; chemin vide = désactivé
+METADATA_STORE_PATH = os.environ.get("DEKU_METADATA_STORE", str(DOWNLOAD_DIR / "metadata.sqlite3"))
+METADATA_STORE_FLUSH_INTERVAL = float(os.environ.get("DEKU_METADATA_STORE_FLUSH_INTERVAL", "0.05"))
+METADATA_STORE_PURGE_INTERVAL = float(os.environ.get("DEKU_METADATA_STORE_PURGE_INTERVAL", "60"))
+
+# Cache disque des médias téléchargés (budget en octets)
+MEDIA_CACHE_DIR = DOWNLOAD_DIR / "cache"
+MEDIA_CACHE_MAX_BYTES = int(os.environ.get("DEKU_MEDIA_CACHE_MAX_BYTES", str(10 * 1024 ** 3)))
+# Une entrée servie depuis moins de N secondes n'est pas évincée (le temps
+# que la réponse ouvre le fichier)
+MEDIA_CACHE_EVICTION_GRACE = float(os.environ.get("DEKU_MEDIA_CACHE_EVICTION_GRACE", "30"))
+
+# Streaming direct (formats progressifs) : taille des blocs et tampon maximal par flux
+STREAM_CHUNK_SIZE = int(os.environ.get("DEKU_STREAM_CHUNK_SIZE", str(256 * 1024)))
+STREAM_BUFFER_CHUNKS = int(os.environ.get("DEKU_STREAM_BUFFER_CHUNKS", "16"))
+STREAM_STALL_TIMEOUT = float(os.environ.get("DEKU_STREAM_STALL_TIMEOUT", "120"))
+STREAM_TEE_CACHE = os.environ.get("DEKU_STREAM_TEE_CACHE", "1") == "1"
+
+# Tâches de téléchargement asynchrones (/api/jobs)
+JOBS_WORKERS = int(os.environ.get("DEKU_JOBS_WORKERS", "4"))
+JOBS_QUEUE_SIZE = int(os.environ.get("DEKU_JOBS_QUEUE_SIZE", "100"))
+JOBS_TTL = float(os.environ.get("DEKU_JOBS_TTL", "3600"))
+JOBS_EVENT_INTERVAL = float(os.environ.get("DEKU_JOBS_EVENT_INTERVAL", "0.5"))
+
+# Ordonnanceur par plateforme (analyse + téléchargement)
+# DEKU_PLATFORM_LIMITS='{"tiktok": {"concurrency": 2, "rps": 1, "weight": 1}}'
+SCHED_MAX_CONCURRENCY = int(os.environ.get("DEKU_SCHED_MAX_CONCURRENCY", "16"))
+SCHED_DEFAULT_CONCURRENCY = int(os.environ.get("DEKU_SCHED_DEFAULT_CONCURRENCY", "4"))
+SCHED_DEFAULT_RPS = float(os.environ.get("DEKU_SCHED_DEFAULT_RPS", "5"))
+SCHED_MAX_WAIT = float(os.environ.get("DEKU_SCHED_MAX_WAIT", "300"))
+PLATFORM_LIMITS = json.loads(os.environ.get("DEKU_PLATFORM_LIMITS", "{}"))
+
+# Analyse par lots (/api/analyze/batch)
+BATCH_MAX_URLS = int(os.environ.get("DEKU_BATCH_MAX_URLS", "500"))
+BATCH_CONCURRENCY = int(os.environ.get("DEKU_BATCH_CONCURRENCY", "8"))
+
+# Playlists / chaînes (/api/analyze/playlist)
+PLAYLIST_MAX_LIMIT = int(os.environ.get("DEKU_PLAYLIST_MAX_LIMIT", "200"))
+PLAYLIST_MAX_RESOLVE = int(os.environ.get("DEKU_PLAYLIST_MAX_RESOLVE", "50"))
+
+# Réglages de téléchargement yt-dlp par plateforme et famille de protocole
+# ("http" progressif, "fragment" HLS/DASH), fusionnés avec DOWNLOAD_TUNING :
+# DEKU_DOWNLOAD_TUNING='{"youtube": {"fragment": {"concurrent_fragment_downloads": 8}}}'
+DOWNLOAD_TUNING_ENABLED = os.environ.get("DEKU_DOWNLOAD_TUNING_ENABLED", "1") == "1"
+DOWNLOAD_TUNING_OVERRIDES = json.loads(os.environ.get("DEKU_DOWNLOAD_TUNING", "{}"))
+
+# Pool d'instances YoutubeDL pré-initialisées
+YDL_POOL_SIZE = int(os.environ.get("DEKU_YDL_POOL_SIZE", "8"))
+YDL_POOL_MAX_USES = int(os.environ.get("DEKU_YDL_POOL_MAX_USES", "500"))
+
+# Extraction dans des processus séparés (contourne le GIL) : "thread" ou "process"
+EXTRACT_BACKEND = os.environ.get("DEKU_EXTRACT_BACKEND", "thread")
+EXTRACT_PROCESSES = int(os.environ.get("DEKU_EXTRACT_PROCESSES", str(os.cpu_count() or 2)))
+EXTRACT_MAX_TASKS_PER_CHILD = int(os.environ.get("DEKU_EXTRACT_MAX_TASKS_PER_CHILD", "200"))
+
+# Préchauffage au démarrage (import yt_dlp, extracteurs, pool YoutubeDL)
+WARMUP_ENABLED = os.environ.get("DEKU_WARMUP", "1") == "1"
+WARMUP_EXTRACTORS = os.environ.get(
+    "DEKU_WARMUP_EXTRACTORS", "Youtube,TikTok,Instagram,Facebook,Pinterest,Twitter,Generic"
+).split(",")
+
+# Un seul téléchargement par (URL, format) entre threads et workers (baux flock)
+LEASE_DIR = DOWNLOAD_DIR / "leases"
+LEASE_POLL_INTERVAL = float(os.environ.get("DEKU_LEASE_POLL_INTERVAL", "0.25"))
+LEASE_MAX_WAIT = float(os.environ.get("DEKU_LEASE_MAX_WAIT", "1800"))
+# Les demandes arrivées pendant un téléchargement progressif suivent le
+# fichier en cours d'écriture au lieu d'attendre la fin
+FOLLOW_INFLIGHT = os.environ.get("DEKU_FOLLOW_INFLIGHT", "1") == "1"
+FOLLOW_START_TIMEOUT = float(os.environ.get("DEKU_FOLLOW_START_TIMEOUT", "60"))
+
+# mode=redirect : plateformes dont les URLs directes ne sont pas liées à
+# l'adresse du serveur (opt-in ; les autres sont relayées)
+REDIRECT_PLATFORMS = frozenset(
+    p for p in os.environ.get("DEKU_REDIRECT_PLATFORMS", "twitter,pinterest").split(",") if p
+)
+
+# Tickets signés (HMAC) renvoyés par /api/analyze pour /api/download?ticket=
+# Sans DEKU_TICKET_SECRET, une clé aléatoire est créée dans DOWNLOAD_DIR
+# (partagée par les workers, conservée au redémarrage).
+TICKET_SECRET = os.environ.get("DEKU_TICKET_SECRET", "")
+TICKET_SECRET_PATH = DOWNLOAD_DIR / ".ticket-secret"
+TICKET_TTL = float(os.environ.get("DEKU_TICKET_TTL", "1800"))
+
+# Ménage périodique de DOWNLOAD_DIR
+JANITOR_INTERVAL = float(os.environ.get("DEKU_JANITOR_INTERVAL", "60"))
+JANITOR_TEMP_MAX_AGE = float(os.environ.get("DEKU_JANITOR_TEMP_MAX_AGE", str(2 * 3600)))
+JANITOR_ORPHAN_MAX_AGE = float(os.environ.get("DEKU_JANITOR_ORPHAN_MAX_AGE", "1800"))
+JANITOR_CACHE_MAX_AGE = float(os.environ.get("DEKU_JANITOR_CACHE_MAX_AGE", str(7 * 86400)))
+JANITOR_MAX_BYTES = int(os.environ.get("DEKU_DOWNLOAD_DIR_MAX_BYTES", str(20 * 1024 ** 3)))
+JANITOR_MIN_FREE_BYTES = int(os.environ.get("DEKU_MIN_FREE_BYTES", str(2 * 1024 ** 3)))
+JANITOR_TARGET_FREE_BYTES = int(os.environ.get("DEKU_TARGET_FREE_BYTES", str(5 * 1024 ** 3)))
+
+# Métriques Prometheus (/metrics). Avec plusieurs workers uvicorn, définir
+# PROMETHEUS_MULTIPROC_DIR (dossier vide) avant le lancement.
+METRICS_ENABLED = os.environ.get("DEKU_METRICS", "1") == "1"
+
+# Administration (/api/admin/*) : jeton attendu dans l'en-tête X-Deku-Admin-Token
+ADMIN_TOKEN = os.environ.get("DEKU_ADMIN_TOKEN", "")
+
+# Profilage CPU des analyses/téléchargements : à la demande (en-tête
+# X-Deku-Profile: <jeton admin>) ou sur une fraction des requêtes
+PROFILE_SAMPLE_RATE = float(os.environ.get("DEKU_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = DOWNLOAD_DIR / "profiles"
+PROFILE_MAX_FILES = int(os.environ.get("DEKU_PROFILE_MAX_FILES", "200"))
+PROFILING_ENABLED = bool(ADMIN_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+# Mémoire : RSS par requête et instantanés tracemalloc (admin), recyclage du
+# worker après N requêtes ou X Mo de RSS (0 = désactivé)
+MEMORY_RECENT_REQUESTS = int(os.environ.get("DEKU_MEMORY_RECENT_REQUESTS", "200"))
+MEMORY_MAX_SNAPSHOTS = int(os.environ.get("DEKU_MEMORY_MAX_SNAPSHOTS", "4"))
+TRACEMALLOC_FRAMES = int(os.environ.get("DEKU_TRACEMALLOC_FRAMES", "0"))  # > 0 : actif dès le démarrage
+RECYCLE_MAX_REQUESTS = int(os.environ.get("DEKU_RECYCLE_MAX_REQUESTS", "0"))
+RECYCLE_MAX_RSS_MB = float(os.environ.get("DEKU_RECYCLE_MAX_RSS_MB", "0"))
+RECYCLE_DRAIN_TIMEOUT = float(os.environ.get("DEKU_RECYCLE_DRAIN_TIMEOUT", "300"))
+MEMORY_TRACKING = bool(ADMIN_TOKEN) or RECYCLE_MAX_REQUESTS > 0 or RECYCLE_MAX_RSS_MB > 0
 
 
 # ==========================
-# Utilitaires yt-dlp
+# Import différé de yt-dlp
 # ==========================
 
-def detect_platform(url: str) -> str:
-    u = url.lower()
-    if "youtube.com" in u or "youtu.be" in u:
-        return "youtube"
-    if "tiktok.com" in u:
-        return "tiktok"
-    if "instagram.com" in u:
-        return "instagram"
-    if "facebook.com" in u or "fb.watch" in u:
-        return "facebook"
-    if "pinterest." in u:
+def load_yt_dlp():
+    """
+    Retourne le module yt_dlp, importé au premier appel (pendant le
+    préchauffage en temps normal) puis servi depuis sys.modules.
+    """
+    import yt_dlp
+    return yt_dlp
+
+
+# ==========================
+# Métriques (Prometheus)
+# ==========================
+
+class _Stats:
+    """
+    Compteurs des singletons exposés dans /api/stats : self._stats, modifié
+    sous self._lock (à créer par la classe).
+    """
+
+    def _count(self, **deltas) -> None:
+        with self._lock:
+            for name, value in deltas.items():
+                self._stats[name] += value
+
+
+# Étiquettes de la requête HTTP en cours ({"endpoint", "platform"}), posées
+# par MetricsMiddleware ; le contexte suit les appels dans le threadpool.
+REQUEST_LABELS: contextvars.ContextVar[dict | None] = contextvars.ContextVar("deku_request_labels", default=None)
+
+
+def current_endpoint() -> str:
+    labels = REQUEST_LABELS.get()
+    return labels["endpoint"] if labels is not None else "background"
+
+
+def tag_request(url: str) -> None:
+    """
+    Associe la requête HTTP en cours à la plateforme de url.
+    """
+    labels = REQUEST_LABELS.get()
+    if labels is not None:
+        labels["platform"] = detect_platform(url)
+
+
+class Metrics:
+    """
+    Histogrammes, jauges et compteurs exposés sur /metrics, étiquetés par
+    plateforme et endpoint. Avec PROMETHEUS_MULTIPROC_DIR, chaque worker
+    écrit ses valeurs dans ce dossier et /metrics agrège tous les workers.
+    Sans prometheus_client (ou DEKU_METRICS=0), rien n'est enregistré.
+    """
+
+    SECONDS_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+    BYTES_BUCKETS = tuple(float(64 * 1024 * 4 ** n) for n in range(9))  # 64 Kio .. 4 Gio
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled and prometheus_client is not None
+        self.multiprocess = self.enabled and bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+        if not self.enabled:
+            return
+
+        pc = prometheus_client
+        labels = ("platform", "endpoint")
+        self.stage_seconds = {
+            "extract": pc.Histogram(
+                "deku_get_video_info_seconds", "Durée de get_video_info (cache et file d'attente compris)",
+                labels, buckets=self.SECONDS_BUCKETS,
+            ),
+            "download": pc.Histogram(
+                "deku_download_video_seconds", "Durée d'un téléchargement yt-dlp (fusion comprise)",
+                labels, buckets=self.SECONDS_BUCKETS,
+            ),
+        }
+        self.downloaded_bytes = pc.Histogram(
+            "deku_downloaded_bytes", "Octets récupérés depuis la source, par téléchargement",
+            labels, buckets=self.BYTES_BUCKETS,
+        )
+        self.served_bytes = pc.Histogram(
+            "deku_served_bytes", "Octets envoyés au client, par réponse",
+            labels, buckets=self.BYTES_BUCKETS,
+        )
+        self.request_seconds = pc.Histogram(
+            "deku_http_request_seconds", "Durée des requêtes HTTP, corps de réponse compris",
+            labels, buckets=self.SECONDS_BUCKETS,
+        )
+        self.requests_in_progress = pc.Gauge(
+            "deku_http_requests_in_progress", "Requêtes HTTP en cours",
+            ("endpoint",), multiprocess_mode="livesum",
+        )
+        self.stages_in_progress = pc.Gauge(
+            "deku_stage_in_progress", "Extractions et téléchargements en cours",
+            ("stage",) + labels, multiprocess_mode="livesum",
+        )
+        self.stage_errors = pc.Counter(
+            "deku_stage_errors", "Échecs d'extraction, de téléchargement ou de relais",
+            ("stage",) + labels,
+        )
+        self.http_errors = pc.Counter(
+            "deku_http_errors", "Réponses HTTP 4xx/5xx",
+            ("status",) + labels,
+        )
+        self.startup_seconds = pc.Gauge(
+            "deku_startup_seconds", "Durée des phases du démarrage, par worker",
+            ("phase",), multiprocess_mode="liveall",
+        )
+
+    @contextmanager
+    def stage(self, name: str, url: str):
+        """
+        Mesure une étape ("extract" ou "download") : durée, en cours, échecs.
+        """
+        if not self.enabled:
+            yield
+            return
+        labels = (detect_platform(url), current_endpoint())
+        in_progress = self.stages_in_progress.labels(name, *labels)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.stage_errors.labels(name, *labels).inc()
+            raise
+        finally:
+            in_progress.dec()
+            self.stage_seconds[name].labels(*labels).observe(time.perf_counter() - started)
+
+    def downloaded(self, platform: str, size: int, endpoint: str | None = None) -> None:
+        if self.enabled:
+            self.downloaded_bytes.labels(platform, endpoint or current_endpoint()).observe(size)
+
+    def stage_failed(self, name: str, platform: str, endpoint: str | None = None) -> None:
+        if self.enabled:
+            self.stage_errors.labels(name, platform, endpoint or current_endpoint()).inc()
+
+    def startup_phase(self, phase: str, seconds: float) -> None:
+        if self.enabled:
+            self.startup_seconds.labels(phase).set(seconds)
+
+    def observe_request(self, labels: dict, status: int, served: int, seconds: float) -> None:
+        platform, endpoint = labels["platform"], labels["endpoint"]
+        self.request_seconds.labels(platform, endpoint).observe(seconds)
+        self.served_bytes.labels(platform, endpoint).observe(served)
+        if status >= 400:
+            self.http_errors.labels(str(status), platform, endpoint).inc()
+
+    def render(self) -> bytes:
+        if self.multiprocess:
+            registry = prometheus_client.CollectorRegistry()
+            prometheus_multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = prometheus_client.REGISTRY
+        return prometheus_client.generate_latest(registry)
+
+    def process_exit(self) -> None:
+        """
+        Retire les jauges « livesum » de ce worker de l'agrégat.
+        """
+        if self.multiprocess:
+            prometheus_multiprocess.mark_process_dead(os.getpid())
+
+
+METRICS = Metrics(METRICS_ENABLED)
+
+
+def route_template(scope) -> str:
+    """
+    Gabarit de la route (ex. /api/jobs/{job_id}) : cardinalité bornée.
+    """
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match is Match.FULL:
+            return route.path
+    return "other"
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI : requêtes en cours, durée, octets servis et erreurs
+    HTTP. N'est installé que si les métriques sont actives.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        labels = {"endpoint": route_template(scope), "platform": "unknown"}
+        token = REQUEST_LABELS.set(labels)
+        in_progress = METRICS.requests_in_progress.labels(labels["endpoint"])
+        in_progress.inc()
+        started = time.perf_counter()
+        status = 500
+        served = 0
+
+        async def send_counted(message):
+            nonlocal status, served
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                served += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_counted)
+        finally:
+            in_progress.dec()
+            REQUEST_LABELS.reset(token)
+            METRICS.observe_request(labels, status, served, time.perf_counter() - started)
+
+
+if METRICS.enabled:
+    app.add_middleware(MetricsMiddleware)
+
+
+# ==========================
+# Profilage à la demande (cProfile)
+# ==========================
+
+PROFILE_SESSION: contextvars.ContextVar["ProfileSession | None"] = contextvars.ContextVar(
+    "deku_profile_session", default=None
+)
+# Un seul profileur actif à la fois (cProfile s'appuie sur sys.monitoring,
+# global au processus, depuis Python 3.12)
+PROFILER_LOCK = threading.Lock()
+
+
+class ProfileSession:
+    def __init__(self, method: str, path: str, trigger: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.profiler = cProfile.Profile()
+        self.sections = 0
+        self.skipped = 0
+        self.created = time.time()
+        self.duration = None
+        self.status = None
+
+
+@contextmanager
+def profile_section():
+    """
+    Profile le bloc (appel yt-dlp) si la requête en cours est échantillonnée.
+    Sans session, seul un ContextVar.get() est exécuté. Avec le backend
+    "process", l'extraction a lieu dans un autre processus : seule l'attente
+    apparaît dans le profil.
+    """
+    session = PROFILE_SESSION.get()
+    if session is None:
+        yield
+        return
+    if not PROFILER_LOCK.acquire(blocking=False):
+        session.skipped += 1
+        yield
+        return
+    session.profiler.enable()
+    try:
+        yield
+    finally:
+        session.profiler.disable()
+        session.sections += 1
+        PROFILER_LOCK.release()
+
+
+class ProfileStore:
+    """
+    Profils sur disque : <id>.prof (format pstats, lisible par snakeviz)
+    et <id>.json (métadonnées). Les plus anciens au-delà de max_files
+    sont supprimés.
+    """
+
+    def __init__(self, root: Path, max_files: int):
+        self.root = root
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def save(self, session: ProfileSession) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        session.profiler.dump_stats(str(self.root / f"{session.id}.prof"))
+        meta = {
+            "id": session.id,
+            "method": session.method,
+            "path": session.path,
+            "trigger": session.trigger,
+            "status": session.status,
+            "created": session.created,
+            "duration_ms": round(session.duration * 1000, 1),
+            "sections": session.sections,
+            "skipped_sections": session.skipped,
+        }
+        (self.root / f"{session.id}.json").write_text(json.dumps(meta))
+        self._prune()
+
+    def _prune(self) -> None:
+        with self._lock:
+            metas = sorted(self.root.glob("*.json"), key=lambda p: p.stat().st_mtime)
+            for meta in metas[:max(0, len(metas) - self.max_files)]:
+                meta.with_suffix(".prof").unlink(missing_ok=True)
+                meta.unlink(missing_ok=True)
+
+    def list(self, limit: int) -> list[dict]:
+        items = []
+        for meta in self.root.glob("*.json"):
+            try:
+                items.append(json.loads(meta.read_text()))
+            except (OSError, ValueError):
+                continue
+        items.sort(key=lambda m: m["created"], reverse=True)
+        return items[:limit]
+
+    def path(self, profile_id: str) -> Path | None:
+        if not (len(profile_id) == 12 and profile_id.isalnum()):
+            return None
+        path = self.root / f"{profile_id}.prof"
+        return path if path.exists() else None
+
+    @staticmethod
+    def render_text(path: Path, sort: str, limit: int) -> str:
+        out = io.StringIO()
+        try:
+            stats = pstats.Stats(str(path), stream=out)
+        except TypeError:  # profil vide (aucun appel yt-dlp pendant la requête)
+            return "Profil vide.\n"
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+PROFILES = ProfileStore(PROFILE_DIR, PROFILE_MAX_FILES)
+
+
+def profile_trigger(scope) -> str | None:
+    if ADMIN_TOKEN:
+        for name, value in scope["headers"]:
+            if name == b"x-deku-profile" and hmac.compare_digest(value, ADMIN_TOKEN.encode()):
+                return "header"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sample"
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    Profile les requêtes d'analyse et de téléchargement désignées par
+    profile_trigger ; l'id du profil est renvoyé dans l'en-tête X-Deku-Profile.
+    N'est installé que si DEKU_ADMIN_TOKEN ou DEKU_PROFILE_SAMPLE_RATE est défini.
+    """
+
+    PROFILED_PATHS = ("/api/analyze", "/api/download")
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.PROFILED_PATHS):
+            await self.app(scope, receive, send)
+            return
+        trigger = profile_trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        session = ProfileSession(scope["method"], scope["path"], trigger)
+        token = PROFILE_SESSION.set(session)
+
+        async def send_tagged(message):
+            if message["type"] == "http.response.start":
+                session.status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-deku-profile", session.id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_tagged)
+        finally:
+            PROFILE_SESSION.reset(token)
+            session.duration = time.perf_counter() - started
+            try:
+                await asyncio.to_thread(PROFILES.save, session)
+            except OSError:
+                pass
+
+
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+
+# ==========================
+# Mémoire (RSS, tracemalloc, recyclage)
+# ==========================
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> int | None:
+    """
+    RSS courant en octets (Linux, /proc/self/statm) ; None ailleurs.
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def format_trace_stat(stat, group_by: str) -> dict:
+    item = {
+        "size": stat.size,
+        "count": stat.count,
+        "size_diff": getattr(stat, "size_diff", None),
+        "count_diff": getattr(stat, "count_diff", None),
+    }
+    if group_by == "traceback":
+        item["traceback"] = stat.traceback.format()
+    else:
+        frame = stat.traceback[0]
+        item["where"] = frame.filename if group_by == "filename" else f"{frame.filename}:{frame.lineno}"
+    return item
+
+
+class MemoryTracker:
+    """
+    RSS avant/après chaque requête (les N dernières, et le cumul par
+    endpoint), instantanés tracemalloc à la demande, et recyclage du worker
+    au-delà de max_requests requêtes ou max_rss_mb Mo.
+
+    Le recyclage passe /healthz/ready à 503, attend que les tâches en cours
+    soient terminées (au plus drain_timeout s) puis envoie SIGTERM au
+    processus : uvicorn termine les requêtes en cours et le superviseur
+    (uvicorn --workers, gunicorn, orchestrateur) relance un worker neuf.
+    """
+
+    TRACE_FILTERS = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    )
+
+    def __init__(self, recent: int, max_snapshots: int, max_requests: int, max_rss_mb: float,
+                 drain_timeout: float):
+        self.max_snapshots = max_snapshots
+        # Gigue de 10 % : des workers démarrés ensemble ne recyclent pas ensemble
+        self.max_requests = max_requests + random.randint(0, max_requests // 10) if max_requests > 0 else 0
+        self.max_rss = int(max_rss_mb * 1024 * 1024)
+        self.drain_timeout = drain_timeout
+        self.recycling = threading.Event()
+        self.recycle_reason = None
+        self._lock = threading.Lock()
+        self._recent: deque = deque(maxlen=recent)
+        self._endpoints: dict[str, dict] = {}
+        self._snapshots: OrderedDict[str, tuple[float, tracemalloc.Snapshot]] = OrderedDict()
+        self.requests = 0
+        self.started = time.time()
+        self.rss_at_start = current_rss()
+
+    # --- RSS par requête et recyclage ---
+
+    def record(self, method: str, endpoint: str, status: int, rss_before: int | None,
+               rss_after: int | None, seconds: float) -> None:
+        delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        with self._lock:
+            self.requests += 1
+            self._recent.append({
+                "time": time.time(),
+                "method": method,
+                "endpoint": endpoint,
+                "status": status,
+                "duration_ms": round(seconds * 1000, 1),
+                "rss_before": rss_before,
+                "rss_after": rss_after,
+                "rss_delta": delta,
+            })
+            totals = self._endpoints.setdefault(endpoint, {"requests": 0, "rss_delta_total": 0, "rss_delta_max": 0})
+            totals["requests"] += 1
+            if delta is not None:
+                totals["rss_delta_total"] += delta
+                totals["rss_delta_max"] = max(totals["rss_delta_max"], delta)
+            requests = self.requests
+        self._check_recycle(requests, rss_after)
+
+    def _check_recycle(self, requests: int, rss: int | None) -> None:
+        if self.recycling.is_set():
+            return
+        if self.max_requests and requests >= self.max_requests:
+            reason = f"{requests} requêtes"
+        elif self.max_rss and rss is not None and rss >= self.max_rss:
+            reason = f"RSS {rss // (1024 * 1024)} Mo"
+        else:
+            return
+        with self._lock:
+            if self.recycling.is_set():
+                return
+            self.recycle_reason = reason
+            self.recycling.set()
+        threading.Thread(target=self._recycle, name="deku-recycle", daemon=True).start()
+
+    def _recycle(self) -> None:
+        deadline = time.monotonic() + self.drain_timeout
+        while JOBS.busy() and time.monotonic() < deadline:
+            time.sleep(1)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    # --- tracemalloc ---
+
+    def start_tracing(self, frames: int) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop_tracing(self) -> None:
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+
+    def _take(self) -> tracemalloc.Snapshot:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc n'est pas actif.")
+        gc.collect()
+        return tracemalloc.take_snapshot().filter_traces(self.TRACE_FILTERS)
+
+    def snapshot(self) -> str:
+        """
+        Prend et conserve un instantané (les max_snapshots derniers) ;
+        retourne son id.
+        """
+        snap = self._take()
+        snapshot_id = uuid.uuid4().hex[:8]
+        with self._lock:
+            self._snapshots[snapshot_id] = (time.time(), snap)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return snapshot_id
+
+    def _get(self, snapshot_id: str | None) -> tracemalloc.Snapshot:
+        if snapshot_id is None:
+            return self._take()
+        with self._lock:
+            entry = self._snapshots.get(snapshot_id)
+        if entry is None:
+            raise KeyError(snapshot_id)
+        return entry[1]
+
+    def top(self, snapshot_id: str | None, group_by: str, limit: int) -> list[dict]:
+        stats = self._get(snapshot_id).statistics(group_by)
+        return [format_trace_stat(stat, group_by) for stat in stats[:limit]]
+
+    def diff(self, base_id: str, target_id: str | None, group_by: str, limit: int) -> list[dict]:
+        base = self._get(base_id)
+        stats = self._get(target_id).compare_to(base, group_by)
+        return [format_trace_stat(stat, group_by) for stat in stats[:limit]]
+
+    def stats(self) -> dict:
+        rss = current_rss()
+        with self._lock:
+            snapshots = [{"id": k, "time": t} for k, (t, _) in self._snapshots.items()]
+            return {
+                "rss": rss,
+                "rss_at_start": self.rss_at_start,
+                "rss_growth": rss - self.rss_at_start if rss is not None and self.rss_at_start is not None else None,
+                "requests": self.requests,
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "recycle_max_requests": self.max_requests or None,
+                "recycle_max_rss": self.max_rss or None,
+                "recycling": self.recycling.is_set(),
+                "recycle_reason": self.recycle_reason,
+                "tracemalloc": {
+                    "tracing": tracemalloc.is_tracing(),
+                    "frames": tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else None,
+                    "traced": tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else None,
+                    "snapshots": snapshots,
+                },
+            }
+
+    def requests_report(self) -> dict:
+        with self._lock:
+            return {"recent": list(self._recent), "endpoints": dict(self._endpoints)}
+
+
+MEMORY = MemoryTracker(
+    MEMORY_RECENT_REQUESTS, MEMORY_MAX_SNAPSHOTS, RECYCLE_MAX_REQUESTS, RECYCLE_MAX_RSS_MB, RECYCLE_DRAIN_TIMEOUT,
+)
+if TRACEMALLOC_FRAMES > 0:
+    MEMORY.start_tracing(TRACEMALLOC_FRAMES)
+
+
+class MemoryMiddleware:
+    """
+    RSS avant/après chaque requête HTTP (réponse comprise) et déclenchement
+    du recyclage. N'est installé qu'avec DEKU_ADMIN_TOKEN ou une limite de
+    recyclage. Les requêtes concurrentes se partagent le même RSS : le delta
+    d'une requête isolée est fiable, celui d'un pic de trafic l'est moins.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        rss_before = current_rss()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            MEMORY.record(scope["method"], route_template(scope), status, rss_before, current_rss(),
+                          time.perf_counter() - started)
+
+
+if MEMORY_TRACKING:
+    app.add_middleware(MemoryMiddleware)
+
+
+# ==========================
+# Canonicalisation des URL (plateforme, id vidéo, clé de cache)
+# ==========================
+
+class CanonicalURL(NamedTuple):
+    platform: str
+    video_id: str | None
+    key: str
+
+
+# Suffixe d'hôte -> plateforme ; m.youtube.com, www.x.com... retombent sur
+# leur domaine, « notx.com » ne correspond à rien.
+PLATFORM_HOSTS = {
+    "youtube.com": "youtube",
+    "youtu.be": "youtube",
+    "youtube-nocookie.com": "youtube",
+    "tiktok.com": "tiktok",
+    "instagram.com": "instagram",
+    "instagr.am": "instagram",
+    "facebook.com": "facebook",
+    "fb.com": "facebook",
+    "fb.watch": "facebook",
+    "pinterest.com": "pinterest",
+    "pin.it": "pinterest",
+    "twitter.com": "twitter",
+    "x.com": "twitter",
+}
+# Domaines nationaux de Pinterest (pinterest.fr, pinterest.co.uk...)
+PINTEREST_HOST = re.compile(r"(?:^|\.)pinterest\.(?:com?\.)?[a-z]{2,3}$")
+
+# Motifs de chemin par plateforme : groupe « id » (id vidéo stable) ou
+# « short » (code de lien court, résolu seulement par yt-dlp)
+VIDEO_ID_PATTERNS = {
+    "youtube": (
+        # /embed/videoseries?list=... est une playlist, pas un id vidéo
+        re.compile(r"^/(?:shorts|embed|v|e|live)/(?!videoseries(?:/|$))(?P<id>[\w-]{11})(?:/|$)"),
+    ),
+    "tiktok": (
+        re.compile(r"^/@[^/]+/(?:video|photo)/(?P<id>\d+)"),
+        re.compile(r"^/(?:v|embed|embed/v2)/(?P<id>\d+)"),
+        re.compile(r"^/t/(?P<short>[\w-]+)"),
+    ),
+    "instagram": (
+        re.compile(r"^/(?:[\w.]+/)?(?:p|reels?|tv)/(?P<id>[\w-]+)"),
+    ),
+    "facebook": (
+        re.compile(r"^/(?:[^/]+/)?videos/(?:[^/]+/)?(?P<id>\d+)"),
+        re.compile(r"^/reel/(?P<id>\d+)"),
+        re.compile(r"^/share/[vr]/(?P<short>[\w-]+)"),
+    ),
+    "twitter": (
+        re.compile(r"^/(?:[^/]+|i/web)/status(?:es)?/(?P<id>\d+)"),
+    ),
+    "pinterest": (
+        re.compile(r"^/pin/(?:[\w-]*--)?(?P<id>\d+)"),
+    ),
+}
+HOST_ID_PATTERNS = {
+    "youtu.be": re.compile(r"^/(?!videoseries(?:/|$))(?P<id>[\w-]{11})(?:/|$)"),
+    "vm.tiktok.com": re.compile(r"^/(?P<short>[\w-]+)"),
+    "vt.tiktok.com": re.compile(r"^/(?P<short>[\w-]+)"),
+    "fb.watch": re.compile(r"^/(?P<short>[\w-]+)"),
+    "pin.it": re.compile(r"^/(?P<short>[\w-]+)"),
+}
+# Id passé en paramètre : (plateforme, chemin) -> (paramètre, motif)
+QUERY_ID_PARAMS = {
+    ("youtube", "/watch"): ("v", re.compile(r"^[\w-]{11}$")),
+    ("youtube", "/watch/"): ("v", re.compile(r"^[\w-]{11}$")),
+    ("facebook", "/watch"): ("v", re.compile(r"^\d+$")),
+    ("facebook", "/watch/"): ("v", re.compile(r"^\d+$")),
+    ("facebook", "/video.php"): ("v", re.compile(r"^\d+$")),
+}
+
+# Paramètres de suivi, sans effet sur le média
+TRACKING_PARAMS = frozenset({
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid",
+    "igshid", "igsh", "mc_cid", "mc_eid", "_ga",
+})
+PLATFORM_TRACKING_PARAMS = {
+    "youtube": frozenset({"si", "feature", "pp", "ab_channel", "embeds_referring_euri", "source_ve_path"}),
+    "tiktok": frozenset({"_r", "_t", "is_from_webapp", "sender_device", "is_copy_url", "web_id"}),
+    "instagram": frozenset({"hl"}),
+    "facebook": frozenset({"mibextid", "rdid", "sfnsn", "ref", "__cft__[0]", "__tn__"}),
+    "twitter": frozenset({"s", "t", "ref_src", "ref_url"}),
+    "pinterest": frozenset({"invite_code", "sender", "sfo"}),
+}
+
+
+def host_platform(host: str) -> str:
+    """
+    Plateforme d'un hôte (minuscules) par recherche de ses suffixes.
+    """
+    suffix = host
+    while suffix:
+        platform = PLATFORM_HOSTS.get(suffix)
+        if platform is not None:
+            return platform
+        _, _, suffix = suffix.partition(".")
+    if PINTEREST_HOST.search(host):
         return "pinterest"
-    if "twitter.com" in u or "x.com" in u:
-        return "twitter"
     return "unknown"
 
 
-def get_video_info(url: str) -> dict:
+def extract_video_id(platform: str, host: str, path: str, params: list[tuple[str, str]]) -> tuple[str | None, str | None]:
     """
-    Analyse une URL et retourne les infos + formats.
+    (id vidéo, code de lien court) lus dans l'URL, sans appel à yt-dlp.
     """
-    ydl_opts = {
+    pattern = HOST_ID_PATTERNS.get(host)
+    patterns = (pattern,) if pattern is not None else VIDEO_ID_PATTERNS.get(platform, ())
+    for pattern in patterns:
+        match = pattern.match(path)
+        if match:
+            groups = match.groupdict()
+            return groups.get("id"), groups.get("short")
+
+    query_id = QUERY_ID_PARAMS.get((platform, path))
+    if query_id is not None:
+        name, valid = query_id
+        for key, value in params:
+            if key == name and valid.match(value):
+                return value, None
+    return None, None
+
+
+@lru_cache(maxsize=8192)
+def canonicalize(url: str) -> CanonicalURL:
+    """
+    Plateforme, id vidéo et clé canonique d'une URL, sans réseau.
+    Clé « youtube:<id> » quand l'id est reconnu (youtu.be, watch, shorts...
+    donnent la même clé), « tiktok:short:<code> » pour un lien court, sinon
+    l'URL normalisée : schéma/hôte en minuscules, port par défaut, fragment,
+    ordre des paramètres et paramètres de suivi ignorés.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower().rstrip(".")
+    path = parts.path or "/"
+    params = parse_qsl(parts.query, keep_blank_values=True)
+    platform = host_platform(host)
+
+    if platform != "unknown":
+        video_id, short = extract_video_id(platform, host.removeprefix("www."), path, params)
+        if video_id is not None:
+            return CanonicalURL(platform, video_id, f"{platform}:{video_id}")
+        if short is not None:
+            return CanonicalURL(platform, None, f"{platform}:short:{short}")
+
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host
+    if port and (scheme, port) not in (("http", 80), ("https", 443)):
+        netloc = f"{host}:{port}"
+    tracking = PLATFORM_TRACKING_PARAMS.get(platform, frozenset())
+    query = urlencode(sorted(
+        (k, v) for k, v in params
+        if k not in TRACKING_PARAMS and k not in tracking and not k.startswith("utm_")
+    ))
+    return CanonicalURL(platform, None, urlunsplit((scheme, netloc, path, query, "")))
+
+
+def canonical_key(url: str) -> str:
+    """
+    Clé de cache / déduplication : deux liens vers le même média ont la même clé.
+    """
+    return canonicalize(url).key
+
+
+# ==========================
+# Stockage persistant des analyses (SQLite)
+# ==========================
+
+class MetadataStore(_Stats):
+    """
+    Résultats de get_video_info persistés dans SQLite (mode WAL) : partagés
+    par tous les workers uvicorn et conservés entre les redémarrages.
+    Clé canonique -> JSON compressé (zlib) + date d'expiration absolue.
+    Lectures concurrentes sur un petit pool borné de connexions ;
+    écritures mises en file et appliquées par lots, dans une seule
+    transaction, par un thread unique qui purge aussi les lignes expirées.
+    Le schéma (et le mode WAL, persistant) est créé une seule fois.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS metadata ("
+        " key TEXT PRIMARY KEY, expires REAL NOT NULL, info BLOB NOT NULL"
+        ") WITHOUT ROWID",
+        "CREATE INDEX IF NOT EXISTS metadata_expires ON metadata (expires)",
+    )
+    MAX_BATCH = 500
+    PURGE_CHUNK = 1000
+
+    def __init__(self, path: str, flush_interval: float, purge_interval: float,
+                 queue_size: int = 10000, max_readers: int = 8):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.purge_interval = purge_interval
+        self.max_readers = max_readers
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._readers: queue.LifoQueue = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(max_readers)
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "batches": 0,
+            "purged": 0,
+            "dropped": 0,
+            "errors": 0,
+            "last_error": None,
+        }
+
+    def _connect(self, isolation_level: str | None) -> sqlite3.Connection:
+        with self._schema_lock:
+            if not self._schema_ready:
+                conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+                try:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    for statement in self.SCHEMA:
+                        conn.execute(statement)
+                finally:
+                    conn.close()
+                self._schema_ready = True
+        # Une connexion n'est utilisée que par un thread à la fois (pool)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=isolation_level, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _reader(self):
+        """
+        Emprunte une connexion de lecture (au plus max_readers ouvertes).
+        """
+        self._reader_slots.acquire()
+        try:
+            try:
+                conn = self._readers.get_nowait()
+            except queue.Empty:
+                conn = self._connect(None)
+            try:
+                yield conn
+            finally:
+                self._readers.put(conn)
+        finally:
+            self._reader_slots.release()
+
+    def _close_readers(self) -> None:
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _error(self, e: Exception) -> None:
+        with self._lock:
+            self._stats["errors"] += 1
+            self._stats["last_error"] = repr(e)
+
+    def get(self, key: str) -> tuple[dict, float] | None:
+        """
+        (valeur, TTL restant en secondes) si la clé est présente et fraîche.
+        """
+        try:
+            with self._reader() as conn:
+                row = conn.execute("SELECT expires, info FROM metadata WHERE key = ?", (key,)).fetchone()
+            ttl = row[0] - time.time() if row is not None else 0
+            if ttl <= 0:
+                self._count(misses=1)
+                return None
+            value = json.loads(zlib.decompress(row[1]))
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            self._error(e)
+            return None
+        self._count(hits=1)
+        return value, ttl
+
+    def put(self, key: str, value: dict, ttl: float) -> None:
+        self._enqueue(("put", key, time.time() + ttl, value))
+
+    def delete(self, key: str) -> None:
+        self._enqueue(("delete", key))
+
+    def _enqueue(self, op: tuple) -> None:
+        try:
+            self._queue.put_nowait(op)
+        except queue.Full:
+            self._count(dropped=1)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="deku-metadata-store", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Applique les écritures en attente puis arrête le thread ; ferme
+        les connexions de lecture.
+        """
+        self._close_readers()
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def _run(self) -> None:
+        conn = self._connect("DEFERRED")
+        next_purge = time.monotonic()
+        running = True
+        while running:
+            batch, running = self._next_batch()
+            if batch:
+                try:
+                    self._write(conn, batch)
+                except sqlite3.Error as e:
+                    self._error(e)
+            if time.monotonic() >= next_purge:
+                try:
+                    self._purge(conn)
+                except sqlite3.Error as e:
+                    self._error(e)
+                next_purge = time.monotonic() + self.purge_interval
+        conn.close()
+
+    def _next_batch(self) -> tuple[list, bool]:
+        """
+        Attend une opération, puis regroupe celles qui arrivent pendant
+        flush_interval (au plus MAX_BATCH). Retourne (lot, continuer).
+        """
+        try:
+            op = self._queue.get(timeout=max(0.1, self.purge_interval))
+        except queue.Empty:
+            return [], True
+        if op is None:
+            return [], False
+        batch = [op]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.MAX_BATCH:
+            try:
+                op = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if op is None:
+                return batch, False
+            batch.append(op)
+        return batch, True
+
+    def _write(self, conn: sqlite3.Connection, batch: list) -> None:
+        rows = []
+        for op in batch:
+            if op[0] == "put":
+                _, key, expires, value = op
+                blob = zlib.compress(json.dumps(value, default=str, separators=(",", ":")).encode(), 1)
+                rows.append(("put", key, expires, blob))
+            else:
+                rows.append(op)
+        with conn:
+            for op in rows:
+                if op[0] == "put":
+                    conn.execute("INSERT OR REPLACE INTO metadata (key, expires, info) VALUES (?, ?, ?)", op[1:])
+                else:
+                    conn.execute("DELETE FROM metadata WHERE key = ?", (op[1],))
+        self._count(writes=len(rows), batches=1)
+
+    def _purge(self, conn: sqlite3.Connection) -> None:
+        """
+        Supprime les lignes expirées par tranches (verrou d'écriture court).
+        """
+        while True:
+            with conn:
+                deleted = conn.execute(
+                    "DELETE FROM metadata WHERE key IN "
+                    "(SELECT key FROM metadata WHERE expires <= ? LIMIT ?)",
+                    (time.time(), self.PURGE_CHUNK),
+                ).rowcount
+            self._count(purged=deleted)
+            if deleted < self.PURGE_CHUNK:
+                return
+
+    def stats(self) -> dict:
+        size = 0
+        for suffix in ("", "-wal"):
+            try:
+                size += os.path.getsize(self.path + suffix)
+            except OSError:
+                pass
+        with self._lock:
+            return {
+                "path": self.path,
+                "file_bytes": size,
+                "pending_writes": self._queue.qsize(),
+                "idle_readers": self._readers.qsize(),
+                **self._stats,
+            }
+
+
+METADATA_STORE = (
+    MetadataStore(METADATA_STORE_PATH, METADATA_STORE_FLUSH_INTERVAL, METADATA_STORE_PURGE_INTERVAL)
+    if METADATA_STORE_PATH and not EXTRACTION_WORKER else None
+)
+
+
+# ==========================
+# Cache mémoire (TTL / LRU / single-flight)
+# ==========================
+
+def approx_size(value) -> int:
+    """
+    Taille approximative (en octets) d'une valeur JSON-sérialisable.
+    """
+    return len(json.dumps(value, default=str, separators=(",", ":")))
+
+
+class _Flight:
+    """
+    Appel en cours partagé entre plusieurs demandeurs de la même clé.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: BaseException | None = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class TTLCache:
+    """
+    Cache LRU avec expiration, borné en nombre d'entrées et en octets.
+    get_or_load() regroupe les chargements concurrents d'une même clé :
+    N demandes simultanées ne déclenchent qu'un seul appel au loader.
+    Avec store (MetadataStore), un défaut est d'abord cherché dans le
+    stockage persistant, et chaque valeur chargée y est écrite.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int, sizeof=approx_size, store=None):
+        self.ttl = ttl
+        self.store = store
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._lock = threading.Lock()
+        self._data: OrderedDict[str, tuple[float, int, object]] = OrderedDict()
+        self._inflight: dict[str, _Flight] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.store_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._get_locked(key, time.monotonic())
+        if value is None and self.store is not None:
+            stored = self.store.get(key)
+            if stored is not None:
+                value, ttl = stored
+                size = self._sizeof(value)
+                with self._lock:
+                    self.store_hits += 1
+                    self._put_locked(key, value, size, ttl)
+        return value
+
+    def _get_locked(self, key: str, now: float):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, _, value = entry
+        if expires_at <= now:
+            self._pop_locked(key)
+            self.expirations += 1
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key: str, value) -> None:
+        size = self._sizeof(value)
+        with self._lock:
+            self._put_locked(key, value, size)
+
+    def _put_locked(self, key: str, value, size: int, ttl: float | None = None) -> None:
+        if key in self._data:
+            self._pop_locked(key)
+        if size > self.max_bytes:
+            return
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), size, value)
+        self._bytes += size
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._pop_locked(oldest)
+            self.evictions += 1
+
+    def _pop_locked(self, key: str) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            if key in self._data:
+                self._pop_locked(key)
+        if self.store is not None:
+            self.store.delete(key)
+
+    def get_or_load(self, key: str, loader):
+        with self._lock:
+            value = self._get_locked(key, time.monotonic())
+            if value is not None:
+                self.hits += 1
+                return value
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return flight.wait()
+
+        try:
+            stored = self.store.get(key) if self.store is not None else None
+            if stored is not None:
+                value, ttl = stored
+            else:
+                value, ttl = loader(), self.ttl
+                if self.store is not None:
+                    self.store.put(key, value, ttl)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            flight.error = e
+            flight.done.set()
+            raise
+
+        size = self._sizeof(value)
+        with self._lock:
+            if stored is not None:
+                self.store_hits += 1
+            self._put_locked(key, value, size, ttl)
+            del self._inflight[key]
+        flight.value = value
+        flight.done.set()
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "store_hits": self.store_hits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "inflight": len(self._inflight),
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else None,
+            }
+
+
+METADATA_CACHE = TTLCache(
+    ttl=METADATA_CACHE_TTL,
+    max_entries=METADATA_CACHE_MAX_ENTRIES,
+    max_bytes=METADATA_CACHE_MAX_BYTES,
+    store=METADATA_STORE,
+)
+
+
+# ==========================
+# Cache disque des médias (adressé par contenu)
+# ==========================
+
+class MediaCache:
+    """
+    Cache disque adressé par contenu : extracteur + id vidéo + format_id.
+    Chaque entrée est un dossier <root>/<aa>/<clé>/ contenant le média et un
+    meta.json. Le dossier est préparé à part puis renommé d'un bloc, donc un
+    fichier partiel n'est jamais servi. L'éviction est LRU (mtime de meta.json,
+    rafraîchi à chaque hit) dans la limite de max_bytes ; une entrée utilisée
+    depuis moins de grace secondes est épargnée, pour qu'un chemin rendu par
+    find() soit encore là quand la réponse l'ouvre.
+    """
+
+    META_NAME = "meta.json"
+
+    def __init__(self, root: Path, max_bytes: int, grace: float = 30.0, load: bool = True):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.grace = grace
+        self._staging = root / ".staging"
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._aliases: dict[tuple[str, str], str] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.evictions_deferred = 0
+        if load:
+            self._staging.mkdir(parents=True, exist_ok=True)
+            self._load_index()
+
+    @staticmethod
+    def make_key(extractor: str | None, video_id: str | None, format_id: str) -> str | None:
+        if not extractor or not video_id:
+            return None
+        raw = f"{extractor.lower()}:{video_id}:{format_id}"
+        return hashlib.sha256(raw.encode()).hexdigest()[:40]
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def _iter_entries(self):
+        for shard in self.root.iterdir():
+            if shard.name.startswith(".") or not shard.is_dir():
+                continue
+            yield from (e for e in shard.iterdir() if e.is_dir())
+
+    def _read_meta(self, entry: Path) -> dict | None:
+        try:
+            return json.loads((entry / self.META_NAME).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _load_index(self) -> None:
+        total = 0
+        for entry in self._iter_entries():
+            meta = self._read_meta(entry)
+            if not meta:
+                continue
+            total += meta.get("size", 0)
+            for url_key in meta.get("urls", []):
+                self._aliases[(url_key, meta["format_id"])] = entry.name
+        self._bytes = total
+
+    def _path_for(self, key: str) -> Path | None:
+        entry = self._entry_dir(key)
+        meta = self._read_meta(entry)
+        if not meta:
+            return None
+        path = entry / meta["filename"]
+        if not path.is_file():
+            return None
+        self._touch(entry)
+        return path
+
+    def _touch(self, entry: Path) -> None:
+        try:
+            os.utime(entry / self.META_NAME)
+        except OSError:
+            pass
+
+    def touch(self, path: Path) -> None:
+        """
+        Marque comme utilisée l'entrée qui contient path (sans effet hors
+        du cache), avant de la servir hors de find().
+        """
+        if path.parent.parent.parent == self.root:
+            self._touch(path.parent)
+
+    def find(self, url_key: str, format_id: str, key: str | None = None) -> Path | None:
+        """
+        Cherche une entrée par clé de contenu, sinon par URL déjà vue
+        (aucun appel yt-dlp dans les deux cas).
+        """
+        alias = self._aliases.get((url_key, format_id))
+        for candidate in (key, alias):
+            if candidate is None:
+                continue
+            path = self._path_for(candidate)
+            if path is not None:
+                with self._lock:
+                    self.hits += 1
+                    self._aliases[(url_key, format_id)] = candidate
+                return path
+        with self._lock:
+            self.misses += 1
+            if alias is not None:
+                self._aliases.pop((url_key, format_id), None)
+        return None
+
+    def commit(self, key: str, src: Path, url_key: str, format_id: str) -> Path:
+        """
+        Déplace src dans le cache et retourne le chemin définitif.
+        Un fichier plus gros que le budget n'est pas mis en cache.
+        """
+        size = src.stat().st_size
+        if size > self.max_bytes:
+            return src
+
+        staging = Path(tempfile.mkdtemp(dir=self._staging))
+        os.replace(src, staging / src.name)
+        meta = {
+            "key": key,
+            "format_id": format_id,
+            "filename": src.name,
+            "size": size,
+            "urls": [url_key],
+            "created": time.time(),
+        }
+        (staging / self.META_NAME).write_text(json.dumps(meta))
+
+        entry = self._entry_dir(key)
+        entry.parent.mkdir(exist_ok=True)
+        try:
+            os.rename(staging, entry)
+        except OSError:
+            # Un autre téléchargement du même contenu a gagné la course
+            shutil.rmtree(staging, ignore_errors=True)
+            path = self._path_for(key)
+            if path is None:
+                raise
+        else:
+            path = entry / src.name
+            with self._lock:
+                self.stores += 1
+                self._bytes += size
+
+        with self._lock:
+            self._aliases[(url_key, format_id)] = key
+        self.enforce_budget(protect={key})
+        return path
+
+    def _remove_entry(self, entry: Path) -> bool:
+        trash = self._staging / f"trash-{uuid.uuid4()}"
+        try:
+            os.rename(entry, trash)
+        except OSError:
+            return False
+        shutil.rmtree(trash, ignore_errors=True)
+        with self._lock:
+            self._aliases = {k: v for k, v in self._aliases.items() if v != entry.name}
+        return True
+
+    def enforce_budget(self, protect=(), max_bytes: int | None = None) -> int:
+        """
+        Évince les entrées les moins récemment utilisées jusqu'à repasser
+        sous le budget. Retourne le nombre d'octets libérés.
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        with self._evict_lock:
+            entries = []
+            total = 0
+            for entry in self._iter_entries():
+                try:
+                    last_used = (entry / self.META_NAME).stat().st_mtime
+                    size = sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+                except OSError:
+                    continue
+                entries.append((last_used, size, entry))
+                total += size
+
+            freed = 0
+            recent = time.time() - self.grace
+            entries.sort(key=lambda e: e[0])
+            for last_used, size, entry in entries:
+                if total <= limit:
+                    break
+                if entry.name in protect:
+                    continue
+                if last_used >= recent:
+                    # Peut-être en cours d'ouverture : évincée au prochain passage
+                    with self._lock:
+                        self.evictions_deferred += 1
+                    continue
+                if self._remove_entry(entry):
+                    total -= size
+                    freed += size
+                    with self._lock:
+                        self.evictions += 1
+                        self.evicted_bytes += size
+
+            with self._lock:
+                self._bytes = total
+            return freed
+
+    def etag_for(self, path: Path) -> str | None:
+        """
+        ETag fort d'un fichier du cache : clé de contenu (extracteur, id,
+        format) + taille + date d'écriture, stable tant que l'entrée vit.
+        None si le fichier n'est pas une entrée du cache.
+        """
+        entry = path.parent
+        if entry.parent.parent != self.root:
+            return None
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return f'"{entry.name[:20]}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+    def evict_idle(self, max_idle: float) -> tuple[int, int]:
+        """
+        Supprime les entrées inutilisées depuis plus de max_idle secondes.
+        Retourne (entrées supprimées, octets libérés).
+        """
+        cutoff = time.time() - max(max_idle, self.grace)
+        removed = freed = 0
+        with self._evict_lock:
+            for entry in list(self._iter_entries()):
+                try:
+                    if (entry / self.META_NAME).stat().st_mtime >= cutoff:
+                        continue
+                    size = sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+                except OSError:
+                    continue
+                if self._remove_entry(entry):
+                    removed += 1
+                    freed += size
+            with self._lock:
+                self._bytes -= freed
+        return removed, freed
+
+    def clean_staging(self, max_age: float) -> int:
+        """
+        Supprime les dossiers de préparation abandonnés (crash pendant un commit).
+        """
+        cutoff = time.time() - max_age
+        removed = 0
+        for child in self._staging.iterdir():
+            try:
+                if child.stat().st_mtime >= cutoff:
+                    continue
+            except OSError:
+                continue
+            shutil.rmtree(child, ignore_errors=True)
+            removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "aliases": len(self._aliases),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "evicted_bytes": self.evicted_bytes,
+                "evictions_deferred": self.evictions_deferred,
+            }
+
+
+MEDIA_CACHE = MediaCache(MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_BYTES, MEDIA_CACHE_EVICTION_GRACE,
+                         load=not EXTRACTION_WORKER)
+
+
+# ==========================
+# Baux de téléchargement (single-flight inter-processus)
+# ==========================
+
+class DownloadLease:
+    """
+    Bail détenu sur un téléchargement. previous est l'état laissé par le
+    détenteur précédent (None s'il n'y en a pas eu), waited indique si
+    l'acquisition a dû attendre.
+    """
+
+    def __init__(self, leases: "DownloadLeases", name: str, fd: int | None,
+                 previous: dict | None, waited: bool):
+        self.leases = leases
+        self.name = name
+        self.fd = fd
+        self.previous = previous
+        self.waited = waited
+        self.state = {"pid": os.getpid(), "host": socket.gethostname(), "acquired": time.time()}
+
+    def update(self, **fields) -> None:
+        self.state.update(fields, updated=time.time())
+        self.leases.write_state(self.name, self.state)
+
+    def publish_progress(self, d: dict) -> None:
+        """
+        Hook de progression yt-dlp : publie (une fois) le fichier en cours
+        d'écriture pour les lecteurs qui suivent le téléchargement.
+        """
+        if "tmpfilename" not in self.state and d.get("tmpfilename"):
+            self.update(
+                filename=os.path.abspath(d.get("filename") or d["tmpfilename"]),
+                tmpfilename=os.path.abspath(d["tmpfilename"]),
+            )
+
+    def release(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)  # libère aussi le verrou flock
+            self.fd = None
+
+
+class DownloadLeases(_Stats):
+    """
+    Un seul téléchargement à la fois par (clé canonique, format_id), entre
+    threads comme entre workers uvicorn : verrou flock exclusif sur
+    <root>/<nom>.lock, état du bail (pid, hôte, dossier temporaire, clé du
+    résultat) dans <nom>.json. Les autres demandeurs sondent le verrou puis
+    servent le résultat depuis MEDIA_CACHE.
+    Si le détenteur meurt en cours de route, le noyau libère son verrou : le
+    suivant reprend le bail (bail orphelin) et relance le téléchargement.
+    flock n'est fiable que sur un disque local (pas NFS).
+    """
+
+    def __init__(self, root: Path, poll_interval: float, max_wait: float, create: bool = True):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+        if create:
+            self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = {
+            "acquired": 0,
+            "waited": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+            "stale_recovered": 0,
+            "removed": 0,
+        }
+
+    @staticmethod
+    def name_for(url_key: str, format_id: str) -> str:
+        return hashlib.sha256(f"{url_key}\0{format_id}".encode()).hexdigest()[:32]
+
+    def read_state(self, name: str) -> dict | None:
+        try:
+            return json.loads((self.root / f"{name}.json").read_text())
+        except (OSError, ValueError):
+            return None
+
+    def write_state(self, name: str, state: dict) -> None:
+        tmp = self.root / f".{name}.{uuid.uuid4().hex[:8]}.tmp"
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, self.root / f"{name}.json")
+
+    def _try_lock(self, path: Path) -> int | None:
+        """
+        Verrou non bloquant ; None si un autre le détient. Le fichier a pu
+        être supprimé par clean() entre open et flock : on vérifie que le
+        verrou porte bien sur le fichier en place.
+        """
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if os.stat(path).st_ino == os.fstat(fd).st_ino:
+                return fd
+        except (BlockingIOError, FileNotFoundError):
+            pass
+        os.close(fd)
+        return None
+
+    def acquire(self, url_key: str, format_id: str) -> DownloadLease:
+        """
+        Lève TimeoutError au-delà de max_wait secondes d'attente.
+        """
+        name = self.name_for(url_key, format_id)
+        if fcntl is None:
+            return DownloadLease(self, name, None, None, False)
+
+        path = self.root / f"{name}.lock"
+        started = time.monotonic()
+        waited = False
+        while True:
+            fd = self._try_lock(path)
+            if fd is not None:
+                break
+            if time.monotonic() - started > self.max_wait:
+                self._count(timeouts=1)
+                raise TimeoutError("Téléchargement concurrent du même média trop long.")
+            waited = True
+            time.sleep(self.poll_interval)
+
+        previous = self.read_state(name)
+        stale = previous is not None and previous.get("state") == "downloading"
+        self._count(
+            acquired=1,
+            waited=int(waited),
+            wait_seconds=time.monotonic() - started if waited else 0.0,
+            stale_recovered=int(stale),
+        )
+        lease = DownloadLease(self, name, fd, previous, waited)
+        # L'état n'est écrit qu'au début du téléchargement : celui du
+        # détenteur précédent (clé du résultat) reste lisible d'ici là
+        lease.state.update(url_key=url_key, format_id=format_id)
+        return lease
+
+    def active(self, url_key: str, format_id: str) -> dict | None:
+        """
+        État du téléchargement en cours pour (url_key, format_id), ou None si
+        aucun détenteur vivant ne télécharge.
+        """
+        if fcntl is None:
+            return None
+        name = self.name_for(url_key, format_id)
+        state = self.read_state(name)
+        if state is None or state.get("state") != "downloading":
+            return None
+        fd = self._try_lock(self.root / f"{name}.lock")
+        if fd is not None:  # verrou libre : détenteur mort ou terminé
+            os.close(fd)
+            return None
+        return state
+
+    @contextmanager
+    def hold(self, url_key: str, format_id: str):
+        lease = self.acquire(url_key, format_id)
+        try:
+            yield lease
+        finally:
+            lease.release()
+
+    def clean(self, max_age: float) -> int:
+        """
+        Supprime les baux libres inactifs depuis max_age secondes.
+        """
+        if fcntl is None:
+            return 0
+        removed = 0
+        cutoff = time.time() - max_age
+        for path in self.root.glob("*.lock"):
+            try:
+                if path.stat().st_mtime > cutoff:
+                    continue
+                state = path.with_suffix(".json")
+                if state.exists() and state.stat().st_mtime > cutoff:
+                    continue
+            except OSError:
+                continue
+            fd = self._try_lock(path)
+            if fd is None:
+                continue
+            try:
+                path.with_suffix(".json").unlink(missing_ok=True)
+                path.unlink(missing_ok=True)
+                removed += 1
+            finally:
+                os.close(fd)
+        for tmp in self.root.glob(".*.tmp"):
+            try:
+                if tmp.stat().st_mtime <= cutoff:
+                    tmp.unlink()
+            except OSError:
+                pass
+        self._count(removed=removed)
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        stats["enabled"] = fcntl is not None
+        return stats
+
+
+DOWNLOAD_LEASES = DownloadLeases(LEASE_DIR, LEASE_POLL_INTERVAL, LEASE_MAX_WAIT, create=not EXTRACTION_WORKER)
+
+
+# ==========================
+# Ménage de DOWNLOAD_DIR (tâche de fond)
+# ==========================
+
+ORPHAN_SUFFIXES = (".part", ".ytdl")
+
+
+def remove_tree(path: Path) -> None:
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def is_temp_dir(path: Path) -> bool:
+    """
+    Dossier temporaire de téléchargement (DOWNLOAD_DIR/<uuid4>).
+    """
+    try:
+        uuid.UUID(path.name)
+    except ValueError:
+        return False
+    return path.is_dir()
+
+
+def is_orphan_candidate(path: Path) -> bool:
+    name = path.name
+    return name.endswith(ORPHAN_SUFFIXES) or ".part-Frag" in name
+
+
+def tree_usage(path: Path) -> tuple[int, float]:
+    """
+    Retourne (octets, dernière modification) pour un dossier.
+    """
+    total = 0
+    last = path.stat().st_mtime
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            total += st.st_size
+            last = max(last, st.st_mtime)
+    return total, last
+
+
+class Janitor(_Stats):
+    """
+    Balayage périodique de DOWNLOAD_DIR dans un thread de fond :
+    - dossiers temporaires inactifs depuis temp_max_age supprimés ;
+    - fichiers .part/.ytdl orphelins (inactifs depuis orphan_max_age) supprimés ;
+    - entrées du cache inutilisées depuis cache_max_age évincées ;
+    - baux de téléchargement libres depuis orphan_max_age supprimés ;
+    - taille totale ramenée sous max_bytes, et espace libre remonté à
+      target_free_bytes dès qu'il passe sous min_free_bytes (éviction LRU).
+    """
+
+    def __init__(self, root: Path, cache: MediaCache, leases: DownloadLeases, interval: float,
+                 temp_max_age: float, orphan_max_age: float, cache_max_age: float, max_bytes: int,
+                 min_free_bytes: int, target_free_bytes: int):
+        self.root = root
+        self.cache = cache
+        self.leases = leases
+        self.interval = interval
+        self.temp_max_age = temp_max_age
+        self.orphan_max_age = orphan_max_age
+        self.cache_max_age = cache_max_age
+        self.max_bytes = max_bytes
+        self.min_free_bytes = min_free_bytes
+        self.target_free_bytes = target_free_bytes
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._stats = {
+            "runs": 0,
+            "errors": 0,
+            "last_error": None,
+            "last_run": None,
+            "last_duration_ms": None,
+            "temp_dirs_removed": 0,
+            "orphans_removed": 0,
+            "cache_entries_expired": 0,
+            "leases_removed": 0,
+            "bytes_freed": 0,
+            "download_dir_bytes": None,
+            "disk_free_bytes": None,
+            "disk_total_bytes": None,
+        }
+
+    def start(self) -> None:
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="deku-janitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                with self._lock:
+                    self._stats["errors"] += 1
+                    self._stats["last_error"] = repr(e)
+            self._stop.wait(self.interval)
+
+    def sweep(self) -> None:
+        started = time.monotonic()
+        now = time.time()
+        temp_bytes = 0
+
+        for child in list(self.root.iterdir()):
+            if not is_temp_dir(child):
+                continue
+            try:
+                size, last = tree_usage(child)
+            except OSError:
+                continue
+            if now - last > self.temp_max_age:
+                remove_tree(child)
+                self._count(temp_dirs_removed=1, bytes_freed=size)
+                continue
+            temp_bytes += size - self._remove_orphans(child, now)
+
+        self.cache.clean_staging(self.orphan_max_age)
+        self._count(leases_removed=self.leases.clean(self.orphan_max_age))
+        expired, freed = self.cache.evict_idle(self.cache_max_age)
+        self._count(cache_entries_expired=expired, bytes_freed=freed)
+
+        self.cache.enforce_budget()
+        cache_bytes = self.cache.stats()["bytes"]
+        if temp_bytes + cache_bytes > self.max_bytes:
+            self._count(bytes_freed=self.cache.enforce_budget(
+                max_bytes=max(0, self.max_bytes - temp_bytes)))
+            cache_bytes = self.cache.stats()["bytes"]
+
+        usage = shutil.disk_usage(self.root)
+        if usage.free < self.min_free_bytes:
+            needed = self.target_free_bytes - usage.free
+            self._count(bytes_freed=self.cache.enforce_budget(
+                max_bytes=max(0, cache_bytes - needed)))
+            usage = shutil.disk_usage(self.root)
+
+        with self._lock:
+            self._stats["runs"] += 1
+            self._stats["last_run"] = now
+            self._stats["last_duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+            self._stats["download_dir_bytes"] = temp_bytes + self.cache.stats()["bytes"]
+            self._stats["disk_free_bytes"] = usage.free
+            self._stats["disk_total_bytes"] = usage.total
+
+    def _remove_orphans(self, temp_dir: Path, now: float) -> int:
+        freed = 0
+        for path in temp_dir.rglob("*"):
+            if not is_orphan_candidate(path):
+                continue
+            try:
+                st = path.stat()
+                if now - st.st_mtime <= self.orphan_max_age:
+                    continue
+                path.unlink()
+            except OSError:
+                continue
+            freed += st.st_size
+            self._count(orphans_removed=1, bytes_freed=st.st_size)
+        return freed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+JANITOR = Janitor(
+    DOWNLOAD_DIR,
+    MEDIA_CACHE,
+    DOWNLOAD_LEASES,
+    interval=JANITOR_INTERVAL,
+    temp_max_age=JANITOR_TEMP_MAX_AGE,
+    orphan_max_age=JANITOR_ORPHAN_MAX_AGE,
+    cache_max_age=JANITOR_CACHE_MAX_AGE,
+    max_bytes=JANITOR_MAX_BYTES,
+    min_free_bytes=JANITOR_MIN_FREE_BYTES,
+    target_free_bytes=JANITOR_TARGET_FREE_BYTES,
+)
+
+
+# ==========================
+# Ordonnanceur par plateforme
+# ==========================
+
+class _Bucket:
+    """
+    File d'attente d'une plateforme : plafond de concurrence, seau à jetons
+    (rps requêtes/s, rafale de max(1, rps)) et poids pour le tourniquet.
+    """
+
+    def __init__(self, name: str, concurrency: int, rps: float, weight: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.rps = rps
+        self.weight = max(1, weight)
+        self.tokens = max(1.0, rps)
+        self.refilled = time.monotonic()
+        self.in_flight = 0
+        self.waiters: deque = deque()
+        self.granted = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def refill(self, now: float) -> None:
+        if self.rps > 0:
+            self.tokens = min(max(1.0, self.rps), self.tokens + (now - self.refilled) * self.rps)
+        self.refilled = now
+
+    def can_start(self) -> bool:
+        return (bool(self.waiters) and self.in_flight < self.concurrency
+                and (self.rps <= 0 or self.tokens >= 1))
+
+
+class _Ticket:
+    def __init__(self):
+        self.event = threading.Event()
+        self.enqueued = time.monotonic()
+
+
+class PlatformScheduler:
+    """
+    Répartit le travail yt-dlp par plateforme (detect_platform).
+    Chaque plateforme a son plafond de concurrence et son débit (rps) ;
+    les places libres du plafond global sont attribuées en tourniquet
+    pondéré, si bien qu'une rafale sur une plateforme n'affame pas les autres.
+    """
+
+    def __init__(self, max_concurrency: int, default_concurrency: int, default_rps: float,
+                 limits: dict, max_wait: float):
+        self.max_concurrency = max_concurrency
+        self.default_concurrency = default_concurrency
+        self.default_rps = default_rps
+        self.limits = limits
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._buckets: dict[str, _Bucket] = {}
+        self._order: list[str] = []
+        self._cursor = 0
+        self._credit = 0
+        self._in_flight = 0
+
+    def _bucket(self, platform: str) -> _Bucket:
+        bucket = self._buckets.get(platform)
+        if bucket is None:
+            conf = self.limits.get(platform, {})
+            bucket = _Bucket(
+                platform,
+                concurrency=int(conf.get("concurrency", self.default_concurrency)),
+                rps=float(conf.get("rps", self.default_rps)),
+                weight=int(conf.get("weight", 1)),
+            )
+            self._buckets[platform] = bucket
+            self._order.append(platform)
+        return bucket
+
+    def _next_ready_locked(self) -> _Bucket | None:
+        """
+        Plateforme servie ensuite. Le curseur reste sur une plateforme pour
+        weight places d'affilée, qu'elles se libèrent d'un coup ou une à
+        une, tant qu'elle a une demande prête ; puis il passe à la suivante.
+        """
+        for _ in range(len(self._order) + 1):
+            bucket = self._buckets[self._order[self._cursor]]
+            if self._credit > 0 and bucket.can_start():
+                return bucket
+            self._cursor = (self._cursor + 1) % len(self._order)
+            self._credit = self._buckets[self._order[self._cursor]].weight
+        return None
+
+    def _dispatch_locked(self) -> None:
+        now = time.monotonic()
+        for bucket in self._buckets.values():
+            bucket.refill(now)
+        while self._in_flight < self.max_concurrency:
+            bucket = self._next_ready_locked()
+            if bucket is None:
+                break
+            self._credit -= 1
+            ticket = bucket.waiters.popleft()
+            bucket.in_flight += 1
+            bucket.tokens -= 1 if bucket.rps > 0 else 0
+            bucket.granted += 1
+            waited = now - ticket.enqueued
+            bucket.wait_total += waited
+            bucket.wait_max = max(bucket.wait_max, waited)
+            self._in_flight += 1
+            ticket.event.set()
+
+    def acquire(self, platform: str) -> None:
+        """
+        Bloque jusqu'à obtenir une place ; lève TimeoutError après max_wait.
+        """
+        ticket = _Ticket()
+        with self._lock:
+            bucket = self._bucket(platform)
+            bucket.waiters.append(ticket)
+            self._dispatch_locked()
+        poll = min(0.1, 1 / bucket.rps) if bucket.rps > 0 else 1.0
+        deadline = ticket.enqueued + self.max_wait
+        while not ticket.event.wait(poll):
+            with self._lock:
+                if ticket.event.is_set():
+                    break
+                if time.monotonic() >= deadline:
+                    bucket.waiters.remove(ticket)
+                    bucket.timeouts += 1
+                    raise TimeoutError(f"File d'attente {platform} saturée.")
+                # Le temps passe : des jetons ont pu être regagnés
+                self._dispatch_locked()
+
+    def release(self, platform: str) -> None:
+        with self._lock:
+            self._buckets[platform].in_flight -= 1
+            self._in_flight -= 1
+            self._dispatch_locked()
+
+    @contextmanager
+    def slot(self, platform: str):
+        self.acquire(platform)
+        try:
+            yield
+        finally:
+            self.release(platform)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "in_flight": self._in_flight,
+                "max_concurrency": self.max_concurrency,
+                "platforms": {
+                    name: {
+                        "queue_depth": len(b.waiters),
+                        "in_flight": b.in_flight,
+                        "concurrency": b.concurrency,
+                        "rps": b.rps,
+                        "weight": b.weight,
+                        "granted": b.granted,
+                        "timeouts": b.timeouts,
+                        "avg_wait_ms": round(b.wait_total / b.granted * 1000, 1) if b.granted else None,
+                        "max_wait_ms": round(b.wait_max * 1000, 1),
+                        "oldest_wait_ms": round((now - b.waiters[0].enqueued) * 1000, 1) if b.waiters else 0,
+                    }
+                    for name, b in self._buckets.items()
+                },
+            }
+
+
+SCHEDULER = PlatformScheduler(
+    max_concurrency=SCHED_MAX_CONCURRENCY,
+    default_concurrency=SCHED_DEFAULT_CONCURRENCY,
+    default_rps=SCHED_DEFAULT_RPS,
+    limits=PLATFORM_LIMITS,
+    max_wait=SCHED_MAX_WAIT,
+)
+
+
+# ==========================
+# Réglages de téléchargement (plateforme, protocole)
+# ==========================
+
+# Réglages par famille de protocole. retry_sleep = (base, plafond) en
+# secondes : attente exponentielle base * 2**n entre deux tentatives.
+DOWNLOAD_TUNING = {
+    "http": {
+        "http_chunk_size": 0,  # une seule requête par fichier
+        "buffersize": 256 * 1024,
+        "retries": 5,
+        "retry_sleep": (1.0, 15.0),
+    },
+    "fragment": {
+        "concurrent_fragment_downloads": 4,
+        "buffersize": 64 * 1024,
+        "fragment_retries": 10,
+        "retries": 3,
+        "retry_sleep": (0.5, 8.0),
+    },
+}
+
+PLATFORM_DOWNLOAD_TUNING = {
+    # Débit bridé par requête au-delà de quelques Mo : morceaux de 10 Mio
+    "youtube": {
+        "http": {"http_chunk_size": 10 * 1024 * 1024},
+        "fragment": {"concurrent_fragment_downloads": 8},
+    },
+    # Petits fichiers, limites de débit strictes : moins d'essais, plus espacés
+    "tiktok": {"http": {"retries": 3, "retry_sleep": (2.0, 30.0)}},
+    "instagram": {"http": {"retries": 3, "retry_sleep": (2.0, 30.0)}},
+    "twitter": {"fragment": {"concurrent_fragment_downloads": 6}},
+}
+
+
+def protocol_family(protocol: str | None) -> str:
+    """
+    "http" si toutes les parties du format sont des flux HTTP progressifs,
+    "fragment" sinon (HLS, DASH, fusion avec une partie fragmentée).
+    """
+    parts = (protocol or "https").split("+")
+    return "http" if all(p in ("http", "https") for p in parts) else "fragment"
+
+
+def download_tuning(platform: str, protocol: str | None) -> dict:
+    """
+    Options yt-dlp pour un format : réglages par défaut de sa famille de
+    protocole, puis ceux de la plateforme, puis DEKU_DOWNLOAD_TUNING.
+    """
+    family = protocol_family(protocol)
+    settings = {
+        **DOWNLOAD_TUNING[family],
+        **DOWNLOAD_TUNING_OVERRIDES.get("default", {}).get(family, {}),
+        **PLATFORM_DOWNLOAD_TUNING.get(platform, {}).get(family, {}),
+        **DOWNLOAD_TUNING_OVERRIDES.get(platform, {}).get(family, {}),
+    }
+    base, cap = settings.pop("retry_sleep")
+
+    def sleep(n: int) -> float:
+        return min(cap, base * 2 ** n)
+
+    settings["retry_sleep_functions"] = {"http": sleep, "fragment": sleep}
+    return settings
+
+
+def install_download_tuning(ydl) -> None:
+    """
+    Ajoute un post-processeur « before_dl » : le protocole n'est connu
+    qu'après la sélection du format, juste avant le téléchargement. Les
+    réglages vont dans ydl.params, que les downloaders lisent à leur
+    création ; YDLPool.release restaure les params de base.
+    """
+    yt_dlp = load_yt_dlp()
+
+    class DownloadTuningPP(yt_dlp.postprocessor.PostProcessor):
+        def run(self, info):
+            if DOWNLOAD_TUNING_ENABLED:
+                platform = detect_platform(info.get("webpage_url") or info.get("original_url") or "")
+                self._downloader.params.update(download_tuning(platform, info.get("protocol")))
+            return [], info
+
+    ydl.add_post_processor(DownloadTuningPP(ydl), when="before_dl")
+
+
+# ==========================
+# Pool d'instances YoutubeDL
+# ==========================
+
+YDL_PROFILES = {
+    "analyze": {
         "quiet": True,
         "skip_download": True,
         "no_warnings": True,
-    }
+        "noplaylist": True,
+        "extract_flat": "in_playlist",
+    },
+    "download": {
+        "quiet": True,
+        "noprogress": True,
+        "noplaylist": True,
+    },
+    "playlist": {
+        "quiet": True,
+        "no_warnings": True,
+        "skip_download": True,
+        "extract_flat": "in_playlist",
+        "lazy_playlist": True,
+    },
+    "stream": {
+        "quiet": True,
+        "no_warnings": True,
+    },
+}
+
+
+# État interne de YoutubeDL propre à un appel, remis à zéro au retour
+# dans le pool (attribut -> valeur initiale), et API interne utilisée par
+# acquire. Vérifiés sur chaque nouvelle instance : si une version de yt-dlp
+# en renomme un, les instances ne sont plus réutilisées (voir reusable).
+YDL_RESET_STATE = {
+    "_progress_hooks": list,
+    "_download_retcode": int,
+    "_num_downloads": int,
+    "_num_videos": int,
+    "_playlist_level": int,
+    "_playlist_urls": set,
+    "_printed_messages": set,
+}
+YDL_REQUIRED_API = ("params", "format_selector", "build_format_selector", "_parse_outtmpl", "add_progress_hook")
+# Version de yt-dlp avec laquelle la remise à zéro a été vérifiée
+YDL_TESTED_VERSION = "2026.08.19"
+
+
+class YDLPool:
+    """
+    Instances YoutubeDL construites une fois par profil d'options puis
+    réutilisées : extracteurs, cookiejar et pile HTTP (keep-alive) sont
+    conservés d'une requête à l'autre. Une instance n'est jamais partagée
+    entre deux requêtes simultanées ; l'état propre à un appel (format,
+    outtmpl, hooks, compteurs) est remis à zéro au retour dans le pool.
+    Si l'état interne attendu (YDL_RESET_STATE) manque, les instances sont
+    jetées après usage plutôt que réutilisées avec un état incomplet.
+    """
+
+    def __init__(self, profiles: dict[str, dict], size: int, max_uses: int,
+                 setup: dict | None = None):
+        self.profiles = profiles
+        self.setup = setup or {}  # profil -> fonction appelée sur chaque nouvelle instance
+        self.size = size
+        self.max_uses = max_uses
+        self.reusable = True
+        self.missing: list[str] = []
+        self.version: str | None = None
+        self._lock = threading.Lock()
+        self._idle: dict[str, list] = {name: [] for name in profiles}
+        self._base: dict[int, tuple[dict, object]] = {}
+        self._uses: dict[int, int] = {}
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def _check(self, ydl) -> None:
+        missing = [name for name in (*YDL_RESET_STATE, *YDL_REQUIRED_API) if not hasattr(ydl, name)]
+        version = load_yt_dlp().version.__version__
+        with self._lock:
+            self.version = version
+            if missing:
+                self.reusable = False
+                self.missing = sorted(set(self.missing) | set(missing))
+
+    def _create(self, profile: str):
+        ydl = load_yt_dlp().YoutubeDL(dict(self.profiles[profile]))
+        if profile in self.setup:
+            self.setup[profile](ydl)
+        self._check(ydl)
+        base = (self._snapshot(ydl.params), ydl.format_selector)
+        with self._lock:
+            self._base[id(ydl)] = base
+            self._uses[id(ydl)] = 0
+            self.created += 1
+        return ydl
+
+    @staticmethod
+    def _snapshot(params: dict) -> dict:
+        snap = dict(params)
+        snap["outtmpl"] = dict(params["outtmpl"])
+        return snap
+
+    def acquire(self, profile: str, **overrides):
+        """
+        Emprunte une instance ; overrides accepte notamment format, outtmpl
+        et progress_hooks, valables pour cet emprunt seulement.
+        """
+        with self._lock:
+            idle = self._idle[profile]
+            ydl = idle.pop() if idle else None
+            if ydl is not None:
+                self.reused += 1
+        if ydl is None:
+            ydl = self._create(profile)
+
+        hooks = overrides.pop("progress_hooks", None) or []
+        ydl.params.update(overrides)
+        if "outtmpl" in overrides:
+            ydl._parse_outtmpl()
+        if "format" in overrides:
+            ydl.format_selector = ydl.build_format_selector(overrides["format"])
+        for hook in hooks:
+            ydl.add_progress_hook(hook)
+        return ydl
+
+    def release(self, profile: str, ydl) -> None:
+        with self._lock:
+            self._uses[id(ydl)] += 1
+            uses = self._uses[id(ydl)]
+            params, selector = self._base[id(ydl)]
+            reusable = self.reusable and uses < self.max_uses and len(self._idle[profile]) < self.size
+            if not reusable:
+                self.discarded += 1
+        if not reusable:
+            self._discard(ydl)
+            return
+
+        ydl.params = self._snapshot(params)
+        ydl.format_selector = selector
+        for name, initial in YDL_RESET_STATE.items():
+            setattr(ydl, name, initial())
+
+        with self._lock:
+            idle = self._idle[profile]
+            if len(idle) < self.size:
+                idle.append(ydl)
+                return
+            self.discarded += 1
+        self._discard(ydl)
+
+    def _discard(self, ydl) -> None:
+        with self._lock:
+            self._base.pop(id(ydl), None)
+            self._uses.pop(id(ydl), None)
+        ydl.close()
+
+    @contextmanager
+    def checkout(self, profile: str, **overrides):
+        ydl = self.acquire(profile, **overrides)
+        try:
+            yield ydl
+        finally:
+            self.release(profile, ydl)
+
+    def prime(self, profile: str, count: int = 1) -> None:
+        """
+        Pré-construit des instances (démarrage).
+        """
+        for ydl in [self._create(profile) for _ in range(count)]:
+            with self._lock:
+                self._uses[id(ydl)] -= 1
+            self.release(profile, ydl)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "max_uses": self.max_uses,
+                "yt_dlp_version": self.version,
+                "tested_version": YDL_TESTED_VERSION,
+                "reusable": self.reusable,
+                "missing_attributes": self.missing,
+                "idle": {name: len(idle) for name, idle in self._idle.items()},
+                "created": self.created,
+                "reused": self.reused,
+                "discarded": self.discarded,
+            }
+
+
+YDL_POOL = YDLPool(YDL_PROFILES, YDL_POOL_SIZE, YDL_POOL_MAX_USES,
+                   setup={"download": install_download_tuning})
 
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+
+# ==========================
+# Utilitaires yt-dlp
+# ==========================
+
+def detect_platform(url: str) -> str:
+    return canonicalize(url).platform
+
+
+def get_video_info(url: str) -> dict:
+    """
+    Analyse une URL et retourne les infos + formats.
+    Les résultats sont servis depuis METADATA_CACHE tant qu'ils sont frais ;
+    le dict retourné est partagé et ne doit pas être modifié.
+    """
+    with METRICS.stage("extract", url), profile_section():
+        return METADATA_CACHE.get_or_load(canonical_key(url), lambda: _scheduled_extract(url))
+
+
+def _scheduled_extract(url: str) -> dict:
+    with SCHEDULER.slot(detect_platform(url)):
+        return EXTRACTOR.extract(url)
+
+
+def _extract_video_info(url: str) -> dict:
+    """
+    Extraction complète via yt-dlp (sans cache).
+    Une playlist n'est pas résolue entrée par entrée (extraction « plate ») :
+    elle est signalée par is_playlist, voir /api/analyze/playlist.
+    """
+    with YDL_POOL.checkout("analyze") as ydl:
         info = ydl.extract_info(url, download=False)
 
+    platform = detect_platform(url)
     formats = []
+    media = {}
     for f in info.get("formats", []):
         if not f.get("url"):
             continue
 
+        fmt = media[f.get("format_id")] = {
+            "url": f["url"],
+            "protocol": f.get("protocol"),
+            "ext": f.get("ext"),
+            "http_headers": f.get("http_headers") or {},
+            "cookies": f.get("cookies"),
+            "filesize": f.get("filesize"),
+            # Lus par les fixups de yt-dlp (voir needs_fixup)
+            "container": f.get("container"),
+            "stretched_ratio": f.get("stretched_ratio"),
+        }
+
         is_audio = f.get("vcodec") == "none"
         resolution = f"{f.get('width') or ''}x{f.get('height') or ''}".strip("x")
         quality = f.get("format_note") or resolution or ("audio" if is_audio else "video")
@@ -83,6 +2648,7 @@ def get_video_info(url: str) -> dict:
             "quality": quality,
             "is_audio": is_audio,
             "filesize_human": size_str,
+            "delivery": delivery_for(f.get("format_id"), fmt, platform),
         })
 
     def sort_key(fmt):
@@ -102,474 +2668,1202 @@ def get_video_info(url: str) -> dict:
 
     thumb = info.get("thumbnail")
     title = info.get("title")
-    duration = info.get("duration")  # secondes
-
-    if duration:
-        minutes = duration // 60
-        seconds = duration % 60
-        duration_str = f"{minutes}m{seconds:02d}s"
-    else:
-        duration_str = None
+    duration_str = format_duration(info.get("duration"))  # secondes
 
     return {
         "title": title,
         "thumbnail": thumb,
         "duration": duration_str,
-        "platform": detect_platform(url),
+        "platform": platform,
         "formats": formats,
         "original_url": url,
+        "extractor": info.get("extractor_key"),
+        "video_id": info.get("id"),
+        "media": media,
+        "is_playlist": info.get("_type") in ("playlist", "multi_video"),
     }
 
 
-def download_video(url: str, format_id: str, output_dir: str) -> str:
+class ExtractionError(Exception):
+    """
+    Erreur d'extraction renvoyée par un processus worker (message seul :
+    les exceptions yt-dlp portent des tracebacks non sérialisables).
+    """
+
+
+def _warm_worker() -> None:
+    YDL_POOL.prime("analyze")
+
+
+def _extract_in_worker(url: str) -> dict:
+    try:
+        return _extract_video_info(url)
+    except Exception as e:
+        raise ExtractionError(str(e)) from None
+
+
+class ExtractionBackend:
+    """
+    Exécute _extract_video_info dans le thread appelant ("thread") ou dans
+    un pool de processus longue durée ("process"), recyclés après
+    max_tasks_per_child extractions pour borner leur mémoire.
+    """
+
+    def __init__(self, backend: str, processes: int, max_tasks_per_child: int):
+        self.backend = backend
+        self.processes = processes
+        self.max_tasks_per_child = max_tasks_per_child
+        self._lock = threading.Lock()
+        self._pool: ProcessPoolExecutor | None = None
+        self.submitted = 0
+        self.restarts = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Hérité par les processus (spawn), y compris ceux recréés
+                # après max_tasks_per_child : voir EXTRACTION_WORKER
+                os.environ[EXTRACTION_WORKER_ENV] = "1"
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    max_tasks_per_child=self.max_tasks_per_child,
+                )
+            self.submitted += 1
+            return self._pool
+
+    def extract(self, url: str) -> dict:
+        if self.backend != "process":
+            return _extract_video_info(url)
+        pool = self._get_pool()
+        try:
+            return pool.submit(_extract_in_worker, url).result()
+        except BrokenProcessPool:
+            # Un worker est mort (OOM, crash) : on repart sur un pool neuf
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+                    self.restarts += 1
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def warm_up(self) -> None:
+        """
+        Démarre les processus workers et y précharge yt-dlp.
+        """
+        if self.backend != "process":
+            return
+        pool = self._get_pool()
+        for future in [pool.submit(_warm_worker) for _ in range(self.processes)]:
+            future.result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            # wait=False avec max_tasks_per_child peut bloquer la sortie (CPython 3.11)
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "processes": self.processes if self.backend == "process" else 0,
+                "max_tasks_per_child": self.max_tasks_per_child,
+                "submitted": self.submitted,
+                "restarts": self.restarts,
+            }
+
+
+EXTRACTOR = ExtractionBackend(EXTRACT_BACKEND, EXTRACT_PROCESSES, EXTRACT_MAX_TASKS_PER_CHILD)
+
+
+def format_duration(duration) -> str | None:
+    if not duration:
+        return None
+    minutes, seconds = divmod(int(duration), 60)
+    return f"{minutes}m{seconds:02d}s"
+
+
+def download_video(url: str, format_id: str, output_dir: str, progress_hooks: list | None = None) -> str:
     """
     Télécharge la vidéo/audio pour format_id et renvoie le chemin final.
     """
+    return download_media(url, format_id, output_dir, progress_hooks)[0]
+
+
+def download_media(url: str, format_id: str, output_dir: str,
+                   progress_hooks: list | None = None, ticket: dict | None = None) -> tuple[str, dict]:
+    """
+    Comme download_video, mais retourne aussi l'identité du média
+    (extracteur, id) pour l'adressage dans MEDIA_CACHE.
+    Une seule passe d'extraction : le chemin vient de l'info retournée par
+    extract_info(download=True), mis à jour après fusion/post-traitement.
+    Avec ticket, aucune extraction : process_ie_result sur l'URL directe ;
+    si elle est refusée avant le premier octet, repli sur l'extraction.
+    """
     ydl_opts = {
         "format": format_id,
         "outtmpl": f"{output_dir}/%(title).80s-%(id)s.%(ext)s",
-        "quiet": True,
-        "noprogress": True,
+        "progress_hooks": progress_hooks,
     }
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        ydl.download([url])
-        info = ydl.extract_info(url, download=False)
-        filename = ydl.prepare_filename(info)
-    return filename
+    with METRICS.stage("download", url), YDL_POOL.checkout("download", **ydl_opts) as ydl, profile_section():
+        info = None
+        if ticket is not None:
+            try:
+                info = ydl.process_ie_result(ticket_ie_result(ticket, format_id), download=True)
+            except Exception:
+                # L'analyse en cache porte la même URL directe, refusée
+                METADATA_CACHE.invalidate(canonical_key(url))
+                if any(Path(output_dir).iterdir()):
+                    raise
+        if info is None:
+            info = ydl.extract_info(url, download=True)
+        filename = final_filepath(ydl, info)
+    if os.path.exists(filename):
+        METRICS.downloaded(detect_platform(url), os.path.getsize(filename))
+    return filename, {"extractor": info.get("extractor_key"), "video_id": info.get("id")}
+
+
+def final_filepath(ydl, info: dict) -> str:
+    """
+    Chemin réel du fichier produit par yt-dlp (extension après fusion incluse).
+    """
+    downloads = info.get("requested_downloads") or []
+    if downloads and downloads[-1].get("filepath"):
+        return downloads[-1]["filepath"]
+    return info.get("filepath") or ydl.prepare_filename(info)
 
 
 # ==========================
-# Schémas API
+# Streaming direct (passthrough)
 # ==========================
 
-class AnalyzeRequest(BaseModel):
-    url: HttpUrl
+STREAMABLE_PROTOCOLS = ("http", "https")
 
 
-class AnalyzeResponse(BaseModel):
-    title: str | None
-    thumbnail: str | None
-    duration: str | None
-    platform: str
-    formats: list[dict]
-    original_url: str
+def is_streamable(format_id: str, fmt: dict | None) -> bool:
+    """
+    Format relayable tel quel : un seul flux HTTP progressif (pas de fusion,
+    pas de fragments DASH/HLS).
+    """
+    return bool(fmt) and "+" not in format_id and fmt.get("protocol") in STREAMABLE_PROTOCOLS
+
+
+def needs_fixup(fmt: dict) -> bool:
+    """
+    Format mono-fichier que yt-dlp réécrit avec ffmpeg après le
+    téléchargement (FFmpegFixupM4aPP, FFmpegFixupStretchedPP) : le fichier
+    final diffère des octets reçus.
+    """
+    return ((fmt.get("ext") == "m4a" and fmt.get("container") == "m4a_dash")
+            or fmt.get("stretched_ratio") not in (1, None))
+
+
+# En-têtes que yt-dlp ajoute à toute requête et qu'un navigateur envoie de
+# lui-même : ils n'empêchent pas de rediriger le client vers l'URL directe.
+BROWSER_HEADERS = {"user-agent", "accept", "accept-language", "accept-encoding", "sec-fetch-mode"}
+
+
+def delivery_for(format_id: str, fmt: dict | None, platform: str) -> str:
+    """
+    Chemin de livraison d'un format avec /api/download?mode=redirect :
+    "redirect" (302 vers l'URL directe, aucun octet ne passe par le
+    serveur), "stream" (relais en direct, l'amont exige des en-têtes, des
+    cookies ou l'adresse IP du serveur) ou "file" (fusion, fragments :
+    téléchargement côté serveur puis envoi).
+    La redirection est réservée à REDIRECT_PLATFORMS : une URL signée peut
+    être liée à l'adresse du serveur sans que rien ne l'indique.
+    """
+    if not is_streamable(format_id, fmt):
+        return "file"
+    if platform not in REDIRECT_PLATFORMS:
+        return "stream"
+    if fmt.get("cookies") or any(h.lower() not in BROWSER_HEADERS for h in fmt.get("http_headers") or {}):
+        return "stream"
+    # URL liée à l'adresse IP de l'extraction (googlevideo : ip=...)
+    if "ip" in dict(parse_qsl(urlsplit(fmt["url"]).query)):
+        return "stream"
+    return "redirect"
+
+
+def media_filename(info: dict, fmt: dict) -> str:
+    """
+    Même nom que l'outtmpl de download_media : <titre 80>-<id>.<ext>.
+    """
+    title = (info.get("title") or "video")[:80]
+    name = f"{title}-{info.get('video_id')}.{fmt.get('ext') or 'mp4'}"
+    return load_yt_dlp().utils.sanitize_filename(name)
+
+
+def content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def cookie_header(cookies: str | None) -> str | None:
+    """
+    En-tête Cookie tiré du champ cookies d'un format yt-dlp (syntaxe
+    Set-Cookie, déjà restreinte par yt-dlp à l'URL du format). L'instance
+    "stream" du pool n'a pas le cookiejar de l'extraction.
+    """
+    if not cookies:
+        return None
+    jar = load_yt_dlp().cookies.LenientSimpleCookie(cookies)
+    return "; ".join(f"{m.key}={m.coded_value}" for m in jar.values()) or None
+
+
+def open_upstream(fmt: dict):
+    """
+    Ouvre le flux amont via la pile réseau de yt-dlp (proxy, en-têtes, cookies).
+    Retourne (ydl, réponse) ; l'appelant ferme la réponse et rend ydl
+    au pool (profil "stream").
+    """
+    headers = dict(fmt["http_headers"])
+    cookies = cookie_header(fmt.get("cookies"))
+    if cookies:
+        headers["Cookie"] = cookies
+    ydl = YDL_POOL.acquire("stream")
+    try:
+        request = load_yt_dlp().networking.Request(fmt["url"], headers=headers)
+        response = ydl.urlopen(request)
+    except BaseException:
+        YDL_POOL.release("stream", ydl)
+        raise
+    return ydl, response
+
+
+async def relay_upstream(ydl, upstream, tee_path: Path | None = None, on_complete=None, on_close=None):
+    """
+    Relaie les octets amont au client au fil de l'eau.
+    Un thread lit l'amont et alimente une file bornée (STREAM_BUFFER_CHUNKS
+    blocs) : si le client est lent, la file se remplit et la lecture amont
+    s'arrête (backpressure), la mémoire reste bornée. Les octets peuvent
+    être copiés dans tee_path ; on_complete(tee_path) est appelé si le flux
+    a été lu jusqu'au bout, on_close(octets lus, erreur) dans tous les cas.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_BUFFER_CHUNKS)
+    stop = threading.Event()
+
+    def put(item) -> None:
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        try:
+            future.result(STREAM_STALL_TIMEOUT)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def produce() -> None:
+        complete = False
+        transferred = 0
+        error = None
+        try:
+            with open(tee_path, "wb") if tee_path else nullcontext() as sink:
+                while not stop.is_set():
+                    chunk = upstream.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        complete = True
+                        break
+                    transferred += len(chunk)
+                    if sink is not None:
+                        sink.write(chunk)
+                    put(chunk)
+        except BaseException as e:
+            error = e
+            if not stop.is_set():
+                try:
+                    put(e)
+                except BaseException:
+                    pass
+        finally:
+            upstream.close()
+            YDL_POOL.release("stream", ydl)
+            if on_close is not None:
+                on_close(transferred, error)
+
+        if complete and not stop.is_set():
+            if tee_path is not None and on_complete is not None:
+                try:
+                    on_complete(tee_path)
+                except Exception:
+                    pass
+            try:
+                put(None)
+            except BaseException:
+                pass
+
+    threading.Thread(target=produce, name="deku-relay", daemon=True).start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        while not queue.empty():
+            queue.get_nowait()
+
+
+def stream_response(info: dict, format_id: str, url_key: str, key: str | None) -> StreamingResponse:
+    """
+    Réponse en streaming pour un format progressif, copiée dans MEDIA_CACHE
+    (si STREAM_TEE_CACHE) une fois complète.
+    """
+    fmt = info["media"][format_id]
+    filename = media_filename(info, fmt)
+
+    def store_tee(path: Path) -> None:
+        MEDIA_CACHE.commit(key, path, url_key, format_id)
+
+    tee_path = None
+    if STREAM_TEE_CACHE and key is not None:
+        temp_dir = DOWNLOAD_DIR / str(uuid.uuid4())
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        tee_path = temp_dir / filename
+    on_complete = store_tee if tee_path else None
+
+    # Le relais tourne dans un thread sans le contexte de la requête
+    platform, endpoint = info["platform"], current_endpoint()
+
+    def on_close(transferred: int, error: BaseException | None) -> None:
+        METRICS.downloaded(platform, transferred, endpoint)
+        if error is not None:
+            METRICS.stage_failed("stream", platform, endpoint)
+
+    # Ouvert en dernier : ensuite, la réponse et ydl sont à relay_upstream
+    try:
+        ydl, upstream = open_upstream(fmt)
+    except BaseException:
+        if tee_path:
+            remove_tree(tee_path.parent)
+        raise
+
+    headers = {"content-disposition": content_disposition(filename)}
+    # Avec Content-Encoding, la longueur amont est celle du corps compressé
+    length = upstream.headers.get("Content-Length")
+    encoding = upstream.headers.get("Content-Encoding", "identity").strip().lower()
+    if length and encoding == "identity":
+        headers["content-length"] = length
+
+    background = BackgroundTask(remove_tree, tee_path.parent) if tee_path else None
+    return StreamingResponse(
+        relay_upstream(ydl, upstream, tee_path, on_complete, on_close),
+        media_type="application/octet-stream",
+        headers=headers,
+        background=background,
+    )
 
 
 # ==========================
-# Route HTML (frontend)
+# Tickets de téléchargement signés
 # ==========================
 
-HTML_PAGE = """
-<!DOCTYPE html>
-<html lang="fr">
-<head>
-  <meta charset="UTF-8" />
-  <title>Deku-Media 2.0 - Téléchargement Vidéos</title>
-  <meta name="viewport" content="width=device-width, initial-scale=1.0" />
-  <style>
-    :root {
-      --bg: #050816;
-      --bg-alt: #0b1020;
-      --accent: #22c55e;
-      --accent-soft: rgba(34, 197, 94, 0.1);
-      --text: #f9fafb;
-      --muted: #9ca3af;
-      --error: #f97373;
-      --info: #3b82f6;
-      --radius: 12px;
-      --shadow-soft: 0 18px 40px rgba(15, 23, 42, 0.6);
-    }
+# Protocoles téléchargeables sans l'extracteur : l'URL directe suffit
+# (les formats DASH ont besoin de la liste des fragments).
+TICKET_PROTOCOLS = ("http", "https", "m3u8", "m3u8_native")
 
-    *,
-    *::before,
-    *::after {
-      box-sizing: border-box;
-    }
 
-    body {
-      margin: 0;
-      font-family: system-ui, -apple-system, BlinkMacSystemFont, "SF Pro Text", sans-serif;
-      background: radial-gradient(circle at top, #111827 0, #020617 45%, #000 100%);
-      color: var(--text);
-      -webkit-font-smoothing: antialiased;
-    }
+def load_ticket_secret(path: Path) -> bytes:
+    """
+    Clé HMAC des tickets : DEKU_TICKET_SECRET, sinon le contenu de path,
+    créé une seule fois (lien atomique) par le premier worker.
+    """
+    if TICKET_SECRET:
+        return TICKET_SECRET.encode()
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        pass
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        os.write(fd, os.urandom(32))
+    finally:
+        os.close(fd)
+    try:
+        os.link(tmp, path)
+    except FileExistsError:
+        pass
+    finally:
+        tmp.unlink()
+    return path.read_bytes()
 
-    .container {
-      width: 100%;
-      max-width: 1100px;
-      margin: 0 auto;
-      padding: 0 1.25rem;
-    }
 
-    .dm-header {
-      position: sticky;
-      top: 0;
-      z-index: 50;
-      backdrop-filter: blur(18px);
-      background: linear-gradient(to bottom, rgba(2, 6, 23, 0.9), transparent);
-      border-bottom: 1px solid rgba(148, 163, 184, 0.12);
-    }
+class TicketSigner(_Stats):
+    """
+    Tickets opaques par format : le média résolu par l'analyse (URL
+    directe, en-têtes, titre/id pour le nom de fichier, expiration),
+    compressé puis signé en HMAC-SHA256. /api/download?ticket= télécharge
+    sans relancer l'extracteur tant que le ticket n'a pas expiré.
+    Le contenu est lisible par le client mais pas modifiable.
+    """
 
-    .header-inner {
-      display: flex;
-      align-items: center;
-      justify-content: space-between;
-      padding: 0.75rem 0;
-    }
+    def __init__(self, secret_path: Path, ttl: float):
+        self.secret_path = secret_path
+        self.ttl = ttl
+        self._secret: bytes | None = None
+        self._lock = threading.Lock()
+        self._stats = {"issued": 0, "redeemed": 0, "expired": 0, "invalid": 0}
+
+    @property
+    def secret(self) -> bytes:
+        if self._secret is None:
+            self._secret = load_ticket_secret(self.secret_path)
+        return self._secret
+
+    def _sign(self, body: bytes) -> bytes:
+        return hmac.new(self.secret, body, hashlib.sha256).digest()
+
+    def expiry(self, fmt: dict) -> int:
+        """
+        Maintenant + ttl, sans dépasser l'expiration de l'URL directe quand
+        le CDN l'indique (paramètre expire=, en secondes epoch).
+        """
+        expires = time.time() + self.ttl
+        upstream = dict(parse_qsl(urlsplit(fmt["url"]).query)).get("expire", "")
+        if upstream.isdigit():
+            expires = min(expires, int(upstream) - 60)
+        return int(expires)
+
+    def issue(self, info: dict, format_id: str) -> str | None:
+        fmt = info["media"].get(format_id)
+        if not fmt or fmt.get("protocol") not in TICKET_PROTOCOLS or fmt.get("cookies"):
+            return None
+        payload = {
+            "url": info["original_url"],
+            "format_id": format_id,
+            "extractor": info["extractor"],
+            "video_id": info["video_id"],
+            "title": info["title"],
+            "platform": info["platform"],
+            "media": {
+                **{k: fmt[k] for k in ("url", "protocol", "ext", "http_headers")},
+                **{k: fmt[k] for k in ("container", "stretched_ratio") if fmt.get(k) is not None},
+            },
+            "exp": self.expiry(fmt),
+        }
+        body = zlib.compress(json.dumps(payload, separators=(",", ":")).encode())
+        self._count(issued=1)
+        return (base64.urlsafe_b64encode(body).rstrip(b"=") + b"."
+                + base64.urlsafe_b64encode(self._sign(body)).rstrip(b"=")).decode()
+
+    def annotate(self, info: dict) -> dict:
+        """
+        Copie de info dont chaque format porte son ticket (None si le format
+        ne peut pas être téléchargé sans l'extracteur).
+        """
+        return {**info, "formats": [
+            {**f, "ticket": self.issue(info, f["format_id"])} for f in info["formats"]
+        ]}
+
+    def verify(self, ticket: str) -> dict:
+        """
+        Contenu d'un ticket à la signature valide (ValueError sinon).
+        "expired" indique s'il faut repasser par l'extracteur.
+        """
+        try:
+            body_b64, sig_b64 = ticket.split(".")
+            body = base64.urlsafe_b64decode(body_b64 + "=" * (-len(body_b64) % 4))
+            signature = base64.urlsafe_b64decode(sig_b64 + "=" * (-len(sig_b64) % 4))
+        except ValueError:
+            self._count(invalid=1)
+            raise ValueError("Ticket invalide.")
+        if not hmac.compare_digest(signature, self._sign(body)):
+            self._count(invalid=1)
+            raise ValueError("Ticket invalide.")
+        payload = json.loads(zlib.decompress(body))
+        payload["expired"] = payload["exp"] < time.time()
+        self._count(**({"expired": 1} if payload["expired"] else {"redeemed": 1}))
+        return payload
 
-    .logo {
-      font-weight: 800;
-      letter-spacing: 0.04em;
-      display: flex;
-      align-items: baseline;
-      gap: 0.15rem;
-    }
+    def stats(self) -> dict:
+        with self._lock:
+            return {"ttl": self.ttl, **self._stats}
 
-    .logo-main {
-      font-size: 1.1rem;
-      color: var(--accent);
-    }
 
-    .logo-sub {
-      font-size: 0.9rem;
-      color: var(--muted);
-    }
+TICKETS = TicketSigner(TICKET_SECRET_PATH, TICKET_TTL)
 
-    .nav {
-      display: flex;
-      gap: 1.2rem;
-      font-size: 0.9rem;
-    }
 
-    .nav a {
-      color: var(--muted);
-      text-decoration: none;
-      position: relative;
-      padding-bottom: 0.2rem;
+def ticket_info(payload: dict) -> dict:
+    """
+    Sous-ensemble de get_video_info reconstruit depuis un ticket : assez
+    pour stream_response, MEDIA_CACHE et download_media.
+    """
+    return {
+        "title": payload["title"],
+        "platform": payload["platform"],
+        "original_url": payload["url"],
+        "extractor": payload["extractor"],
+        "video_id": payload["video_id"],
+        "media": {payload["format_id"]: payload["media"]},
     }
 
-    .nav a:hover {
-      color: var(--text);
-    }
 
-    .nav a::after {
-      content: "";
-      position: absolute;
-      left: 0;
-      bottom: 0;
-      width: 0;
-      height: 2px;
-      background: var(--accent);
-      transition: width 0.2s ease-out;
+def ticket_ie_result(info: dict, format_id: str) -> dict:
+    """
+    Résultat d'extraction minimal pour YoutubeDL.process_ie_result :
+    un seul format, l'URL directe du ticket.
+    """
+    fmt = info["media"][format_id]
+    url = info["original_url"]
+    return {
+        "_type": "video",
+        "id": info["video_id"],
+        "title": info["title"],
+        "extractor": (info["extractor"] or "generic").lower(),
+        "extractor_key": info["extractor"],
+        "webpage_url": url,
+        "original_url": url,
+        "webpage_url_basename": os.path.basename(urlsplit(url).path),
+        "webpage_url_domain": urlsplit(url).hostname,
+        "formats": [{"format_id": format_id, **fmt}],
     }
 
-    .nav a:hover::after {
-      width: 100%;
-    }
 
-    .hero {
-      padding: 4rem 0 3rem;
-    }
+# ==========================
+# Pipeline de téléchargement (cache disque + yt-dlp)
+# ==========================
+
+def find_cached_media(url_key: str, format_id: str, lease_state: dict | None = None,
+                      info: dict | None = None) -> Path | None:
+    """
+    Cherche (url_key, format_id) dans MEDIA_CACHE. La clé de contenu vient
+    de info (ticket), de l'analyse en cache, ou de l'état laissé par le
+    dernier détenteur du bail (un autre worker, dont les alias ne sont pas
+    connus ici).
+    """
+    info = info or METADATA_CACHE.get(url_key)
+    key = MediaCache.make_key(info["extractor"], info["video_id"], format_id) if info else None
+    if key is None and lease_state and lease_state.get("state") == "done":
+        key = lease_state.get("key")
+    return MEDIA_CACHE.find(url_key, format_id, key)
+
+
+def fetch_media(url: str, format_id: str, progress_hooks: list | None = None,
+                ticket: dict | None = None) -> tuple[Path, Path | None]:
+    """
+    Retourne le fichier pour (url, format_id), depuis MEDIA_CACHE si possible,
+    sinon après téléchargement et mise en cache. Avec ticket (ticket_info),
+    le téléchargement part de l'URL directe, sans extraction.
+    Le téléchargement se fait sous bail (DOWNLOAD_LEASES) : une demande
+    concurrente, de ce worker ou d'un autre, attend puis sert le résultat.
+    Le second élément est le dossier temporaire à supprimer après usage
+    quand le fichier n'a pas pu être mis en cache (None sinon).
+    """
+    url_key = canonical_key(url)
+    cached = find_cached_media(url_key, format_id, info=ticket)
+    if cached is not None:
+        return cached, None
+
+    with DOWNLOAD_LEASES.hold(url_key, format_id) as lease:
+        if lease.waited or (lease.previous or {}).get("state") == "done":
+            cached = find_cached_media(url_key, format_id, lease.previous, ticket)
+            if cached is not None:
+                return cached, None
+
+        temp_dir = DOWNLOAD_DIR / str(uuid.uuid4())
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        lease.update(state="downloading", temp_dir=str(temp_dir))
+        hooks = [lease.publish_progress, *(progress_hooks or [])]
+        try:
+            with SCHEDULER.slot(detect_platform(url)):
+                file_path, ident = download_media(url, format_id, str(temp_dir), hooks, ticket)
+            file_path = Path(file_path)
+            if not file_path.exists():
+                raise FileNotFoundError("Fichier introuvable après téléchargement.")
+
+            key = MediaCache.make_key(ident["extractor"], ident["video_id"], format_id)
+            if key is not None:
+                file_path = MEDIA_CACHE.commit(key, file_path, url_key, format_id)
+        except BaseException as e:
+            lease.update(state="failed", error=str(e))
+            remove_tree(temp_dir)
+            raise
+        lease.update(state="done", key=key, path=str(file_path))
+
+    if temp_dir not in file_path.parents:
+        remove_tree(temp_dir)
+        return file_path, None
+    return file_path, temp_dir
+
+
+class DownloadFollower(_Stats):
+    """
+    Rattache une demande tardive au téléchargement en cours (autre requête,
+    tâche ou worker) : le fichier .part publié par le détenteur du bail est
+    lu au fil de l'écriture, par blocs de chunk_size, quel que soit le
+    nombre de lecteurs. Le descripteur ouvert reste valide quand yt-dlp
+    renomme le .part puis que MEDIA_CACHE le déplace (même inode).
+    Réservé aux formats progressifs mono-fichier : une fusion ou un
+    post-traitement ffmpeg produirait un autre fichier.
+    """
 
-    .hero-inner {
-      display: grid;
-      grid-template-columns: minmax(0, 1.1fr) minmax(0, 1fr);
-      gap: 2rem;
-      align-items: flex-start;
-    }
+    def __init__(self, leases: DownloadLeases, chunk_size: int, start_timeout: float):
+        self.leases = leases
+        self.chunk_size = chunk_size
+        self.start_timeout = start_timeout
+        self._lock = threading.Lock()
+        self._stats = {"attached": 0, "active": 0, "completed": 0, "failed": 0, "disconnected": 0}
+
+    def attach(self, url: str, format_id: str, info: dict | None = None) -> StreamingResponse | None:
+        """
+        Réponse qui suit le téléchargement en cours, ou None (pas de
+        téléchargement suivable : l'appelant passe par fetch_media).
+        Ne bloque pas : l'attente du fichier se fait dans le générateur.
+        """
+        url_key = canonical_key(url)
+        state = self.leases.active(url_key, format_id)
+        if state is None:
+            return None
+        info = info or METADATA_CACHE.get(url_key)
+        fmt = info["media"].get(format_id) if info else None
+        # Une fusion ou un fixup ffmpeg écrit un autre fichier que le .part
+        if not is_streamable(format_id, fmt) or needs_fixup(fmt):
+            return None
+
+        filename = os.path.basename(state["filename"]) if "filename" in state else media_filename(info, fmt)
+        self._count(attached=1)
+        return StreamingResponse(
+            self._follow(url_key, format_id),
+            media_type="application/octet-stream",
+            headers={"content-disposition": content_disposition(filename)},
+        )
 
-    .hero-text h1 {
-      font-size: clamp(1.9rem, 3vw, 2.4rem);
-      margin: 0 0 0.75rem;
-    }
+    def _open(self, url_key: str, format_id: str):
+        """
+        Fichier à suivre : celui publié par le détenteur du bail ou, si le
+        téléchargement s'est terminé entre-temps, l'entrée de MEDIA_CACHE.
+        None tant que le détenteur n'a rien publié.
+        """
+        state = self.leases.read_state(self.leases.name_for(url_key, format_id)) or {}
+        for candidate in (state.get("tmpfilename"), state.get("filename")):
+            if candidate:
+                try:
+                    return open(candidate, "rb")
+                except OSError:
+                    continue
+        if state.get("state") == "done":
+            cached = find_cached_media(url_key, format_id, state)
+            if cached is not None:
+                return open(cached, "rb")
+        if self.leases.active(url_key, format_id) is None:
+            raise RuntimeError("Téléchargement source interrompu.")
+        return None
+
+    async def _follow(self, url_key: str, format_id: str):
+        self._count(active=1)
+        f = None
+        finished = False
+        try:
+            # Le détenteur publie le fichier au premier hook de progression
+            deadline = time.monotonic() + self.start_timeout
+            while f is None:
+                f = await asyncio.to_thread(self._open, url_key, format_id)
+                if f is None:
+                    if time.monotonic() > deadline:
+                        raise TimeoutError("Téléchargement source non démarré.")
+                    await asyncio.sleep(self.leases.poll_interval)
+
+            while True:
+                chunk = await asyncio.to_thread(f.read, self.chunk_size)
+                if chunk:
+                    yield chunk
+                    continue
+                if finished:
+                    self._count(completed=1)
+                    return
+                # Fin du fichier atteinte : attendre la suite ou la fin du téléchargement
+                if await asyncio.to_thread(self.leases.active, url_key, format_id) is not None:
+                    await asyncio.sleep(self.leases.poll_interval)
+                    continue
+                state = self.leases.read_state(self.leases.name_for(url_key, format_id)) or {}
+                if state.get("state") != "done":
+                    raise RuntimeError("Téléchargement source interrompu.")
+                finished = True  # relire jusqu'à la fin : des octets ont pu arriver entre-temps
+        except (GeneratorExit, asyncio.CancelledError):
+            self._count(disconnected=1)  # client parti
+            raise
+        except BaseException:
+            self._count(failed=1)
+            raise
+        finally:
+            self._count(active=-1)
+            if f is not None:
+                f.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+FOLLOWER = DownloadFollower(DOWNLOAD_LEASES, STREAM_CHUNK_SIZE, FOLLOW_START_TIMEOUT)
 
-    .hero-text p {
-      margin: 0 0 1.5rem;
-      color: var(--muted);
-    }
 
-    .download-form label {
-      font-size: 0.9rem;
-      color: var(--muted);
-      display: block;
-      margin-bottom: 0.35rem;
-    }
+# ==========================
+# Tâches de téléchargement asynchrones
+# ==========================
 
-    .input-group {
-      display: flex;
-      gap: 0.6rem;
-      margin-bottom: 0.35rem;
-    }
+PROGRESS_FIELDS = (
+    "status", "downloaded_bytes", "total_bytes", "total_bytes_estimate",
+    "speed", "eta", "elapsed", "fragment_index", "fragment_count",
+)
 
-    .input-group input {
-      flex: 1;
-      padding: 0.75rem 0.9rem;
-      border-radius: var(--radius);
-      border: 1px solid rgba(148, 163, 184, 0.35);
-      background: rgba(15, 23, 42, 0.8);
-      color: var(--text);
-      outline: none;
-    }
 
-    .input-group input:focus {
-      border-color: var(--accent);
-      box-shadow: 0 0 0 1px rgba(34, 197, 94, 0.4);
-    }
+class Job:
+    """
+    Téléchargement exécuté en tâche de fond. version est incrémenté à chaque
+    changement d'état ou de progression (utilisé par le flux SSE).
+    """
 
-    .input-group button {
-      padding: 0.75rem 1.2rem;
-      border-radius: var(--radius);
-      border: none;
-      background: linear-gradient(135deg, #22c55e, #16a34a);
-      color: #0b1120;
-      font-weight: 600;
-      cursor: pointer;
-      white-space: nowrap;
-      display: inline-flex;
-      align-items: center;
-      gap: 0.4rem;
-    }
+    def __init__(self, url: str, format_id: str, key: tuple[str, str]):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.format_id = format_id
+        self.key = key
+        self.state = "queued"
+        self.created = time.time()
+        self.started: float | None = None
+        self.finished: float | None = None
+        self.progress: dict = {}
+        self.error: str | None = None
+        self.file_path: Path | None = None
+        self.temp_dir: Path | None = None
+        self.version = 0
+        self._last_progress = 0.0
+        self._lock = threading.Lock()
+
+    def on_progress(self, d: dict) -> None:
+        # Hook yt-dlp : appelé à chaque bloc, on limite la fréquence de mise à jour
+        now = time.monotonic()
+        if d.get("status") == "downloading" and now - self._last_progress < JOBS_EVENT_INTERVAL:
+            return
+        self._last_progress = now
+        with self._lock:
+            self.progress = {k: d.get(k) for k in PROGRESS_FIELDS if d.get(k) is not None}
+            self.version += 1
+
+    def set_state(self, state: str, **fields) -> None:
+        with self._lock:
+            self.state = state
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("finished", "error")
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "state": self.state,
+                "url": self.url,
+                "format_id": self.format_id,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+                "progress": dict(self.progress),
+                "error": self.error,
+                "file_url": f"/api/jobs/{self.id}/file" if self.state == "finished" else None,
+            }
+
+
+class JobManager:
+    """
+    Pool borné de workers alimenté par une file de taille fixe.
+    Une tâche déjà en cours (ou terminée et encore disponible) pour la même
+    clé canonique (canonical_key) et le même format_id est réutilisée au lieu
+    d'être relancée.
+    """
 
-    .input-group button:disabled {
-      opacity: 0.6;
-      cursor: wait;
-    }
+    def __init__(self, workers: int, queue_size: int, ttl: float):
+        self.workers = workers
+        self.ttl = ttl
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._jobs: dict[str, Job] = {}
+        self._by_key: dict[tuple[str, str], Job] = {}
+        self._threads: list[threading.Thread] = []
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"deku-job-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        self._threads = []
+
+    def submit(self, url: str, format_id: str) -> Job:
+        """
+        Lève queue.Full si la file d'attente est pleine.
+        """
+        key = (canonical_key(url), format_id)
+        with self._lock:
+            self._gc_locked()
+            job = self._by_key.get(key)
+            if job is not None and job.state != "error" and self._available(job):
+                self.deduplicated += 1
+                return job
+            job = Job(url, format_id, key)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self.rejected += 1
+                raise
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+            self.submitted += 1
+            return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def busy(self) -> bool:
+        """
+        Vrai si des tâches sont en attente ou en cours.
+        """
+        with self._lock:
+            return self._queue.qsize() > 0 or any(job.state == "running" for job in self._jobs.values())
+
+    @staticmethod
+    def _available(job: Job) -> bool:
+        return job.state != "finished" or (job.file_path is not None and job.file_path.exists())
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            job.set_state("running", started=time.time())
+            REQUEST_LABELS.set({"endpoint": "/api/jobs", "platform": detect_platform(job.url)})
+            try:
+                file_path, temp_dir = fetch_media(job.url, job.format_id, [job.on_progress])
+            except Exception as e:
+                job.set_state("error", error=str(e), finished=time.time())
+            else:
+                job.set_state("finished", file_path=file_path, temp_dir=temp_dir, finished=time.time())
+
+    def _gc_locked(self) -> None:
+        cutoff = time.time() - self.ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.done and job.finished < cutoff:
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) is job:
+                    del self._by_key[job.key]
+                if job.temp_dir is not None:
+                    remove_tree(job.temp_dir)
+
+    def stats(self) -> dict:
+        with self._lock:
+            states: dict[str, int] = {}
+            for job in self._jobs.values():
+                states[job.state] = states.get(job.state, 0) + 1
+            return {
+                "workers": self.workers,
+                "queue_depth": self._queue.qsize(),
+                "states": states,
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+                "rejected": self.rejected,
+            }
+
+
+JOBS = JobManager(JOBS_WORKERS, JOBS_QUEUE_SIZE, JOBS_TTL)
+
+
+async def job_events(job: Job, request: Request):
+    """
+    Flux SSE : un événement à chaque changement de la tâche, jusqu'à sa fin.
+    """
+    last_version = -1
+    last_sent = time.monotonic()
+    while not await request.is_disconnected():
+        version = job.version
+        if version != last_version:
+            last_version = version
+            payload = job.to_dict()
+            yield f"event: {payload['state']}\ndata: {json.dumps(payload)}\n\n"
+            last_sent = time.monotonic()
+            if job.done:
+                return
+        elif time.monotonic() - last_sent > 15:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(JOBS_EVENT_INTERVAL)
 
-    .input-hint {
-      font-size: 0.78rem;
-      color: var(--muted);
-    }
 
-    .alert {
-      margin-top: 0.75rem;
-      padding: 0.6rem 0.8rem;
-      border-radius: 0.75rem;
-      font-size: 0.82rem;
-    }
+# ==========================
+# Analyse par lots
+# ==========================
 
-    .alert-error {
-      background: rgba(239, 68, 68, 0.12);
-      color: #fecaca;
-      border: 1px solid rgba(248, 113, 113, 0.5);
-    }
+HTTP_URL = TypeAdapter(HttpUrl)
 
-    .alert-info {
-      background: rgba(59, 130, 246, 0.12);
-      color: #bfdbfe;
-      border: 1px solid rgba(96, 165, 250, 0.5);
-    }
 
-    .hidden {
-      display: none !important;
-    }
+def analyze_item(url: str) -> dict:
+    """
+    Analyse un lien pour un lot : même contrôle que /api/analyze,
+    mais l'erreur est retournée au lieu d'être levée.
+    """
+    try:
+        info = get_video_info(url)
+        if not info["formats"]:
+            return {"ok": False, "error": "Aucun format disponible pour ce lien."}
+        return {"ok": True, "result": AnalyzeResponse.model_validate(info).model_dump()}
+    except Exception as e:
+        return {"ok": False, "error": f"Analyse impossible : {e}"}
 
-    .hero-card {
-      background: radial-gradient(circle at top left, #1e293b 0, #020617 60%);
-      border-radius: 1.4rem;
-      padding: 1.2rem;
-      box-shadow: var(--shadow-soft);
-      border: 1px solid rgba(148, 163, 184, 0.3);
-      min-height: 220px;
-    }
 
-    .hero-card p {
-      color: var(--muted);
-      font-size: 0.9rem;
-    }
+def iter_batch_analysis(urls: list[str]):
+    """
+    Génère une ligne NDJSON par URL, dans l'ordre de fin des extractions.
+    Les doublons (même clé canonique) ne sont extraits qu'une fois.
+    """
+    groups: dict[str, list[int]] = {}
+    targets: dict[str, str] = {}
+    for index, raw in enumerate(urls):
+        try:
+            url = str(HTTP_URL.validate_python(raw))
+        except ValidationError:
+            yield json.dumps({"index": index, "url": raw, "ok": False, "error": "URL invalide."}) + "\n"
+            continue
+        key = canonical_key(url)
+        groups.setdefault(key, []).append(index)
+        targets.setdefault(key, url)
 
-    #video-meta {
-      display: grid;
-      grid-template-columns: 120px minmax(0, 1fr);
-      gap: 0.75rem;
-      margin-bottom: 1rem;
-    }
+    pool = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="deku-batch")
+    try:
+        futures = {
+            pool.submit(contextvars.copy_context().run, analyze_item, url): key
+            for key, url in targets.items()
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            item = future.result()
+            for index in groups[key]:
+                yield json.dumps({"index": index, "url": urls[index], **item}) + "\n"
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
 
-    #thumb {
-      width: 100%;
-      border-radius: 0.8rem;
-      object-fit: cover;
-    }
 
-    #title {
-      font-size: 1rem;
-      margin: 0 0 0.35rem;
-    }
+# ==========================
+# Playlists et chaînes (lecture paresseuse)
+# ==========================
 
-    #platform-label {
-      font-size: 0.8rem;
-      color: var(--muted);
-    }
+def read_playlist_page(url: str, offset: int, limit: int) -> tuple[dict, list, str | None]:
+    """
+    Extraction plate et paresseuse d'une playlist/chaîne, puis lecture des
+    entrées [offset, offset + limit] (une de plus pour savoir s'il reste
+    une page) : seules les pages nécessaires sont demandées. Tout l'accès
+    réseau se fait sous le créneau de la plateforme (SCHEDULER), et
+    l'instance YoutubeDL est rendue au pool avant la réponse.
+    Retourne (playlist, entrées, erreur de lecture éventuelle).
+    """
+    with YDL_POOL.checkout("playlist") as ydl, SCHEDULER.slot(detect_platform(url)):
+        result = ydl.extract_info(url, download=False, process=False)
+        # Une chaîne redirige souvent vers son onglet « vidéos »
+        for _ in range(5):
+            if result.get("_type") not in ("url", "url_transparent"):
+                break
+            result = ydl.extract_info(result["url"], download=False, process=False,
+                                      ie_key=result.get("ie_key"))
+        if result.get("_type") not in ("playlist", "multi_video"):
+            raise ValueError("Ce lien n'est pas une playlist ni une chaîne.")
+
+        entries = result.get("entries") or []
+        page = []
+        error = None
+        try:
+            if hasattr(entries, "getslice"):
+                page.extend(entries.getslice(offset, offset + limit + 1))
+            else:
+                page.extend(itertools.islice(entries, offset, offset + limit + 1))
+        except Exception as e:
+            error = f"Lecture de la playlist interrompue : {e}"
+    return result, page, error
 
-    .formats-list {
-      display: flex;
-      flex-direction: column;
-      gap: 0.4rem;
-    }
 
-    .format-row {
-      display: grid;
-      grid-template-columns: 1.2fr 0.9fr auto;
-      gap: 0.6rem;
-      align-items: center;
-      padding: 0.4rem 0.5rem;
-      border-radius: 0.8rem;
-      background: rgba(15, 23, 42, 0.85);
-      border: 1px solid rgba(51, 65, 85, 0.9);
+def entry_summary(entry: dict) -> dict:
+    thumbs = entry.get("thumbnails") or []
+    return {
+        "id": entry.get("id"),
+        "title": entry.get("title"),
+        "url": entry.get("url") or entry.get("webpage_url"),
+        "duration": format_duration(entry.get("duration")),
+        "thumbnail": entry.get("thumbnail") or (thumbs[-1].get("url") if thumbs else None),
     }
 
-    .format-main {
-      font-size: 0.86rem;
-    }
 
-    .format-meta {
-      font-size: 0.78rem;
-      color: var(--muted);
-    }
+def iter_playlist_page(playlist: dict, page: list, error: str | None, offset: int, limit: int, resolve: int):
+    """
+    NDJSON : une ligne "playlist", puis une ligne "entry" par entrée de la
+    page (lue par read_playlist_page), des lignes "entry_info" pour les
+    `resolve` premières entrées (formats résolus en parallèle, au fil de
+    l'eau), et une ligne "page".
+    """
+    yield json.dumps({
+        "type": "playlist",
+        "id": playlist.get("id"),
+        "title": playlist.get("title"),
+        "uploader": playlist.get("uploader") or playlist.get("channel"),
+        "entry_count": playlist.get("playlist_count"),
+        "offset": offset,
+        "limit": limit,
+    }) + "\n"
+
+    has_more = len(page) > limit
+    page = page[:limit]
+    pool = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="deku-playlist")
+    futures = {}
+    returned = 0
+    try:
+        for entry in page:
+            index = offset + returned
+            summary = entry_summary(entry)
+            yield json.dumps({"type": "entry", "index": index, **summary}) + "\n"
+            if returned < resolve and summary["url"]:
+                futures[pool.submit(contextvars.copy_context().run, analyze_item, summary["url"])] = index
+            returned += 1
+        if error is not None:
+            yield json.dumps({"type": "error", "error": error}) + "\n"
+
+        for future in as_completed(futures):
+            yield json.dumps({"type": "entry_info", "index": futures[future], **future.result()}) + "\n"
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
 
-    .format-type {
-      font-size: 0.8rem;
-      padding: 0.15rem 0.45rem;
-      border-radius: 999px;
-      background: var(--accent-soft);
-      color: var(--accent);
-      justify-self: flex-start;
-    }
+    yield json.dumps({
+        "type": "page",
+        "offset": offset,
+        "limit": limit,
+        "returned": returned,
+        "next_offset": offset + returned if has_more else None,
+    }) + "\n"
 
-    .format-btn {
-      padding: 0.45rem 0.75rem;
-      border-radius: 999px;
-      border: none;
-      background: rgba(34, 197, 94, 0.15);
-      color: var(--accent);
-      font-size: 0.78rem;
-      cursor: pointer;
-      white-space: nowrap;
-    }
 
-    .format-btn:hover {
-      background: rgba(34, 197, 94, 0.3);
-    }
+# ==========================
+# Démarrage : préchauffage et disponibilité
+# ==========================
 
-    .section {
-      padding: 3rem 0;
-    }
+READY = threading.Event()
+STARTUP = {
+    "module_import_seconds": None,
+    "yt_dlp_import_seconds": None,
+    "extractors_seconds": None,
+    "pool_prime_seconds": None,
+    "warmup_seconds": None,
+    "time_to_ready_seconds": None,
+    "warmup_error": None,
+}
 
-    .section-alt {
-      background: radial-gradient(circle at top, #020617 0, #020617 40%, #000 100%);
-    }
 
-    .section h2 {
-      margin-top: 0;
-      margin-bottom: 1.5rem;
-    }
+def startup_phase(phase: str, seconds: float) -> None:
+    """
+    Durée d'une phase du démarrage, dans /api/stats et sur /metrics.
+    """
+    STARTUP[f"{phase}_seconds"] = round(seconds, 3)
+    METRICS.startup_phase(phase, seconds)
 
-    .steps {
-      display: grid;
-      grid-template-columns: repeat(auto-fit, minmax(220px, 1fr));
-      gap: 1.5rem;
-    }
 
-    .step {
-      background: rgba(15, 23, 42, 0.9);
-      border-radius: 1rem;
-      padding: 1rem;
-      border: 1px solid rgba(148, 163, 184, 0.2);
-    }
+def warm_up() -> None:
+    """
+    Importe yt_dlp, charge les extracteurs des plateformes courantes et
+    prépare des instances YoutubeDL, puis marque l'application prête.
+    Un échec n'empêche pas de servir : les requêtes paieront l'init.
+    """
+    started = time.perf_counter()
+    try:
+        step = time.perf_counter()
+        yt_dlp = load_yt_dlp()
+        startup_phase("yt_dlp_import", time.perf_counter() - step)
+
+        step = time.perf_counter()
+        YDL_POOL.prime("analyze")
+        YDL_POOL.prime("download")
+        startup_phase("pool_prime", time.perf_counter() - step)
+
+        step = time.perf_counter()
+        with YDL_POOL.checkout("analyze") as ydl:
+            for ie_key in WARMUP_EXTRACTORS:
+                try:
+                    ydl.get_info_extractor(ie_key.strip())
+                except Exception:
+                    pass
+        yt_dlp.extractor.gen_extractor_classes()
+        EXTRACTOR.warm_up()
+        startup_phase("extractors", time.perf_counter() - step)
+    except Exception as e:
+        STARTUP["warmup_error"] = repr(e)
+    finally:
+        startup_phase("warmup", time.perf_counter() - started)
+        startup_phase("time_to_ready", time.perf_counter() - MODULE_IMPORT_STARTED)
+        READY.set()
 
-    .step-number {
-      display: inline-flex;
-      width: 1.6rem;
-      height: 1.6rem;
-      border-radius: 999px;
-      align-items: center;
-      justify-content: center;
-      font-size: 0.8rem;
-      background: var(--accent-soft);
-      color: var(--accent);
-      margin-bottom: 0.4rem;
-    }
 
-    .platform-grid {
-      display: grid;
-      grid-template-columns: repeat(auto-fit, minmax(130px, 1fr));
-      gap: 1rem;
-    }
+def start_warm_up() -> None:
+    if not WARMUP_ENABLED:
+        startup_phase("time_to_ready", time.perf_counter() - MODULE_IMPORT_STARTED)
+        READY.set()
+        return
+    threading.Thread(target=warm_up, name="deku-warmup", daemon=True).start()
 
-    .platform-item {
-      padding: 0.9rem 1rem;
-      border-radius: 999px;
-      background: rgba(15, 23, 42, 0.95);
-      border: 1px solid rgba(148, 163, 184, 0.25);
-      font-size: 0.9rem;
-      text-align: center;
-    }
 
-    .platform-item.yt { border-color: #ef4444; }
-    .platform-item.tiktok { border-color: #0ea5e9; }
-    .platform-item.insta { border-color: #db2777; }
-    .platform-item.fb { border-color: #3b82f6; }
-    .platform-item.pin { border-color: #f97316; }
-    .platform-item.tw { border-color: #e5e7eb; }
-
-    .faq-list details {
-      background: rgba(15, 23, 42, 0.95);
-      border-radius: 0.9rem;
-      padding: 0.7rem 0.9rem;
-      margin-bottom: 0.6rem;
-      border: 1px solid rgba(148, 163, 184, 0.2);
-    }
+# ==========================
+# Schémas API
+# ==========================
 
-    .faq-list summary {
-      cursor: pointer;
-      font-size: 0.9rem;
-      list-style: none;
-    }
+class AnalyzeRequest(BaseModel):
+    url: HttpUrl
 
-    .faq-list summary::-webkit-details-marker {
-      display: none;
-    }
 
-    .dm-footer {
-      border-top: 1px solid rgba(148, 163, 184, 0.25);
-      padding: 1rem 0;
-      background: #020617;
-    }
+class BatchAnalyzeRequest(BaseModel):
+    urls: list[str] = Field(..., min_length=1, max_length=BATCH_MAX_URLS)
 
-    .footer-inner {
-      text-align: center;
-      font-size: 0.8rem;
-      color: var(--muted);
-    }
 
-    @media (max-width: 800px) {
-      .hero-inner {
-        grid-template-columns: minmax(0, 1fr);
-      }
+class JobRequest(BaseModel):
+    url: HttpUrl
+    format_id: str
 
-      .hero-card {
-        order: -1;
-      }
 
-      .nav {
-        display: none;
-      }
-    }
+class AnalyzeResponse(BaseModel):
+    title: str | None
+    thumbnail: str | None
+    duration: str | None
+    platform: str
+    formats: list[dict]
+    original_url: str
 
-    @media (max-width: 480px) {
-      .input-group {
-        flex-direction: column;
-      }
 
-      .format-row {
-        grid-template-columns: 1.4fr auto;
-        grid-template-rows: auto auto;
-      }
+# ==========================
+# Route HTML (frontend)
+# ==========================
 
-      .format-type {
-        justify-self: flex-end;
-      }
-    }
-  </style>
+HTML_PAGE = """
+<!DOCTYPE html>
+<html lang="fr">
+<head>
+  <meta charset="UTF-8" />
+  <title>Deku-Media 2.0 - Téléchargement Vidéos</title>
+  <meta name="viewport" content="width=device-width, initial-scale=1.0" />
+  <link rel="stylesheet" href="/static/__APP_CSS__" />
 </head>
 <body>
   <header class="dm-header">
@@ -695,150 +3989,647 @@ HTML_PAGE = """
     </div>
   </footer>
 
-  <script>
-    const form = document.getElementById("download-form");
-    const urlInput = document.getElementById("video-url");
-    const analyzeBtn = document.getElementById("analyze-btn");
-    const errorBox = document.getElementById("error-box");
-    const infoBox = document.getElementById("info-box");
-    const videoMetaBlock = document.getElementById("video-meta");
-    const thumbEl = document.getElementById("thumb");
-    const titleEl = document.getElementById("title");
-    const platformLabelEl = document.getElementById("platform-label");
-    const formatsContainer = document.getElementById("formats");
-    const placeholder = document.getElementById("placeholder");
-
-    document.getElementById("year").textContent = new Date().getFullYear();
-
-    function showError(msg) {
-      errorBox.textContent = msg;
-      errorBox.classList.remove("hidden");
-    }
+  <script src="/static/__APP_JS__"></script>
+</body>
+</html>
+"""
 
-    function clearError() {
-      errorBox.classList.add("hidden");
-      errorBox.textContent = "";
-    }
+APP_CSS = """
+:root {
+  --bg: #050816;
+  --bg-alt: #0b1020;
+  --accent: #22c55e;
+  --accent-soft: rgba(34, 197, 94, 0.1);
+  --text: #f9fafb;
+  --muted: #9ca3af;
+  --error: #f97373;
+  --info: #3b82f6;
+  --radius: 12px;
+  --shadow-soft: 0 18px 40px rgba(15, 23, 42, 0.6);
+}
+
+*,
+*::before,
+*::after {
+  box-sizing: border-box;
+}
+
+body {
+  margin: 0;
+  font-family: system-ui, -apple-system, BlinkMacSystemFont, "SF Pro Text", sans-serif;
+  background: radial-gradient(circle at top, #111827 0, #020617 45%, #000 100%);
+  color: var(--text);
+  -webkit-font-smoothing: antialiased;
+}
+
+.container {
+  width: 100%;
+  max-width: 1100px;
+  margin: 0 auto;
+  padding: 0 1.25rem;
+}
+
+.dm-header {
+  position: sticky;
+  top: 0;
+  z-index: 50;
+  backdrop-filter: blur(18px);
+  background: linear-gradient(to bottom, rgba(2, 6, 23, 0.9), transparent);
+  border-bottom: 1px solid rgba(148, 163, 184, 0.12);
+}
+
+.header-inner {
+  display: flex;
+  align-items: center;
+  justify-content: space-between;
+  padding: 0.75rem 0;
+}
+
+.logo {
+  font-weight: 800;
+  letter-spacing: 0.04em;
+  display: flex;
+  align-items: baseline;
+  gap: 0.15rem;
+}
+
+.logo-main {
+  font-size: 1.1rem;
+  color: var(--accent);
+}
+
+.logo-sub {
+  font-size: 0.9rem;
+  color: var(--muted);
+}
+
+.nav {
+  display: flex;
+  gap: 1.2rem;
+  font-size: 0.9rem;
+}
+
+.nav a {
+  color: var(--muted);
+  text-decoration: none;
+  position: relative;
+  padding-bottom: 0.2rem;
+}
+
+.nav a:hover {
+  color: var(--text);
+}
+
+.nav a::after {
+  content: "";
+  position: absolute;
+  left: 0;
+  bottom: 0;
+  width: 0;
+  height: 2px;
+  background: var(--accent);
+  transition: width 0.2s ease-out;
+}
+
+.nav a:hover::after {
+  width: 100%;
+}
+
+.hero {
+  padding: 4rem 0 3rem;
+}
+
+.hero-inner {
+  display: grid;
+  grid-template-columns: minmax(0, 1.1fr) minmax(0, 1fr);
+  gap: 2rem;
+  align-items: flex-start;
+}
+
+.hero-text h1 {
+  font-size: clamp(1.9rem, 3vw, 2.4rem);
+  margin: 0 0 0.75rem;
+}
+
+.hero-text p {
+  margin: 0 0 1.5rem;
+  color: var(--muted);
+}
+
+.download-form label {
+  font-size: 0.9rem;
+  color: var(--muted);
+  display: block;
+  margin-bottom: 0.35rem;
+}
+
+.input-group {
+  display: flex;
+  gap: 0.6rem;
+  margin-bottom: 0.35rem;
+}
+
+.input-group input {
+  flex: 1;
+  padding: 0.75rem 0.9rem;
+  border-radius: var(--radius);
+  border: 1px solid rgba(148, 163, 184, 0.35);
+  background: rgba(15, 23, 42, 0.8);
+  color: var(--text);
+  outline: none;
+}
+
+.input-group input:focus {
+  border-color: var(--accent);
+  box-shadow: 0 0 0 1px rgba(34, 197, 94, 0.4);
+}
+
+.input-group button {
+  padding: 0.75rem 1.2rem;
+  border-radius: var(--radius);
+  border: none;
+  background: linear-gradient(135deg, #22c55e, #16a34a);
+  color: #0b1120;
+  font-weight: 600;
+  cursor: pointer;
+  white-space: nowrap;
+  display: inline-flex;
+  align-items: center;
+  gap: 0.4rem;
+}
+
+.input-group button:disabled {
+  opacity: 0.6;
+  cursor: wait;
+}
+
+.input-hint {
+  font-size: 0.78rem;
+  color: var(--muted);
+}
+
+.alert {
+  margin-top: 0.75rem;
+  padding: 0.6rem 0.8rem;
+  border-radius: 0.75rem;
+  font-size: 0.82rem;
+}
+
+.alert-error {
+  background: rgba(239, 68, 68, 0.12);
+  color: #fecaca;
+  border: 1px solid rgba(248, 113, 113, 0.5);
+}
+
+.alert-info {
+  background: rgba(59, 130, 246, 0.12);
+  color: #bfdbfe;
+  border: 1px solid rgba(96, 165, 250, 0.5);
+}
+
+.hidden {
+  display: none !important;
+}
+
+.hero-card {
+  background: radial-gradient(circle at top left, #1e293b 0, #020617 60%);
+  border-radius: 1.4rem;
+  padding: 1.2rem;
+  box-shadow: var(--shadow-soft);
+  border: 1px solid rgba(148, 163, 184, 0.3);
+  min-height: 220px;
+}
+
+.hero-card p {
+  color: var(--muted);
+  font-size: 0.9rem;
+}
+
+#video-meta {
+  display: grid;
+  grid-template-columns: 120px minmax(0, 1fr);
+  gap: 0.75rem;
+  margin-bottom: 1rem;
+}
+
+#thumb {
+  width: 100%;
+  border-radius: 0.8rem;
+  object-fit: cover;
+}
+
+#title {
+  font-size: 1rem;
+  margin: 0 0 0.35rem;
+}
+
+#platform-label {
+  font-size: 0.8rem;
+  color: var(--muted);
+}
+
+.formats-list {
+  display: flex;
+  flex-direction: column;
+  gap: 0.4rem;
+}
+
+.format-row {
+  display: grid;
+  grid-template-columns: 1.2fr 0.9fr auto;
+  gap: 0.6rem;
+  align-items: center;
+  padding: 0.4rem 0.5rem;
+  border-radius: 0.8rem;
+  background: rgba(15, 23, 42, 0.85);
+  border: 1px solid rgba(51, 65, 85, 0.9);
+}
+
+.format-main {
+  font-size: 0.86rem;
+}
+
+.format-meta {
+  font-size: 0.78rem;
+  color: var(--muted);
+}
+
+.format-type {
+  font-size: 0.8rem;
+  padding: 0.15rem 0.45rem;
+  border-radius: 999px;
+  background: var(--accent-soft);
+  color: var(--accent);
+  justify-self: flex-start;
+}
+
+.format-btn {
+  padding: 0.45rem 0.75rem;
+  border-radius: 999px;
+  border: none;
+  background: rgba(34, 197, 94, 0.15);
+  color: var(--accent);
+  font-size: 0.78rem;
+  cursor: pointer;
+  white-space: nowrap;
+}
+
+.format-btn:hover {
+  background: rgba(34, 197, 94, 0.3);
+}
+
+.section {
+  padding: 3rem 0;
+}
+
+.section-alt {
+  background: radial-gradient(circle at top, #020617 0, #020617 40%, #000 100%);
+}
+
+.section h2 {
+  margin-top: 0;
+  margin-bottom: 1.5rem;
+}
+
+.steps {
+  display: grid;
+  grid-template-columns: repeat(auto-fit, minmax(220px, 1fr));
+  gap: 1.5rem;
+}
+
+.step {
+  background: rgba(15, 23, 42, 0.9);
+  border-radius: 1rem;
+  padding: 1rem;
+  border: 1px solid rgba(148, 163, 184, 0.2);
+}
+
+.step-number {
+  display: inline-flex;
+  width: 1.6rem;
+  height: 1.6rem;
+  border-radius: 999px;
+  align-items: center;
+  justify-content: center;
+  font-size: 0.8rem;
+  background: var(--accent-soft);
+  color: var(--accent);
+  margin-bottom: 0.4rem;
+}
+
+.platform-grid {
+  display: grid;
+  grid-template-columns: repeat(auto-fit, minmax(130px, 1fr));
+  gap: 1rem;
+}
+
+.platform-item {
+  padding: 0.9rem 1rem;
+  border-radius: 999px;
+  background: rgba(15, 23, 42, 0.95);
+  border: 1px solid rgba(148, 163, 184, 0.25);
+  font-size: 0.9rem;
+  text-align: center;
+}
+
+.platform-item.yt { border-color: #ef4444; }
+.platform-item.tiktok { border-color: #0ea5e9; }
+.platform-item.insta { border-color: #db2777; }
+.platform-item.fb { border-color: #3b82f6; }
+.platform-item.pin { border-color: #f97316; }
+.platform-item.tw { border-color: #e5e7eb; }
+
+.faq-list details {
+  background: rgba(15, 23, 42, 0.95);
+  border-radius: 0.9rem;
+  padding: 0.7rem 0.9rem;
+  margin-bottom: 0.6rem;
+  border: 1px solid rgba(148, 163, 184, 0.2);
+}
+
+.faq-list summary {
+  cursor: pointer;
+  font-size: 0.9rem;
+  list-style: none;
+}
+
+.faq-list summary::-webkit-details-marker {
+  display: none;
+}
+
+.dm-footer {
+  border-top: 1px solid rgba(148, 163, 184, 0.25);
+  padding: 1rem 0;
+  background: #020617;
+}
+
+.footer-inner {
+  text-align: center;
+  font-size: 0.8rem;
+  color: var(--muted);
+}
+
+@media (max-width: 800px) {
+  .hero-inner {
+    grid-template-columns: minmax(0, 1fr);
+  }
+
+  .hero-card {
+    order: -1;
+  }
+
+  .nav {
+    display: none;
+  }
+}
+
+@media (max-width: 480px) {
+  .input-group {
+    flex-direction: column;
+  }
+
+  .format-row {
+    grid-template-columns: 1.4fr auto;
+    grid-template-rows: auto auto;
+  }
+
+  .format-type {
+    justify-self: flex-end;
+  }
+}
+"""
 
-    function showInfo(msg) {
-      infoBox.textContent = msg;
-      infoBox.classList.remove("hidden");
-    }
+APP_JS = """
+const form = document.getElementById("download-form");
+const urlInput = document.getElementById("video-url");
+const analyzeBtn = document.getElementById("analyze-btn");
+const errorBox = document.getElementById("error-box");
+const infoBox = document.getElementById("info-box");
+const videoMetaBlock = document.getElementById("video-meta");
+const thumbEl = document.getElementById("thumb");
+const titleEl = document.getElementById("title");
+const platformLabelEl = document.getElementById("platform-label");
+const formatsContainer = document.getElementById("formats");
+const placeholder = document.getElementById("placeholder");
+
+document.getElementById("year").textContent = new Date().getFullYear();
+
+function showError(msg) {
+  errorBox.textContent = msg;
+  errorBox.classList.remove("hidden");
+}
+
+function clearError() {
+  errorBox.classList.add("hidden");
+  errorBox.textContent = "";
+}
+
+function showInfo(msg) {
+  infoBox.textContent = msg;
+  infoBox.classList.remove("hidden");
+}
+
+function clearInfo() {
+  infoBox.classList.add("hidden");
+  infoBox.textContent = "";
+}
+
+form.addEventListener("submit", async (e) => {
+  e.preventDefault();
+  clearError();
+  clearInfo();
+
+  const url = urlInput.value.trim();
+  if (!url) {
+    showError("Merci de coller un lien valide.");
+    return;
+  }
+
+  analyzeBtn.disabled = true;
+  analyzeBtn.textContent = "Analyse en cours…";
+
+  placeholder.classList.remove("hidden");
+  videoMetaBlock.classList.add("hidden");
+  formatsContainer.classList.add("hidden");
+  formatsContainer.innerHTML = "";
+
+  try {
+    const res = await fetch("/api/analyze", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ url }),
+    });
 
-    function clearInfo() {
-      infoBox.classList.add("hidden");
-      infoBox.textContent = "";
+    if (!res.ok) {
+      const data = await res.json().catch(() => ({}));
+      throw new Error(data.detail || "Analyse impossible. Vérifiez le lien.");
     }
 
-    form.addEventListener("submit", async (e) => {
-      e.preventDefault();
-      clearError();
-      clearInfo();
-
-      const url = urlInput.value.trim();
-      if (!url) {
-        showError("Merci de coller un lien valide.");
-        return;
-      }
-
-      analyzeBtn.disabled = true;
-      analyzeBtn.textContent = "Analyse en cours…";
-
-      placeholder.classList.remove("hidden");
-      videoMetaBlock.classList.add("hidden");
-      formatsContainer.classList.add("hidden");
-      formatsContainer.innerHTML = "";
-
-      try {
-        const res = await fetch("/api/analyze", {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ url }),
-        });
-
-        if (!res.ok) {
-          const data = await res.json().catch(() => ({}));
-          throw new Error(data.detail || "Analyse impossible. Vérifiez le lien.");
-        }
-
-        const data = await res.json();
-        renderVideoInfo(data);
-        renderFormats(data);
-      } catch (err) {
-        showError(err.message || "Une erreur s'est produite.");
-      } finally {
-        analyzeBtn.disabled = false;
-        analyzeBtn.textContent = "Analyser";
+    const data = await res.json();
+    renderVideoInfo(data);
+    renderFormats(data);
+  } catch (err) {
+    showError(err.message || "Une erreur s'est produite.");
+  } finally {
+    analyzeBtn.disabled = false;
+    analyzeBtn.textContent = "Analyser";
+  }
+});
+
+function renderVideoInfo(data) {
+  placeholder.classList.add("hidden");
+  videoMetaBlock.classList.remove("hidden");
+
+  thumbEl.src = data.thumbnail || "";
+  thumbEl.style.display = data.thumbnail ? "block" : "none";
+  titleEl.textContent = data.title || "Vidéo détectée";
+  platformLabelEl.textContent = (data.platform || "inconnu").toUpperCase() + " • Durée : " + (data.duration || "N/A");
+}
+
+function renderFormats(data) {
+  formatsContainer.classList.remove("hidden");
+  formatsContainer.innerHTML = "";
+
+  const formats = data.formats || [];
+  if (!formats.length) {
+    formatsContainer.innerHTML = "<p>Aucun format téléchargeable trouvé.</p>";
+    return;
+  }
+
+  formats.forEach((f) => {
+    const row = document.createElement("div");
+    row.className = "format-row";
+
+    const main = document.createElement("div");
+    main.className = "format-main";
+    main.textContent = (f.quality || f.resolution || "Auto") + " • " + (f.ext || "mp4");
+
+    const meta = document.createElement("div");
+    meta.className = "format-meta";
+    meta.textContent = f.filesize_human || "Taille inconnue";
+
+    const type = document.createElement("div");
+    type.className = "format-type";
+    type.textContent = f.is_audio ? "Audio" : "Vidéo";
+
+    const btn = document.createElement("button");
+    btn.className = "format-btn";
+    btn.textContent = "Télécharger";
+
+    btn.addEventListener("click", () => {
+      // Le ticket évite une nouvelle extraction côté serveur
+      const params = new URLSearchParams(f.ticket ? { ticket: f.ticket } : {
+        url: data.original_url,
+        format_id: f.format_id,
+      });
+      // Redirection vers le CDN quand le format le permet ; sinon le
+      // serveur garde son mode par défaut
+      if (f.delivery === "redirect") {
+        params.set("mode", "redirect");
       }
+      window.location.href = "/api/download?" + params.toString();
     });
 
-    function renderVideoInfo(data) {
-      placeholder.classList.add("hidden");
-      videoMetaBlock.classList.remove("hidden");
-
-      thumbEl.src = data.thumbnail || "";
-      thumbEl.style.display = data.thumbnail ? "block" : "none";
-      titleEl.textContent = data.title || "Vidéo détectée";
-      platformLabelEl.textContent = (data.platform || "inconnu").toUpperCase() + " • Durée : " + (data.duration || "N/A");
-    }
-
-    function renderFormats(data) {
-      formatsContainer.classList.remove("hidden");
-      formatsContainer.innerHTML = "";
-
-      const formats = data.formats || [];
-      if (!formats.length) {
-        formatsContainer.innerHTML = "<p>Aucun format téléchargeable trouvé.</p>";
-        return;
-      }
+    const left = document.createElement("div");
+    left.appendChild(main);
+    left.appendChild(meta);
 
-      formats.forEach((f) => {
-        const row = document.createElement("div");
-        row.className = "format-row";
+    row.appendChild(left);
+    row.appendChild(type);
+    row.appendChild(btn);
 
-        const main = document.createElement("div");
-        main.className = "format-main";
-        main.textContent = (f.quality || f.resolution || "Auto") + " • " + (f.ext || "mp4");
+    formatsContainer.appendChild(row);
+  });
+}
+"""
 
-        const meta = document.createElement("div");
-        meta.className = "format-meta";
-        meta.textContent = f.filesize_human || "Taille inconnue";
+class StaticAsset:
+    """
+    Ressource du frontend compressée une seule fois au chargement (gzip, et
+    brotli si le module est installé). Chaque encodage a son propre ETag fort.
+    """
 
-        const type = document.createElement("div");
-        type.className = "format-type";
-        type.textContent = f.is_audio ? "Audio" : "Vidéo";
+    def __init__(self, body: str, media_type: str):
+        raw = body.encode()
+        self.media_type = media_type
+        self.digest = hashlib.sha256(raw).hexdigest()[:16]
+        self.variants = {"identity": raw}
+        gz = gzip.compress(raw, compresslevel=9, mtime=0)
+        if len(gz) < len(raw):
+            self.variants["gzip"] = gz
+        if brotli is not None:
+            br = brotli.compress(raw, quality=11)
+            if len(br) < len(raw):
+                self.variants["br"] = br
+
+    def etag(self, encoding: str) -> str:
+        if encoding == "identity":
+            return f'"{self.digest}"'
+        return f'"{self.digest}-{encoding}"'
+
+    def response(self, request: Request, cache_control: str) -> Response:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"), self.variants)
+        headers = {
+            "etag": self.etag(encoding),
+            "cache-control": cache_control,
+            "vary": "Accept-Encoding",
+        }
+        if etag_matches(request.headers.get("if-none-match"), headers["etag"]):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["content-encoding"] = encoding
+        return Response(self.variants[encoding], media_type=self.media_type, headers=headers)
 
-        const btn = document.createElement("button");
-        btn.className = "format-btn";
-        btn.textContent = "Télécharger";
 
-        btn.addEventListener("click", () => {
-          const params = new URLSearchParams({
-            url: data.original_url,
-            format_id: f.format_id,
-          });
-          window.location.href = "/api/download?" + params.toString();
-        });
+def negotiate_encoding(header: str | None, available) -> str:
+    """
+    Choisit br puis gzip selon Accept-Encoding (valeurs q incluses).
+    """
+    if not header:
+        return "identity"
+    weights = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip().lower()] = q
+    for coding in ("br", "gzip"):
+        if coding in available and weights.get(coding, weights.get("*", 0)) > 0:
+            return coding
+    return "identity"
+
+
+CSS_ASSET = StaticAsset(APP_CSS, "text/css; charset=utf-8")
+JS_ASSET = StaticAsset(APP_JS, "text/javascript; charset=utf-8")
+STATIC_ASSETS = {
+    f"app.{CSS_ASSET.digest}.css": CSS_ASSET,
+    f"app.{JS_ASSET.digest}.js": JS_ASSET,
+}
+INDEX_ASSET = StaticAsset(
+    HTML_PAGE.replace("__APP_CSS__", f"app.{CSS_ASSET.digest}.css")
+             .replace("__APP_JS__", f"app.{JS_ASSET.digest}.js"),
+    "text/html; charset=utf-8",
+)
 
-        const left = document.createElement("div");
-        left.appendChild(main);
-        left.appendChild(meta);
 
-        row.appendChild(left);
-        row.appendChild(type);
-        row.appendChild(btn);
+@app.get("/", response_class=HTMLResponse)
+def index(request: Request):
+    # La page est revalidée à chaque visite (ETag) ; ses ressources ont un
+    # nom haché et sont mises en cache indéfiniment.
+    return INDEX_ASSET.response(request, "no-cache")
 
-        formatsContainer.appendChild(row);
-      });
-    }
-  </script>
-</body>
-</html>
-"""
 
-@app.get("/", response_class=HTMLResponse)
-def index():
-    return HTML_PAGE
+@app.get("/static/{name}")
+def static_asset(name: str, request: Request):
+    asset = STATIC_ASSETS.get(name)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Ressource introuvable.")
+    return asset.response(request, "public, max-age=31536000, immutable")
 
 
 # ==========================
@@ -848,44 +4639,370 @@ def index():
 @app.post("/api/analyze", response_model=AnalyzeResponse)
 def analyze_video(payload: AnalyzeRequest):
     url = str(payload.url)
+    tag_request(url)
     try:
         info = get_video_info(url)
+        if info["is_playlist"]:
+            raise HTTPException(status_code=400, detail="Lien de playlist : utilisez /api/analyze/playlist.")
         if not info["formats"]:
             raise HTTPException(status_code=400, detail="Aucun format disponible pour ce lien.")
-        return info
+        return TICKETS.annotate(info)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Analyse impossible : {e}")
+
+
+@app.post("/api/analyze/batch")
+def analyze_batch(payload: BatchAnalyzeRequest):
+    """
+    Analyse une liste de liens en parallèle ; réponse NDJSON, une ligne par
+    lien ({"index", "url", "ok", "result" | "error"}) dans l'ordre de fin.
+    """
+    return StreamingResponse(
+        iter_batch_analysis(payload.urls),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.get("/api/analyze/playlist")
+def analyze_playlist(
+    url: str = Query(...),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=PLAYLIST_MAX_LIMIT),
+    resolve: int = Query(0, ge=0, le=PLAYLIST_MAX_RESOLVE),
+):
+    """
+    Liste paginée et progressive (NDJSON) des entrées d'une playlist/chaîne.
+    resolve=N résout aussi les formats des N premières entrées de la page.
+    """
+    tag_request(url)
+    try:
+        playlist, page, error = read_playlist_page(url, offset, limit)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Analyse impossible : {e}")
+    return StreamingResponse(
+        iter_playlist_page(playlist, page, error, offset, limit, min(resolve, limit)),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.get("/healthz/live")
+def healthz_live():
+    return {"status": "alive"}
+
+
+@app.get("/healthz/ready")
+def healthz_ready():
+    """
+    503 tant que le préchauffage n'est pas terminé (le pod ne reçoit pas
+    encore de trafic).
+    """
+    if not READY.is_set():
+        return JSONResponse(status_code=503, content={"status": "warming"})
+    if MEMORY.recycling.is_set():
+        return JSONResponse(status_code=503, content={"status": "recycling", "reason": MEMORY.recycle_reason})
+    return {"status": "ready", "startup": STARTUP}
+
+
+@app.get("/api/stats")
+def stats_endpoint():
+    return {
+        "startup": {"ready": READY.is_set(), **STARTUP},
+        "metadata_cache": METADATA_CACHE.stats(),
+        "metadata_store": METADATA_STORE.stats() if METADATA_STORE is not None else None,
+        "media_cache": MEDIA_CACHE.stats(),
+        "download_leases": DOWNLOAD_LEASES.stats(),
+        "followers": FOLLOWER.stats(),
+        "tickets": TICKETS.stats(),
+        "janitor": JANITOR.stats(),
+        "jobs": JOBS.stats(),
+        "scheduler": SCHEDULER.stats(),
+        "ydl_pool": YDL_POOL.stats(),
+        "extraction": EXTRACTOR.stats(),
+        "memory": MEMORY.stats(),
+    }
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """
+    Exposition Prometheus (agrégée sur tous les workers en mode multi-processus).
+    """
+    if not METRICS.enabled:
+        raise HTTPException(status_code=501, detail="Métriques désactivées (prometheus_client absent ou DEKU_METRICS=0).")
+    return Response(METRICS.render(), media_type=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+def require_admin(request: Request) -> None:
+    """
+    Les routes /api/admin/* n'existent pas sans DEKU_ADMIN_TOKEN.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Ressource introuvable.")
+    token = request.headers.get("x-deku-admin-token", "")
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Jeton d'administration invalide.")
+
+
+@app.get("/api/admin/profiles")
+def list_profiles(request: Request, limit: int = Query(50, ge=1, le=1000)):
+    require_admin(request)
+    return {"profiles": PROFILES.list(limit)}
+
+
+@app.get("/api/admin/profiles/{profile_id}")
+def get_profile(
+    profile_id: str,
+    request: Request,
+    format: str = Query("text", pattern="^(text|prof)$"),
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls|ncalls)$"),
+    limit: int = Query(60, ge=1, le=1000),
+):
+    """
+    format=text : résumé pstats ; format=prof : fichier brut (snakeviz, pstats).
+    """
+    require_admin(request)
+    path = PROFILES.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profil introuvable.")
+    if format == "prof":
+        return FileResponse(path, filename=path.name, media_type="application/octet-stream")
+    return Response(ProfileStore.render_text(path, sort, limit), media_type="text/plain; charset=utf-8")
+
+
+@app.get("/api/admin/memory")
+def memory_status(request: Request):
+    """
+    RSS courant, état de tracemalloc et RSS avant/après des dernières requêtes.
+    """
+    require_admin(request)
+    return {**MEMORY.stats(), **MEMORY.requests_report()}
+
+
+@app.post("/api/admin/memory/tracemalloc")
+def memory_tracemalloc(request: Request, enabled: bool = Query(...), frames: int = Query(10, ge=1, le=100)):
+    """
+    Active/désactive tracemalloc (les allocations antérieures ne sont pas tracées).
+    """
+    require_admin(request)
+    if enabled:
+        MEMORY.start_tracing(frames)
+    else:
+        MEMORY.stop_tracing()
+    return MEMORY.stats()["tracemalloc"]
+
+
+@app.post("/api/admin/memory/snapshots", status_code=201)
+def memory_snapshot(request: Request):
+    require_admin(request)
+    try:
+        return {"id": MEMORY.snapshot()}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get("/api/admin/memory/top")
+def memory_top(
+    request: Request,
+    snapshot: str | None = Query(None, description="id d'instantané ; un nouvel instantané sinon"),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=500),
+):
+    """
+    Principaux sites d'allocation encore vivants.
+    """
+    require_admin(request)
+    try:
+        return {"top": MEMORY.top(snapshot, group_by, limit)}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Instantané introuvable.")
+
+
+@app.get("/api/admin/memory/diff")
+def memory_diff(
+    request: Request,
+    base: str = Query(...),
+    target: str | None = Query(None, description="id d'instantané ; un nouvel instantané sinon"),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=500),
+):
+    """
+    Croissance par site d'allocation entre deux instantanés (triée par
+    différence de taille).
+    """
+    require_admin(request)
+    try:
+        return {"diff": MEMORY.diff(base, target, group_by, limit)}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Instantané introuvable.")
+
+
+def etag_matches(header: str | None, etag: str) -> bool:
+    """
+    Comparaison faible (RFC 9110) pour If-None-Match.
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == bare for tag in header.split(","))
+
+
+def file_response(request: Request, path: Path, background: BackgroundTask | None = None) -> Response:
+    """
+    Sert un fichier téléchargé. Les entrées du cache portent un ETag fort :
+    If-None-Match donne un 304, et Range / If-Range (plages simples ou
+    multiples, gérées par FileResponse) reprennent sur le fichier existant.
+    """
+    headers = {}
+    etag = MEDIA_CACHE.etag_for(path)
+    if etag is not None:
+        headers["etag"] = etag
+        headers["cache-control"] = "private, max-age=86400"
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers, background=background)
+
+    return FileResponse(
+        path=path,
+        filename=path.name,
+        media_type="application/octet-stream",
+        headers=headers,
+        background=background,
+    )
 
 
 @app.get("/api/download")
 def download_endpoint(
-    url: str = Query(...),
-    format_id: str = Query(...)
+    request: Request,
+    url: str | None = Query(None),
+    format_id: str | None = Query(None),
+    ticket: str | None = Query(None, max_length=16384),
+    mode: str = Query("file", pattern="^(file|stream|redirect)$"),
 ):
+    """
+    mode=file : téléchargement complet côté serveur puis envoi du fichier.
+    mode=stream : pour les formats progressifs, les octets sont relayés au
+    client pendant le téléchargement (repli sur mode=file sinon).
+    mode=redirect : 302 vers l'URL directe quand le navigateur peut la
+    télécharger seul (delivery == "redirect"), sinon comme mode=stream.
+    ticket (de /api/analyze) remplace url et format_id et évite une
+    nouvelle extraction ; expiré, il sert seulement à relancer l'analyse.
+    """
+    redeemed = None
+    if ticket:
+        try:
+            payload = TICKETS.verify(ticket)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        url, format_id = payload["url"], payload["format_id"]
+        if not payload["expired"]:
+            redeemed = ticket_info(payload)
     if not url or not format_id:
         raise HTTPException(status_code=400, detail="Paramètres manquants.")
+    tag_request(url)
 
-    temp_dir = DOWNLOAD_DIR / str(uuid.uuid4())
-    temp_dir.mkdir(parents=True, exist_ok=True)
+    if mode in ("stream", "redirect"):
+        url_key = canonical_key(url)
+        info = redeemed
+        if info is None:
+            try:
+                info = get_video_info(url)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Téléchargement impossible : {e}")
+
+        fmt = info["media"].get(format_id)
+        if mode == "redirect" and delivery_for(format_id, fmt, info["platform"]) == "redirect":
+            return RedirectResponse(fmt["url"], status_code=302, headers={"cache-control": "no-store"})
+
+        key = MediaCache.make_key(info["extractor"], info["video_id"], format_id)
+        if is_streamable(format_id, fmt):
+            cached = MEDIA_CACHE.find(url_key, format_id, key)
+            if cached is not None:
+                return file_response(request, cached)
+            try:
+                return stream_response(info, format_id, url_key, key)
+            except Exception as e:
+                # URL directe expirée ou refusée : l'analyse en cache (mémoire
+                # et MetadataStore) donnerait la même erreur jusqu'à son TTL
+                METADATA_CACHE.invalidate(url_key)
+                if redeemed is None:
+                    raise HTTPException(status_code=502, detail=f"Flux source indisponible : {e}")
+                # URL directe du ticket refusée : repli sur le mode fichier (ré-extraction)
+                redeemed = None
+
+    if FOLLOW_INFLIGHT:
+        try:
+            followed = FOLLOWER.attach(url, format_id, redeemed)
+        except Exception:
+            followed = None
+        if followed is not None:
+            return followed
 
     try:
-        file_path = download_video(url, format_id, str(temp_dir))
-        file_path = Path(file_path)
-        if not file_path.exists():
-            raise HTTPException(status_code=500, detail="Fichier introuvable après téléchargement.")
-
-        return FileResponse(
-            path=file_path,
-            filename=file_path.name,
-            media_type="application/octet-stream",
-        )
-    except HTTPException:
-        raise
+        file_path, temp_dir = fetch_media(url, format_id, ticket=redeemed)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Téléchargement impossible : {e}")
-    finally:
-        # Nettoyage différé possible via cron/task externe
-        pass
+
+    # Le dossier temporaire est supprimé une fois la réponse envoyée
+    background = BackgroundTask(remove_tree, temp_dir) if temp_dir else None
+    return file_response(request, file_path, background=background)
+
+
+@app.post("/api/jobs", status_code=202)
+def create_job(payload: JobRequest):
+    url = str(payload.url)
+    tag_request(url)
+    try:
+        job = JOBS.submit(url, payload.format_id)
+    except queue.Full:
+        raise HTTPException(status_code=503, detail="File de téléchargements pleine, réessayez plus tard.")
+    return job.to_dict()
+
+
+def get_job_or_404(job_id: str) -> Job:
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Tâche introuvable.")
+    return job
+
+
+@app.get("/api/jobs/{job_id}")
+def job_status(job_id: str):
+    return get_job_or_404(job_id).to_dict()
+
+
+@app.get("/api/jobs/{job_id}/events")
+def job_events_endpoint(job_id: str, request: Request):
+    job = get_job_or_404(job_id)
+    return StreamingResponse(
+        job_events(job, request),
+        media_type="text/event-stream",
+        headers={"cache-control": "no-cache", "x-accel-buffering": "no"},
+    )
+
+
+@app.get("/api/jobs/{job_id}/file")
+def job_file(job_id: str, request: Request):
+    job = get_job_or_404(job_id)
+    tag_request(job.url)
+    if job.state != "finished":
+        raise HTTPException(status_code=409, detail="Téléchargement pas encore terminé.")
+    if job.file_path is not None:
+        MEDIA_CACHE.touch(job.file_path)
+    if job.file_path is None or not job.file_path.exists():
+        raise HTTPException(status_code=410, detail="Fichier expiré, relancez le téléchargement.")
+    return file_response(request, job.file_path)
+
+
+startup_phase("module_import", time.perf_counter() - MODULE_IMPORT_STARTED)
 
 
 # ==========================
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# DOWNLOAD_DIR et la base SQLite sont relatifs au dossier courant :
+# deku est importé depuis un dossier jetable
+os.chdir(tempfile.mkdtemp(prefix="deku-tests-"))
@@ -0,0 +1,63 @@
+import pytest
+
+import deku
+
+
+@pytest.mark.parametrize("url, platform, video_id, key", [
+    # YouTube : toutes les formes d'un même lien donnent la même clé
+    ("https://youtu.be/dQw4w9WgXcQ?si=Jb2kq7o2lX0", "youtube", "dQw4w9WgXcQ", "youtube:dQw4w9WgXcQ"),
+    ("https://www.youtube.com/watch?v=dQw4w9WgXcQ&feature=share", "youtube", "dQw4w9WgXcQ", "youtube:dQw4w9WgXcQ"),
+    ("https://www.youtube.com/watch/?v=dQw4w9WgXcQ", "youtube", "dQw4w9WgXcQ", "youtube:dQw4w9WgXcQ"),
+    ("https://m.youtube.com/shorts/aqz-KE-bpKQ", "youtube", "aqz-KE-bpKQ", "youtube:aqz-KE-bpKQ"),
+    ("https://www.youtube.com/embed/dQw4w9WgXcQ", "youtube", "dQw4w9WgXcQ", "youtube:dQw4w9WgXcQ"),
+    ("https://WWW.YouTube.com./live/dQw4w9WgXcQ", "youtube", "dQw4w9WgXcQ", "youtube:dQw4w9WgXcQ"),
+    # Playlist intégrée : pas un id vidéo, la clé garde list=
+    ("https://www.youtube.com/embed/videoseries?list=PLabc&si=z", "youtube", None,
+     "https://www.youtube.com/embed/videoseries?list=PLabc"),
+    ("https://youtu.be/videoseries?list=PLabc", "youtube", None, "https://youtu.be/videoseries?list=PLabc"),
+    ("https://www.youtube.com/@LinusTechTips/videos", "youtube", None,
+     "https://www.youtube.com/@LinusTechTips/videos"),
+    # id de watch invalide : URL normalisée
+    ("https://www.youtube.com/watch?v=short", "youtube", None, "https://www.youtube.com/watch?v=short"),
+    # TikTok, liens courts dans leur propre espace de clés
+    ("https://www.tiktok.com/@scout2015/video/6718335390845095173?is_from_webapp=1&sender_device=pc",
+     "tiktok", "6718335390845095173", "tiktok:6718335390845095173"),
+    ("https://vm.tiktok.com/ZMebh4Dp3/", "tiktok", None, "tiktok:short:ZMebh4Dp3"),
+    ("https://www.tiktok.com/t/ZMebh4Dp3/", "tiktok", None, "tiktok:short:ZMebh4Dp3"),
+    ("https://www.instagram.com/reel/C2vQ1mJMq7k/?igsh=MWQ1ZGUxMzBkMA==", "instagram", "C2vQ1mJMq7k",
+     "instagram:C2vQ1mJMq7k"),
+    ("https://www.instagram.com/p/C2vQ1mJMq7k/", "instagram", "C2vQ1mJMq7k", "instagram:C2vQ1mJMq7k"),
+    ("https://www.facebook.com/watch/?v=10153231379946729", "facebook", "10153231379946729",
+     "facebook:10153231379946729"),
+    ("https://www.facebook.com/nasa/videos/10153231379946729/", "facebook", "10153231379946729",
+     "facebook:10153231379946729"),
+    ("https://fb.watch/nK3pQ8aB1c/", "facebook", None, "facebook:short:nK3pQ8aB1c"),
+    ("https://x.com/NASA/status/1712345678901234567?s=20&t=abc", "twitter", "1712345678901234567",
+     "twitter:1712345678901234567"),
+    ("https://twitter.com/NASA/status/1712345678901234567", "twitter", "1712345678901234567",
+     "twitter:1712345678901234567"),
+    ("https://www.pinterest.fr/pin/some-title--585397914973085432/", "pinterest", "585397914973085432",
+     "pinterest:585397914973085432"),
+    # Hôte inconnu : schéma/hôte en minuscules, port par défaut, fragment,
+    # ordre et paramètres de suivi ignorés
+    ("https://EXAMPLE.com:443/media/clip.mp4?utm_source=newsletter&b=2&a=1#t=10", "unknown", None,
+     "https://example.com/media/clip.mp4?a=1&b=2"),
+    ("http://example.com:8080/a?fbclid=1&gclid=2", "unknown", None, "http://example.com:8080/a"),
+    ("http://example.com", "unknown", None, "http://example.com/"),
+    # Sous-chaîne trompeuse : pas youtube
+    ("https://notyoutube.com/watch?v=dQw4w9WgXcQ", "unknown", None,
+     "https://notyoutube.com/watch?v=dQw4w9WgXcQ"),
+])
+def test_canonicalize(url, platform, video_id, key):
+    assert tuple(deku.canonicalize(url)) == (platform, video_id, key)
+
+
+def test_embedded_playlists_do_not_share_a_key():
+    first = deku.canonical_key("https://www.youtube.com/embed/videoseries?list=PLabc")
+    second = deku.canonical_key("https://www.youtube.com/embed/videoseries?list=PLdef")
+    assert first != second
+
+
+def test_detect_platform_uses_canonicalize():
+    assert deku.detect_platform("https://vt.tiktok.com/ZSabc/") == "tiktok"
+    assert deku.detect_platform("https://example.com/x.mp4") == "unknown"
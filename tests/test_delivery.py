@@ -0,0 +1,25 @@
+import pytest
+
+import deku
+
+BROWSER = {"User-Agent": "Mozilla/5.0", "Accept": "*/*", "Accept-Language": "en", "Sec-Fetch-Mode": "navigate"}
+
+
+def fmt(url="https://video.twimg.com/x.mp4", protocol="https", headers=BROWSER, cookies=None):
+    return {"url": url, "protocol": protocol, "http_headers": headers, "cookies": cookies}
+
+
+@pytest.mark.parametrize("format_id, media, platform, delivery", [
+    ("http-832", fmt(), "twitter", "redirect"),
+    # Plateforme non listée dans REDIRECT_PLATFORMS : schéma de signature inconnu
+    ("http-832", fmt(), "unknown", "stream"),
+    ("18", fmt("https://r1.googlevideo.com/videoplayback?expire=1"), "youtube", "stream"),
+    ("http-832", fmt(headers={**BROWSER, "Referer": "https://x.com/"}), "twitter", "stream"),
+    ("http-832", fmt(cookies="a=b; Domain=.twimg.com"), "twitter", "stream"),
+    ("http-832", fmt("https://video.twimg.com/x.mp4?ip=1.2.3.4"), "twitter", "stream"),
+    ("hls-832", fmt(protocol="m3u8_native"), "twitter", "file"),
+    ("137+140", fmt(), "twitter", "file"),
+    ("http-832", None, "twitter", "file"),
+])
+def test_delivery_for(format_id, media, platform, delivery):
+    assert deku.delivery_for(format_id, media, platform) == delivery
@@ -0,0 +1,70 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import deku
+
+BODY = bytes(range(256)) * 256
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """
+    /clip.mp4 : 503 à la première requête, puis le fichier. Toute autre
+    page est en 404 (l'extraction de repli échoue).
+    """
+    protocol_version = "HTTP/1.1"
+    failures = 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != "/clip.mp4":
+            self.send_error(404)
+            return
+        if FlakyHandler.failures > 0:
+            FlakyHandler.failures -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+
+@pytest.fixture
+def flaky_server():
+    FlakyHandler.failures = 1
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_retry_sleep_functions_take_n():
+    # yt-dlp appelle sleep_func(n=...) (RetryManager.report_retry)
+    settings = deku.download_tuning("unknown", "https")
+    sleep = settings["retry_sleep_functions"]["http"]
+    assert sleep(n=0) == 1.0
+    assert sleep(n=10) == 15.0
+
+
+def test_tuned_download_retries(flaky_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(deku, "DOWNLOAD_TUNING_ENABLED", True)
+    monkeypatch.setattr(deku, "DOWNLOAD_TUNING_OVERRIDES", {"default": {"http": {"retry_sleep": [0.01, 0.01]}}})
+    ticket = {
+        "title": "clip",
+        "platform": "unknown",
+        "original_url": f"{flaky_server}/page",
+        "extractor": "Generic",
+        "video_id": "clip",
+        "media": {"progressive": {"url": f"{flaky_server}/clip.mp4", "ext": "mp4", "protocol": "http"}},
+    }
+    path, ident = deku.download_media(ticket["original_url"], "progressive", str(tmp_path), ticket=ticket)
+    assert open(path, "rb").read() == BODY
+    assert FlakyHandler.failures == 0
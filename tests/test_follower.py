@@ -0,0 +1,44 @@
+import pytest
+
+import deku
+
+
+def video_info(**fmt) -> dict:
+    media = {"url": "https://cdn.example.com/a.m4a", "protocol": "https", "ext": "m4a", **fmt}
+    return {
+        "title": "clip",
+        "platform": "unknown",
+        "original_url": "https://example.com/clip",
+        "extractor": "Generic",
+        "video_id": "clip",
+        "media": {"140": media},
+    }
+
+
+@pytest.fixture
+def follower(tmp_path):
+    leases = deku.DownloadLeases(tmp_path / "leases", poll_interval=0.01, max_wait=1)
+    return leases, deku.DownloadFollower(leases, chunk_size=1024, start_timeout=1)
+
+
+@pytest.mark.parametrize("fmt, followed", [
+    ({}, True),
+    ({"container": "mp4_dash"}, True),
+    # Réécrits par FFmpegFixupM4aPP / FFmpegFixupStretchedPP après le téléchargement
+    ({"container": "m4a_dash"}, False),
+    ({"stretched_ratio": 1.33}, False),
+])
+def test_attach_skips_formats_rewritten_by_fixups(follower, fmt, followed):
+    leases, follower = follower
+    info = video_info(**fmt)
+    url_key = deku.canonical_key(info["original_url"])
+    with leases.hold(url_key, "140") as lease:
+        lease.update(state="downloading")
+        response = follower.attach(info["original_url"], "140", info)
+    assert (response is not None) == followed
+
+
+def test_attach_needs_a_live_download(follower):
+    _, follower = follower
+    info = video_info()
+    assert follower.attach(info["original_url"], "140", info) is None
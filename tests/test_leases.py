@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import deku
+
+URL_KEY, FORMAT_ID = "youtube:dQw4w9WgXcQ", "18"
+
+pytestmark = pytest.mark.skipif(deku.fcntl is None, reason="flock indisponible")
+
+
+def make_leases(root, max_wait: float = 5) -> deku.DownloadLeases:
+    return deku.DownloadLeases(root, poll_interval=0.01, max_wait=max_wait)
+
+
+def hold_then_finish(root, ready, go, crash: bool) -> None:
+    """
+    Autre worker : prend le bail, publie « downloading », puis termine
+    proprement ou meurt sans relâcher le bail.
+    """
+    with make_leases(root).hold(URL_KEY, FORMAT_ID) as lease:
+        lease.update(state="downloading", temp_dir="/tmp/x")
+        ready.set()
+        go.wait(10)
+        if crash:
+            os._exit(1)
+        lease.update(state="done", key="content-key", path="/cache/a.mp4")
+
+
+@pytest.fixture
+def other_worker(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    ready, go = ctx.Event(), ctx.Event()
+    processes = []
+
+    def start(crash: bool = False):
+        process = ctx.Process(target=hold_then_finish, args=(tmp_path, ready, go, crash))
+        process.start()
+        processes.append(process)
+        assert ready.wait(10)
+        return process, go
+
+    yield start
+    go.set()
+    for process in processes:
+        process.join(10)
+
+
+def test_waits_for_the_holder_then_reads_its_result(tmp_path, other_worker):
+    leases = make_leases(tmp_path)
+    process, go = other_worker()
+    assert leases.active(URL_KEY, FORMAT_ID)["state"] == "downloading"
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        acquiring = pool.submit(leases.acquire, URL_KEY, FORMAT_ID)
+        time.sleep(0.1)
+        assert not acquiring.done()
+        go.set()
+        lease = acquiring.result(10)
+    assert lease.waited
+    assert lease.previous["state"] == "done"
+    assert lease.previous["key"] == "content-key"
+    lease.release()
+    process.join(10)
+    assert leases.active(URL_KEY, FORMAT_ID) is None
+    assert leases.stats()["waited"] == 1
+
+
+def test_dead_holder_lease_is_taken_over(tmp_path, other_worker):
+    leases = make_leases(tmp_path)
+    process, go = other_worker(crash=True)
+    go.set()
+    process.join(10)
+    assert process.exitcode == 1
+
+    # Le noyau a libéré le verrou : le bail orphelin est repris
+    assert leases.active(URL_KEY, FORMAT_ID) is None
+    with leases.hold(URL_KEY, FORMAT_ID) as lease:
+        assert lease.previous["state"] == "downloading"
+        assert lease.previous["pid"] == process.pid
+    assert leases.stats()["stale_recovered"] == 1
+
+
+def test_acquire_times_out_while_held(tmp_path, other_worker):
+    leases = make_leases(tmp_path, max_wait=0.1)
+    other_worker()
+    with pytest.raises(TimeoutError):
+        leases.acquire(URL_KEY, FORMAT_ID)
+    assert leases.stats()["timeouts"] == 1
+
+
+def test_release_and_clean(tmp_path):
+    leases = make_leases(tmp_path)
+    lease = leases.acquire(URL_KEY, FORMAT_ID)
+    lease.update(state="done", key="k")
+    assert leases.clean(max_age=-1) == 0  # détenu : pas supprimé
+    lease.release()
+    lease.release()
+
+    other = leases.acquire(URL_KEY, FORMAT_ID)
+    assert not other.waited and other.previous["key"] == "k"
+    other.release()
+    assert leases.clean(max_age=-1) == 1
+    assert list(tmp_path.iterdir()) == []
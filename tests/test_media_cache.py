@@ -0,0 +1,60 @@
+import os
+import time
+from pathlib import Path
+
+import deku
+
+
+def store(cache: deku.MediaCache, tmp_path: Path, name: str, size: int = 100) -> Path:
+    src = tmp_path / f"{name}.mp4"
+    src.write_bytes(b"x" * size)
+    return cache.commit(deku.MediaCache.make_key("bench", name, "18"), src, f"url:{name}", "18")
+
+
+def entry_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.parent.iterdir())
+
+
+def age(path: Path, seconds: float) -> None:
+    meta = path.parent / deku.MediaCache.META_NAME
+    past = time.time() - seconds
+    os.utime(meta, (past, past))
+
+
+def test_budget_spares_entries_just_served(tmp_path):
+    cache = deku.MediaCache(tmp_path / "cache", max_bytes=1000, grace=30)
+    old = store(cache, tmp_path, "old")
+    age(old, 3600)
+    served = cache.find("url:old", "18")
+    assert served == old
+
+    # old vient d'être rendu par find() : le budget dépassé ne l'évince pas
+    cache.max_bytes = 50
+    assert cache.enforce_budget() == 0
+    assert old.is_file()
+    assert cache.stats()["evictions_deferred"] == 1
+
+    age(old, 60)
+    size = entry_size(old)
+    assert cache.enforce_budget() == size
+    assert not old.exists()
+
+
+def test_evict_idle_respects_grace(tmp_path):
+    cache = deku.MediaCache(tmp_path / "cache", max_bytes=1000, grace=30)
+    path = store(cache, tmp_path, "clip")
+    assert cache.evict_idle(0) == (0, 0)
+    age(path, 60)
+    size = entry_size(path)
+    assert cache.evict_idle(0) == (1, size)
+
+
+def test_touch_refreshes_entry(tmp_path):
+    cache = deku.MediaCache(tmp_path / "cache", max_bytes=1000, grace=30)
+    path = store(cache, tmp_path, "job")
+    age(path, 3600)
+    cache.touch(path)
+    cache.touch(tmp_path / "elsewhere.mp4")
+    cache.max_bytes = 0
+    assert cache.enforce_budget() == 0
+    assert path.is_file()
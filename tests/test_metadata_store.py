@@ -0,0 +1,66 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import deku
+
+
+def make_store(tmp_path, **kwargs):
+    store = deku.MetadataStore(str(tmp_path / "metadata.sqlite3"), 0.01, 60, **kwargs)
+    store.start()
+    return store
+
+
+def wait_written(store, count):
+    deadline = time.monotonic() + 5
+    while store.stats()["writes"] < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_put_get_roundtrip_and_expiry(tmp_path):
+    store = make_store(tmp_path)
+    try:
+        store.put("youtube:abc", {"title": "t"}, ttl=60)
+        store.put("youtube:old", {"title": "o"}, ttl=-1)
+        wait_written(store, 2)
+        value, ttl = store.get("youtube:abc")
+        assert value == {"title": "t"} and 0 < ttl <= 60
+        assert store.get("youtube:old") is None
+        assert store.get("missing") is None
+    finally:
+        store.stop()
+
+
+def test_readers_are_pooled_across_threads(tmp_path):
+    store = make_store(tmp_path, max_readers=3)
+    try:
+        store.put("k", {"v": 1}, ttl=60)
+        wait_written(store, 1)
+        barrier = threading.Barrier(8)
+
+        def read(_):
+            barrier.wait()
+            return store.get("k")[0]
+
+        # Un exécuteur neuf par lot, comme /api/analyze/batch
+        for _ in range(3):
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                assert list(pool.map(read, range(8))) == [{"v": 1}] * 8
+        assert store.stats()["idle_readers"] <= 3
+    finally:
+        store.stop()
+    assert store.stats()["idle_readers"] == 0
+
+
+def test_invalidate_deletes_the_stored_copy(tmp_path):
+    store = make_store(tmp_path)
+    try:
+        cache = deku.TTLCache(ttl=60, max_entries=10, max_bytes=1 << 20, store=store)
+        cache.get_or_load("youtube:abc", lambda: {"title": "t"})
+        wait_written(store, 1)
+        cache.invalidate("youtube:abc")
+        wait_written(store, 2)
+        assert store.get("youtube:abc") is None
+        assert cache.get("youtube:abc") is None
+    finally:
+        store.stop()
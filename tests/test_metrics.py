@@ -0,0 +1,13 @@
+import pytest
+
+import deku
+
+pytestmark = pytest.mark.skipif(not deku.METRICS.enabled, reason="métriques désactivées")
+
+
+def test_startup_phases_are_exported():
+    deku.startup_phase("pool_prime", 0.25)
+    assert deku.STARTUP["pool_prime_seconds"] == 0.25
+    text = deku.METRICS.render().decode()
+    assert 'deku_startup_seconds{phase="pool_prime"} 0.25' in text
+    assert 'deku_startup_seconds{phase="module_import"}' in text
@@ -0,0 +1,58 @@
+import json
+from contextlib import contextmanager
+
+import deku
+
+
+class FakeYDL:
+    def __init__(self, entries):
+        self.entries = entries
+
+    def extract_info(self, url, download=False, process=False, ie_key=None):
+        return {"_type": "playlist", "id": "PL1", "title": "Liste", "entries": self.entries}
+
+
+def test_page_is_read_inside_the_platform_slot(monkeypatch):
+    seen = []
+
+    def entries():
+        for i in range(10):
+            # Pages paresseuses : chaque entrée peut déclencher une requête
+            seen.append(deku.SCHEDULER.stats()["in_flight"])
+            yield {"id": f"v{i}", "url": f"https://www.youtube.com/watch?v=v{i:0>10}", "title": str(i)}
+
+    borrowed = []
+
+    @contextmanager
+    def checkout(profile, **overrides):
+        borrowed.append(profile)
+        yield FakeYDL(entries())
+        borrowed.remove(profile)
+
+    monkeypatch.setattr(deku.YDL_POOL, "checkout", checkout)
+    playlist, page, error = deku.read_playlist_page("https://www.youtube.com/playlist?list=PL1", 2, 3)
+
+    assert error is None
+    assert [e["id"] for e in page] == ["v2", "v3", "v4", "v5"]  # une entrée de plus : page suivante ?
+    assert seen and all(n >= 1 for n in seen)
+    assert borrowed == []  # instance rendue avant la réponse
+
+    lines = [json.loads(line) for line in deku.iter_playlist_page(playlist, page, error, 2, 3, 0)]
+    assert [line["type"] for line in lines] == ["playlist", "entry", "entry", "entry", "page"]
+    assert lines[-1] == {"type": "page", "offset": 2, "limit": 3, "returned": 3, "next_offset": 5}
+
+
+def test_read_error_is_reported_after_the_entries_read(monkeypatch):
+    def entries():
+        yield {"id": "v0", "url": "https://www.youtube.com/watch?v=v000000000"}
+        raise OSError("page 2 indisponible")
+
+    @contextmanager
+    def checkout(profile, **overrides):
+        yield FakeYDL(entries())
+
+    monkeypatch.setattr(deku.YDL_POOL, "checkout", checkout)
+    playlist, page, error = deku.read_playlist_page("https://www.youtube.com/playlist?list=PL1", 0, 5)
+    lines = [json.loads(line) for line in deku.iter_playlist_page(playlist, page, error, 0, 5, 0)]
+    assert [line["type"] for line in lines] == ["playlist", "entry", "error", "page"]
+    assert lines[-1]["next_offset"] is None
@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+import deku
+
+
+def make_scheduler(limits: dict, max_concurrency: int = 1, max_wait: float = 5) -> deku.PlatformScheduler:
+    return deku.PlatformScheduler(max_concurrency=max_concurrency, default_concurrency=8, default_rps=0,
+                                  limits=limits, max_wait=max_wait)
+
+
+def wait_queued(scheduler, depths: dict) -> None:
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        platforms = scheduler.stats()["platforms"]
+        if all(platforms.get(p, {}).get("queue_depth") == n for p, n in depths.items()):
+            return
+        time.sleep(0.01)
+    raise AssertionError(scheduler.stats())
+
+
+def test_bucket_refill_is_capped_at_the_burst():
+    bucket = deku._Bucket("x", concurrency=1, rps=10, weight=1)
+    assert bucket.tokens == 10
+    bucket.tokens = 0
+    bucket.refill(bucket.refilled + 0.25)
+    assert bucket.tokens == pytest.approx(2.5)
+    bucket.refill(bucket.refilled + 60)
+    assert bucket.tokens == 10
+    # Moins d'une requête par seconde : rafale d'une seule requête
+    slow = deku._Bucket("y", concurrency=1, rps=0.5, weight=1)
+    slow.tokens = 0
+    slow.refill(slow.refilled + 60)
+    assert slow.tokens == 1
+
+
+def test_rps_limits_sequential_slots():
+    scheduler = make_scheduler({"tiktok": {"rps": 20}}, max_concurrency=4)
+    started = time.monotonic()
+    for _ in range(30):
+        with scheduler.slot("tiktok"):
+            pass
+    # 20 jetons de rafale, puis 10 requêtes à 20/s
+    assert time.monotonic() - started >= 0.45
+    assert scheduler.stats()["platforms"]["tiktok"]["granted"] == 30
+
+
+def test_weighted_round_robin_when_slots_free_one_at_a_time():
+    scheduler = make_scheduler({"youtube": {"weight": 3}, "tiktok": {"weight": 1}})
+    order = []
+    lock = threading.Lock()
+
+    def worker(platform):
+        with scheduler.slot(platform):
+            with lock:
+                order.append(platform)
+
+    scheduler.acquire("youtube")
+    threads = [threading.Thread(target=worker, args=(p,)) for p in ["youtube"] * 9 + ["tiktok"] * 9]
+    for t in threads:
+        t.start()
+    wait_queued(scheduler, {"youtube": 9, "tiktok": 9})
+    scheduler.release("youtube")
+    for t in threads:
+        t.join(5)
+
+    # Tant que les deux files sont pleines : 3 youtube pour 1 tiktok
+    busy = order[:12]
+    assert busy.count("youtube") == 9 and busy.count("tiktok") == 3
+    assert "tiktok" in order[:4]
+    assert max(len(run) for run in "".join(p[0] for p in busy).split("t")) <= 3
+
+
+def test_queue_timeout():
+    scheduler = make_scheduler({}, max_wait=0.1)
+    scheduler.acquire("youtube")
+    with pytest.raises(TimeoutError):
+        scheduler.acquire("tiktok")
+    assert scheduler.stats()["platforms"]["tiktok"]["timeouts"] == 1
+    scheduler.release("youtube")
@@ -0,0 +1,60 @@
+import pytest
+
+import deku
+
+
+def test_failed_upstream_leaves_no_tee_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(deku, "DOWNLOAD_DIR", tmp_path)
+    monkeypatch.setattr(deku, "STREAM_TEE_CACHE", True)
+
+    def refused(fmt):
+        raise OSError("403")
+
+    monkeypatch.setattr(deku, "open_upstream", refused)
+    info = {
+        "title": "clip",
+        "platform": "unknown",
+        "original_url": "https://example.com/clip",
+        "media": {"18": {"url": "https://cdn.example.com/a.mp4", "protocol": "https", "ext": "mp4"}},
+    }
+    with pytest.raises(OSError):
+        deku.stream_response(info, "18", "url:clip", "key")
+    assert list(tmp_path.iterdir()) == []
+
+
+def cached_info(url: str) -> dict:
+    info = {
+        "title": "clip",
+        "platform": "unknown",
+        "original_url": url,
+        "extractor": "Generic",
+        "video_id": "clip",
+        "media": {"18": {"url": "http://127.0.0.1:1/a.mp4", "protocol": "http", "ext": "mp4",
+                         "http_headers": {}}},
+    }
+    deku.METADATA_CACHE.get_or_load(deku.canonical_key(url), lambda: info)
+    return info
+
+
+def test_refused_stream_invalidates_cached_analysis(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    url = "https://example.com/refused-stream"
+    cached_info(url)
+
+    def refused(fmt):
+        raise OSError("HTTP Error 403: Forbidden")
+
+    monkeypatch.setattr(deku, "open_upstream", refused)
+    response = TestClient(deku.app).get("/api/download", params={"url": url, "format_id": "18", "mode": "stream"})
+    assert response.status_code == 502
+    assert deku.METADATA_CACHE.get(deku.canonical_key(url)) is None
+
+
+def test_refused_ticket_download_invalidates_cached_analysis(tmp_path, monkeypatch):
+    monkeypatch.setattr(deku, "DOWNLOAD_TUNING_OVERRIDES", {"default": {"http": {"retries": 0}}})
+    url = "http://127.0.0.1:1/refused-ticket"
+    ticket = cached_info(url)
+    with pytest.raises(Exception):
+        deku.download_media(url, "18", str(tmp_path), ticket=ticket)
+    assert deku.METADATA_CACHE.get(deku.canonical_key(url)) is None
@@ -0,0 +1,125 @@
+import base64
+import json
+import time
+import zlib
+
+import pytest
+
+import deku
+
+INFO = {
+    "title": "clip",
+    "platform": "twitter",
+    "original_url": "https://x.com/NASA/status/1712345678901234567",
+    "extractor": "Twitter",
+    "video_id": "1712345678901234567",
+    "media": {
+        "http-832": {"url": "https://video.twimg.com/x.mp4", "protocol": "https", "ext": "mp4",
+                     "http_headers": {"User-Agent": "Mozilla/5.0"}},
+        "dash-1": {"url": "https://video.twimg.com/x.mpd", "protocol": "http_dash_segments", "ext": "mp4",
+                   "http_headers": {}},
+        "cookie-1": {"url": "https://video.twimg.com/y.mp4", "protocol": "https", "ext": "mp4",
+                     "http_headers": {}, "cookies": "a=b"},
+    },
+}
+
+
+def b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def unb64(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+@pytest.fixture
+def signer(tmp_path, monkeypatch):
+    monkeypatch.setattr(deku, "TICKET_SECRET", "")
+    return deku.TicketSigner(tmp_path / ".ticket-secret", ttl=60)
+
+
+def test_roundtrip(signer):
+    payload = signer.verify(signer.issue(INFO, "http-832"))
+    assert payload["url"] == INFO["original_url"]
+    assert payload["media"]["url"] == "https://video.twimg.com/x.mp4"
+    assert payload["expired"] is False
+    assert signer.stats()["redeemed"] == 1
+
+
+def test_no_ticket_for_formats_that_need_the_extractor(signer):
+    assert signer.issue(INFO, "dash-1") is None
+    assert signer.issue(INFO, "cookie-1") is None
+    assert signer.issue(INFO, "missing") is None
+
+
+def test_tampered_payload_is_rejected(signer):
+    body, signature = signer.issue(INFO, "http-832").split(".")
+    payload = json.loads(zlib.decompress(unb64(body)))
+    payload["media"]["url"] = "https://evil.example.com/x.mp4"
+    forged = b64(zlib.compress(json.dumps(payload).encode()))
+    with pytest.raises(ValueError):
+        signer.verify(f"{forged}.{signature}")
+    assert signer.stats()["invalid"] == 1
+
+
+@pytest.mark.parametrize("mangle", [
+    lambda body, sig: f"{body}.{b64(bytes([unb64(sig)[0] ^ 1]) + unb64(sig)[1:])}",
+    lambda body, sig: f"{body}.{sig[:-4]}",
+    lambda body, sig: f"{body}.",
+    lambda body, sig: body,
+    lambda body, sig: f"{body}.{sig}.{sig}",
+    lambda body, sig: f"{body}.***",
+])
+def test_tampered_signature_is_rejected(signer, mangle):
+    body, signature = signer.issue(INFO, "http-832").split(".")
+    with pytest.raises(ValueError):
+        signer.verify(mangle(body, signature))
+
+
+def test_expired_ticket_keeps_its_payload(tmp_path, monkeypatch):
+    monkeypatch.setattr(deku, "TICKET_SECRET", "")
+    signer = deku.TicketSigner(tmp_path / ".ticket-secret", ttl=-1)
+    payload = signer.verify(signer.issue(INFO, "http-832"))
+    # Expiré : sert seulement à relancer l'analyse (url, format_id)
+    assert payload["expired"] is True
+    assert payload["format_id"] == "http-832"
+    assert signer.stats()["expired"] == 1
+
+
+def test_expiry_follows_the_cdn_expire_parameter(signer):
+    soon = int(time.time()) + 90
+    assert signer.expiry({"url": f"https://cdn.example.com/a.mp4?expire={soon}"}) == soon - 60
+    later = int(time.time()) + 3600
+    assert signer.expiry({"url": f"https://cdn.example.com/a.mp4?expire={later}"}) <= time.time() + 60
+
+
+def test_workers_share_the_generated_secret(tmp_path, monkeypatch):
+    monkeypatch.setattr(deku, "TICKET_SECRET", "")
+    first = deku.TicketSigner(tmp_path / ".ticket-secret", ttl=60)
+    second = deku.TicketSigner(tmp_path / ".ticket-secret", ttl=60)
+    assert second.verify(first.issue(INFO, "http-832"))["expired"] is False
+    assert (tmp_path / ".ticket-secret").stat().st_mode & 0o777 == 0o600
+
+
+def test_key_rotation_invalidates_old_tickets(tmp_path, monkeypatch):
+    monkeypatch.setattr(deku, "TICKET_SECRET", "old-secret")
+    old = deku.TicketSigner(tmp_path / ".ticket-secret", ttl=60)
+    ticket = old.issue(INFO, "http-832")
+
+    monkeypatch.setattr(deku, "TICKET_SECRET", "new-secret")
+    rotated = deku.TicketSigner(tmp_path / ".ticket-secret", ttl=60)
+    with pytest.raises(ValueError):
+        rotated.verify(ticket)
+    assert rotated.verify(rotated.issue(INFO, "http-832"))["expired"] is False
+    # DEKU_TICKET_SECRET prime sur le fichier : rien n'est écrit
+    assert not (tmp_path / ".ticket-secret").exists()
+
+
+def test_download_endpoint_rejects_forged_tickets():
+    from fastapi.testclient import TestClient
+
+    ticket = deku.TICKETS.issue(INFO, "http-832")
+    body, signature = ticket.split(".")
+    response = TestClient(deku.app).get("/api/download", params={"ticket": f"{body}.{signature[::-1]}"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Ticket invalide."
@@ -0,0 +1,90 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import deku
+
+
+def make_cache(**kwargs) -> deku.TTLCache:
+    return deku.TTLCache(**{"ttl": 60, "max_entries": 100, "max_bytes": 1 << 20, **kwargs})
+
+
+def test_concurrent_misses_call_the_loader_once():
+    cache = make_cache()
+    calls = 0
+    release = threading.Event()
+
+    def loader():
+        nonlocal calls
+        calls += 1
+        release.wait(5)
+        return {"title": "t"}
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        futures = [pool.submit(cache.get_or_load, "youtube:abc", loader) for _ in range(16)]
+        # Tous les demandeurs sont rattachés à l'appel en cours avant qu'il finisse
+        deadline = time.monotonic() + 5
+        while cache.stats()["coalesced"] < 15 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert calls == 1
+    assert all(r is results[0] for r in results)
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"]) == (1, 15)
+    assert cache.get_or_load("youtube:abc", loader) is results[0]
+    assert calls == 1
+
+
+def test_errors_are_shared_but_not_cached():
+    cache = make_cache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = 0
+
+    def failing():
+        nonlocal calls
+        calls += 1
+        started.set()
+        release.wait(5)
+        raise RuntimeError("extraction impossible")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(cache.get_or_load, "k", failing)
+        started.wait(5)
+        follower = pool.submit(cache.get_or_load, "k", failing)
+        deadline = time.monotonic() + 5
+        while cache.stats()["coalesced"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError):
+                future.result()
+    assert calls == 1
+
+    # L'échec n'est pas mémorisé : la demande suivante relance le loader
+    assert cache.get_or_load("k", lambda: "ok") == "ok"
+    assert cache.get("k") == "ok"
+
+
+def test_expiry_and_bounds():
+    cache = make_cache(ttl=0.05, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.get_or_load(key, lambda key=key: key)
+    assert cache.get("a") is None  # LRU, max_entries
+    assert cache.get("c") == "c"
+    time.sleep(0.06)
+    assert cache.get("c") is None
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["expirations"] >= 1
+
+
+def test_invalidate_forces_a_reload():
+    cache = make_cache()
+    cache.get_or_load("k", lambda: "old")
+    cache.invalidate("k")
+    cache.invalidate("missing")
+    assert cache.get_or_load("k", lambda: "new") == "new"
@@ -0,0 +1,30 @@
+import deku
+
+
+def test_release_resets_per_call_state():
+    pool = deku.YDLPool(deku.YDL_PROFILES, size=2, max_uses=10)
+    hook = lambda d: None  # noqa: E731
+    with pool.checkout("download", format="18", outtmpl="x/%(id)s.%(ext)s", progress_hooks=[hook]) as ydl:
+        ydl._num_downloads = 3
+        ydl._playlist_urls.add("u")
+    with pool.checkout("download") as again:
+        assert again is ydl
+        assert again.params.get("format") is None
+        assert again._progress_hooks == []
+        assert again._num_downloads == 0
+        assert again._playlist_urls == set()
+    assert pool.stats()["reusable"] is True
+    assert pool.stats()["reused"] == 1
+
+
+def test_missing_internal_state_disables_reuse(monkeypatch):
+    monkeypatch.setitem(deku.YDL_RESET_STATE, "_renamed_in_a_future_release", list)
+    pool = deku.YDLPool(deku.YDL_PROFILES, size=2, max_uses=10)
+    with pool.checkout("analyze") as first:
+        pass
+    with pool.checkout("analyze") as second:
+        assert second is not first
+    stats = pool.stats()
+    assert stats["reusable"] is False
+    assert stats["missing_attributes"] == ["_renamed_in_a_future_release"]
+    assert stats["discarded"] == 2